@@ -19,14 +19,19 @@ Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
 import os
 import src as mltn2v
 import argparse
+import shutil
+import tempfile
 import time
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Run multi-node2vec on multilayer networks.")
 
-    parser.add_argument('--dir', nargs='?', default='data/CONTROL_fmt',
-                        help='Absolute path to directory of correlation/adjacency matrix files (csv format). Note that rows and columns must be properly labeled by node ID in each .csv.')
+    parser.add_argument('--dir', nargs='+', default=['data/CONTROL_fmt'],
+                        help='Absolute path to directory of correlation/adjacency matrix files (csv format). Note that rows and columns must be properly labeled by node ID in each .csv. Several directories (cohorts) are embedded in one job, in aligned coordinates, and their results are written to <output>/<cohort>/.')
+
+    parser.add_argument('--cohort_training', choices=['joint', 'warm_start'], default='joint',
+                        help='Training of several cohorts. joint trains one model on the walks of all cohorts, with cohort-tagged node tokens. warm_start trains a base model on the pooled walks and fine-tunes a copy of it for each cohort. Default is joint.')
 
     parser.add_argument('--output', nargs='?', default='new_results/',
                         help='Absolute path to output directory (no extension).')
@@ -46,11 +51,20 @@ def parse_args():
     parser.add_argument('--n_samples', type=int, default=1,
                         help='Number of walks per node per layer. Default is 1.')
 
-    parser.add_argument('--thresh', type=float, default=0.5,
-                        help='Threshold for converting a weighted network to an unweighted one. All weights less than or equal to thresh will be considered 0 and all others 1. Default is 0.5. Use None if the network is unweighted.')
+    parser.add_argument('--thresh', type=parse_thresh, nargs='+', default=[0.5],
+                        help='Threshold(s) for converting a weighted network to an unweighted one. All weights less than or equal to thresh will be considered 0 and all others 1. Default is 0.5. Use None if the network is unweighted. Several thresholds are embedded separately from a single parse of the network.')
+
+    parser.add_argument('--w2v_iter', default=1, type=int,
+                        help='Number of epochs in word2vec, the maximum number with --w2v_tol. Default is 1.')
+
+    parser.add_argument('--w2v_tol', type=float, default=None,
+                        help='Stop word2vec training once the improvement of an epoch, as measured by --w2v_monitor, is below this tolerance, and write the per-epoch curve to mltn2v_results_convergence.csv. Default is to train for all --w2v_iter epochs.')
 
-    # parser.add_argument('--w2v_iter', default=1, type=int,
-#                         help='Number of epochs in word2vec')
+    parser.add_argument('--w2v_patience', type=int, default=2,
+                        help='Number of epochs in a row with an improvement below --w2v_tol before word2vec training stops. Default is 2.')
+
+    parser.add_argument('--w2v_monitor', choices=mltn2v.CONVERGENCE_MONITORS, default='delta',
+                        help='Convergence measure of --w2v_tol. loss is the relative decrease of the word2vec training loss, delta the relative change of the node vectors over an epoch (up to rotation), and reconstruction the increase of the AUC of the node vectors on a sample of layer edges, held out of the walks, against non-edges. Default is delta.')
 
     parser.add_argument('--w2v_workers', type=int, default=8,
                         help='Number of parallel worker threads. Default is 8.')
@@ -65,32 +79,315 @@ def parse_args():
                         help='Exploration walk parameter for neighborhood search. Default is 0.50')
   
 
-    return parser.parse_args()
+    parser.add_argument('--engine', choices=['walk', 'factorize'], default='walk',
+                        help='Embedding engine. walk samples random walks and trains word2vec. factorize computes the walk co-occurrences in closed form and factorizes them by SVD, which is deterministic and faster for small dense networks, but models walks with p = q = 1 and approximates the forced layer switch of nodes without neighbors in a layer. Default is walk.')
+
+    parser.add_argument('--shared_layers', action='store_true',
+                        help='Store the layers over a shared node index, with each distinct neighborhood and its alias table stored once across layers. Saves memory and preprocessing time when layers share their nodes, as in group fMRI.')
+
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Overlap parsing, walk preprocessing, walking and word2vec training, and report the utilization of each stage. The word2vec vocabulary frequencies are estimated from node degrees, so embeddings differ from those of a normal run.')
+
+    parser.add_argument('--queue_size', type=int, default=16,
+                        help='Capacity of the queues between pipeline stages. Default is 16.')
+
+    parser.add_argument('--memory_budget', type=mltn2v.parse_memory_size, default=None,
+                        help='Memory budget (e.g. 8G) for multilayer networks that do not fit in memory. Layers are spilled to memory-mapped files and walks are streamed from disk. Default is to keep everything in memory.')
+
+    parser.add_argument('--spill_dir', nargs='?', default=None,
+                        help='Local directory for the layer and walk files of --memory_budget. Default is a temporary directory.')
+
+    parser.add_argument('--shard', type=mltn2v.parse_shard, default=None,
+                        help='Only generate the walks of shard i of N, given as i/N with 0 <= i < N, and write them to --shard_dir. Shards can run as separate processes or machines sharing a filesystem.')
+
+    parser.add_argument('--merge_shards', type=int, default=None,
+                        help='Train on the walks of the N shards in --shard_dir instead of generating walks.')
+
+    parser.add_argument('--shard_dir', nargs='?', default=None,
+                        help='Shared directory of the walk shards of --shard and --merge_shards.')
+
+    parser.add_argument('--shard_wait', type=float, default=0,
+                        help='Seconds --merge_shards waits for missing shards before failing. Default is 0.')
+
+    parser.add_argument('--walk_corpus', nargs='?', default=None,
+                        help='Directory where the walks are saved with the layer of each step, so that subgroups of layers can later be embedded with --subgroup without walking again.')
+
+    parser.add_argument('--subgroup', nargs='+', default=None,
+                        help='Embed a subgroup of layers from the walks saved in --walk_corpus, instead of parsing and walking. Layers are given by file name, with or without the extension, or as a text file listing one name per line. Names must match the whole file name, e.g. 0040013.preprocess_v1 for 0040013.preprocess_v1.csv, not the subject ID 0040013.')
+
+    parser.add_argument('--subgroup_mode', choices=mltn2v.SUBGROUP_MODES, default='runs',
+                        help='Neighborhoods of the subgroup. runs cuts the walks into runs of consecutive steps in subgroup layers, dropping runs shorter than --window_size. The other modes keep whole walks, which also visit layers outside the subgroup: start keeps the walks starting in a subgroup layer, all the walks that never leave the subgroup, and reweight samples each walk with probability equal to its share of steps in the subgroup. Walks switch layers with probability r, so all keeps few walks unless they are short or r is small. Default is runs.')
+
+    parser.add_argument('--checkpoint_dir', nargs='?', default=None,
+                        help='Directory for checkpoints of the preprocessing, the walks of each layer and the word2vec model. Default is no checkpointing.')
+
+    parser.add_argument('--checkpoint_every', type=int, default=1,
+                        help='Number of word2vec epochs between checkpoints. Default is 1.')
+
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume from the checkpoints in --checkpoint_dir, skipping completed work. Checkpoints computed with other parameters are recomputed.')
+
+    args = parser.parse_args()
+    if args.resume and args.checkpoint_dir is None:
+        parser.error('--resume requires --checkpoint_dir')
+    if args.pipeline and (args.engine != 'walk' or args.checkpoint_dir is not None):
+        parser.error('--pipeline only supports the walk engine, without checkpoints')
+    if args.shared_layers and (args.engine != 'walk' or args.pipeline or args.memory_budget is not None):
+        parser.error('--shared_layers only supports the walk engine, without --pipeline or --memory_budget')
+    if args.memory_budget is not None and (args.engine != 'walk' or args.pipeline or args.checkpoint_dir is not None):
+        parser.error('--memory_budget only supports the walk engine, without --pipeline or checkpoints')
+    if (args.shard is not None or args.merge_shards is not None) and args.shard_dir is None:
+        parser.error('--shard and --merge_shards require --shard_dir')
+    if args.shard is not None and args.merge_shards is not None:
+        parser.error('--shard and --merge_shards cannot be combined')
+    if (args.shard is not None or args.merge_shards is not None) and \
+            (args.engine != 'walk' or args.pipeline or args.memory_budget is not None or args.checkpoint_dir is not None):
+        parser.error('--shard and --merge_shards only support the walk engine, without --pipeline, --memory_budget or checkpoints')
+    if len(args.dir) > 1 and (args.engine != 'walk' or args.pipeline or args.memory_budget is not None or
+                              args.shard is not None or args.merge_shards is not None or args.checkpoint_dir is not None):
+        parser.error('several --dir only support the walk engine, without --pipeline, --memory_budget, shards or checkpoints')
+    if args.subgroup is not None and args.walk_corpus is None:
+        parser.error('--subgroup requires --walk_corpus')
+    if args.walk_corpus is not None and (len(args.dir) > 1 or args.engine != 'walk' or args.pipeline or args.memory_budget is not None or
+                                         args.shard is not None or args.merge_shards is not None or args.checkpoint_dir is not None):
+        parser.error('--walk_corpus only supports a single --dir and the walk engine, without --pipeline, --memory_budget, shards or checkpoints')
+    if args.w2v_tol is not None and (len(args.dir) > 1 or args.engine != 'walk' or args.pipeline):
+        parser.error('--w2v_tol only supports a single --dir and the walk engine, without --pipeline')
+    if args.w2v_tol is not None and args.w2v_monitor == 'reconstruction' and \
+            (args.memory_budget is not None or args.merge_shards is not None or args.subgroup is not None):
+        parser.error('--w2v_monitor reconstruction needs the parsed layers, and does not support --memory_budget, --merge_shards or --subgroup')
+    args.cohorts = args.dir if len(args.dir) > 1 else None
+    args.dir = args.dir[0]
+    return args
+
+
+def parse_thresh(value):
+    """
+    Parses a --thresh value, accepting None for unweighted networks.
+    """
+    if value.lower() == 'none':
+        return None
+    return float(value)
 
 
 def main(args):
     start = time.time()
-    # PARSE LAYERS -- THRESHOLD & CONVERT TO BINARY
-    layers = mltn2v.timed_invoke("parsing network layers",
-                                 lambda: mltn2v.parse_matrix_layers(args.dir, binary=True, thresh=args.thresh))
+    if args.memory_budget is not None:
+        run_out_of_core(args)
+        print("Completed Multilayer Network Embedding for all thresholds and r values in {:.2f} secs.".format(time.time() - start))
+        return
+    if args.subgroup is not None:
+        run_subgroup(args)
+        print("Completed Multilayer Network Embedding for all thresholds and r values in {:.2f} secs.".format(time.time() - start))
+        return
+    if args.cohorts is not None:
+        run_cohorts(args)
+        print("Completed Multilayer Network Embedding for all cohorts, thresholds and r values in {:.2f} secs.".format(time.time() - start))
+        return
+    if args.merge_shards is not None:
+        run_merge_shards(args)
+        print("Completed Multilayer Network Embedding for all thresholds and r values in {:.2f} secs.".format(time.time() - start))
+        return
+    if args.pipeline:
+        run_pipelined(args)
+        print("Completed Multilayer Network Embedding for all thresholds and r values in {:.2f} secs.".format(time.time() - start))
+        return
+    # PARSE LAYERS -- KEEP RAW WEIGHTS SO THAT EVERY THRESHOLD SHARES ONE PARSE
+    layer_names = []
+    weighted_layers = mltn2v.timed_invoke("parsing network layers",
+                                          lambda: mltn2v.parse_weighted_layers(args.dir, names=layer_names))
     # check if layers were parsed
-    if layers:
-        # EXTRACT NEIGHBORHOODS
-        nbrhd_dict = mltn2v.timed_invoke("extracting neighborhoods",
-                                     lambda: mltn2v.extract_neighborhoods_walk(layers, args.walk_length, args.rvals, args.pvals, args.qvals))
-        # GENERATE FEATURES
+    if weighted_layers:
         out = mltn2v.clean_output(args.output)
+        for thresh in args.thresh:
+            # THRESHOLD & CONVERT TO BINARY
+            layers = mltn2v.threshold_layers(weighted_layers, thresh=thresh, binary=True)
+            # keep the single threshold layout, nest results by threshold otherwise
+            thresh_out = out if len(args.thresh) == 1 else os.path.join(out, 't' + str(thresh))
+            thresh_ckpt = None
+            if args.checkpoint_dir is not None:
+                thresh_ckpt = os.path.join(mltn2v.expand_path(args.checkpoint_dir), 't' + str(thresh))
+            if args.engine == 'factorize':
+                # FACTORIZE CLOSED-FORM WALK CO-OCCURRENCES
+                for w in args.rvals:
+                    out_path = os.path.join(thresh_out, 'r' + str(w) + '/mltn2v_results')
+                    mltn2v.timed_invoke("factorizing walk co-occurrences",
+                                        lambda: mltn2v.factorize_features(layers, args.d, out_path, r=w, nbrhd_size=args.window_size,
+                                                                          walk_length=args.walk_length))
+                    print("\nCompleted Multilayer Network Embedding for thresh=" + str(thresh) + ", r=" + str(w) + " in {:.2f} secs.\nSee results:".format(time.time() - start))
+                    print("\t" + out_path + ".csv")
+                continue
+            if args.shard is not None:
+                # WRITE THE WALKS OF THIS SHARD ONLY, FOR --merge_shards TO TRAIN ON
+                shard_files = mltn2v.timed_invoke("extracting neighborhoods of shard {}/{}".format(*args.shard),
+                                                  lambda: mltn2v.extract_neighborhoods_walk(layers, args.walk_length, args.rvals, args.pvals, args.qvals,
+                                                                                            shard=args.shard, shard_dir=shard_dir(args, thresh),
+                                                                                            shared=args.shared_layers))
+                for w in shard_files:
+                    print("\t" + shard_files[w])
+                continue
+            # HOLD OUT A SAMPLE OF LAYER EDGES & NON-EDGES FOR THE RECONSTRUCTION MONITOR
+            edge_sample = None
+            if args.w2v_tol is not None and args.w2v_monitor == 'reconstruction':
+                edge_sample = mltn2v.sample_edge_pairs(layers)
+                layers = mltn2v.remove_edge_pairs(layers, edge_sample)
+            if args.walk_corpus is not None:
+                # EXTRACT NEIGHBORHOODS & SAVE THEM WITH THE LAYER OF EACH STEP
+                nbrhd_dict = mltn2v.timed_invoke("extracting neighborhoods",
+                                                 lambda: mltn2v.extract_walk_corpus(layers, args.walk_length, args.rvals, args.pvals, args.qvals,
+                                                                                    layer_names, corpus_dir(args, thresh),
+                                                                                    shared=args.shared_layers))
+            else:
+                # EXTRACT NEIGHBORHOODS
+                nbrhd_dict = mltn2v.timed_invoke("extracting neighborhoods",
+                                                 lambda: mltn2v.extract_neighborhoods_walk(layers, args.walk_length, args.rvals, args.pvals, args.qvals,
+                                                                                           checkpoint_dir=thresh_ckpt, resume=args.resume,
+                                                                                           shared=args.shared_layers))
+            # GENERATE FEATURES
+            for w in args.rvals:
+                out_path = os.path.join(thresh_out, 'r' + str(w) + '/mltn2v_results')
+                w2v_ckpt = None if thresh_ckpt is None else os.path.join(thresh_ckpt, 'r' + str(w))
+                mltn2v.timed_invoke("generating features",
+                                    lambda: mltn2v.generate_features(nbrhd_dict[w], args.d, out_path, nbrhd_size=args.window_size,
+                                                                     w2v_iter=args.w2v_iter, workers=args.w2v_workers,
+                                                                     checkpoint_dir=w2v_ckpt, checkpoint_every=args.checkpoint_every,
+                                                                     resume=args.resume, tol=args.w2v_tol, monitor=args.w2v_monitor,
+                                                                     patience=args.w2v_patience, edge_sample=edge_sample,
+                                                                     walk_key=None if w2v_ckpt is None else walk_key(args, layers, w)))
+
+                print("\nCompleted Multilayer Network Embedding for thresh=" + str(thresh) + ", r=" + str(w) + " in {:.2f} secs.\nSee results:".format(time.time() - start))
+                print("\t" + out_path + ".csv")
+        print("Completed Multilayer Network Embedding for all thresholds and r values.")
+    else:
+        print("Whoops!")
+
+
+def walk_key(args, layers, w):
+    # parameters of the walks a word2vec checkpoint is trained on, 52 walks per node per layer
+    return {'r': w, 'walk_length': args.walk_length, 'n_walks': 52, 'p': args.pvals, 'q': args.qvals,
+            'shared': args.shared_layers, 'network': mltn2v.layers_digest(layers)}
+
+
+def shard_dir(args, thresh):
+    return os.path.join(mltn2v.expand_path(args.shard_dir), 't' + str(thresh))
+
+
+def run_merge_shards(args):
+    out = mltn2v.clean_output(args.output)
+    for thresh in args.thresh:
+        thresh_out = out if len(args.thresh) == 1 else os.path.join(out, 't' + str(thresh))
         for w in args.rvals:
-            out_path = os.path.join(out, 'r' + str(w) + '/mltn2v_results') 
+            # MERGE WALK SHARDS, IN THE ORDER OF THE UNSHARDED WALKS
+            nbrhds = mltn2v.timed_invoke("merging walk shards",
+                                         lambda: mltn2v.merge_walk_shards(shard_dir(args, thresh), w, args.merge_shards,
+                                                                          wait=args.shard_wait))
+            out_path = os.path.join(thresh_out, 'r' + str(w) + '/mltn2v_results')
             mltn2v.timed_invoke("generating features",
-                                lambda: mltn2v.generate_features(nbrhd_dict[w], args.d, out_path, nbrhd_size=args.window_size,
-                                                                 w2v_iter=1, workers=args.w2v_workers))
+                                lambda: mltn2v.generate_features(nbrhds, args.d, out_path, nbrhd_size=args.window_size,
+                                                                 w2v_iter=args.w2v_iter, workers=args.w2v_workers,
+                                                                 tol=args.w2v_tol, monitor=args.w2v_monitor, patience=args.w2v_patience))
+            print("\t" + out_path + ".csv")
+
+
+def corpus_dir(args, thresh):
+    return os.path.join(mltn2v.expand_path(args.walk_corpus), 't' + str(thresh))
 
-            print("\nCompleted Multilayer Network Embedding for r=" + str(w) + " in {:.2f} secs.\nSee results:".format(time.time() - start))
+
+def run_subgroup(args):
+    out = mltn2v.clean_output(args.output)
+    subgroup = mltn2v.read_subgroup(args.subgroup)
+    for thresh in args.thresh:
+        thresh_out = out if len(args.thresh) == 1 else os.path.join(out, 't' + str(thresh))
+        for w in args.rvals:
+            # TAKE THE NEIGHBORHOODS OF THE SUBGROUP FROM THE SAVED CORPUS
+            corpus = mltn2v.WalkCorpus.load(mltn2v.corpus_path(corpus_dir(args, thresh), w))
+            nbrhds, share = corpus.subgroup_neighborhoods(corpus.layer_ids(subgroup), mode=args.subgroup_mode,
+                                                          min_length=max(args.window_size, 2))
+            print("Selected {} neighborhoods from {} walks for {} of {} layers, {:.1%} of their steps in the subgroup".format(
+                len(nbrhds), len(corpus), len(subgroup), len(corpus.layer_names), share))
+            if len(nbrhds) == 0:
+                print("[ERROR] No neighborhoods of the corpus belong to the subgroup. Try a smaller --window_size, or --subgroup_mode start or reweight.")
+                continue
+            if share < mltn2v.SUBGROUP_SHARE_WARNING:
+                print("[WARNING] Most steps of the subgroup neighborhoods are in other layers, so the embedding mostly reflects them. Use --subgroup_mode runs.")
+            out_path = os.path.join(thresh_out, 'r' + str(w) + '/mltn2v_results')
+            mltn2v.timed_invoke("generating features",
+                                lambda: mltn2v.generate_features(nbrhds, args.d, out_path,
+                                                                 nbrhd_size=args.window_size, w2v_iter=args.w2v_iter,
+                                                                 workers=args.w2v_workers, tol=args.w2v_tol,
+                                                                 monitor=args.w2v_monitor, patience=args.w2v_patience))
             print("\t" + out_path + ".csv")
-        print("Completed Multilayer Network Embedding for all r values.")
-    else:
-        print("Whoops!")
+
+
+def run_cohorts(args):
+    out = mltn2v.clean_output(args.output)
+    names = mltn2v.cohort_names(args.cohorts)
+    # PARSE EVERY COHORT ONCE FOR ALL THRESHOLDS
+    cohort_weighted = []
+    for network_dir in args.cohorts:
+        weighted_layers = mltn2v.timed_invoke("parsing network layers of " + network_dir,
+                                              lambda: mltn2v.parse_weighted_layers(network_dir))
+        if not weighted_layers:
+            print("[ERROR] No layers were parsed from " + network_dir)
+            return
+        cohort_weighted.append(weighted_layers)
+    for thresh in args.thresh:
+        thresh_out = out if len(args.thresh) == 1 else os.path.join(out, 't' + str(thresh))
+        cohort_layers = [mltn2v.threshold_layers(weighted_layers, thresh=thresh, binary=True) for weighted_layers in cohort_weighted]
+        # SHARED WALK ENGINE & ALIGNED TRAINING OF ALL COHORTS
+        features = mltn2v.timed_invoke("embedding {} cohorts for thresh={}".format(len(names), thresh),
+                                       lambda: mltn2v.run_cohorts(cohort_layers, args.d, thresh_out, args.rvals, args.walk_length,
+                                                                  args.pvals, args.qvals, names=names, training=args.cohort_training,
+                                                                  nbrhd_size=args.window_size, w2v_iter=args.w2v_iter,
+                                                                  workers=args.w2v_workers))
+        for w in features:
+            for name in features[w]:
+                print("\t" + os.path.join(thresh_out, name, 'r' + str(w), 'mltn2v_results') + ".csv")
+
+
+def run_pipelined(args):
+    out = mltn2v.clean_output(args.output)
+    weighted_layers = None
+    for thresh in args.thresh:
+        thresh_out = out if len(args.thresh) == 1 else os.path.join(out, 't' + str(thresh))
+        # PARSE, PREPROCESS, WALK AND TRAIN CONCURRENTLY, READING THE FILES ONLY FOR THE FIRST THRESHOLD
+        features, weighted_layers = mltn2v.timed_invoke("running pipeline for thresh=" + str(thresh),
+                                                        lambda: mltn2v.run_pipeline(args.dir, args.d, thresh_out, args.rvals, args.walk_length,
+                                                                                    args.pvals, args.qvals, thresh=thresh, nbrhd_size=args.window_size,
+                                                                                    w2v_iter=args.w2v_iter, workers=args.w2v_workers,
+                                                                                    queue_size=args.queue_size, weighted_layers=weighted_layers))
+        for w in features:
+            print("\t" + os.path.join(thresh_out, 'r' + str(w) + '/mltn2v_results') + ".csv")
+
+
+def run_out_of_core(args):
+    out = mltn2v.clean_output(args.output)
+    spill_root = tempfile.mkdtemp(prefix='mltn2v_') if args.spill_dir is None else mltn2v.clean_output(args.spill_dir)
+    try:
+        for thresh in args.thresh:
+            thresh_out = out if len(args.thresh) == 1 else os.path.join(out, 't' + str(thresh))
+            spill_dir = os.path.join(spill_root, 't' + str(thresh))
+            # SPILL LAYERS TO DISK & WRITE WALKS IN CHUNKS, ONE LAYER IN MEMORY AT A TIME
+            walk_files = mltn2v.timed_invoke("extracting neighborhoods within memory budget",
+                                             lambda: mltn2v.extract_neighborhoods_out_of_core(args.dir, args.walk_length, args.rvals, args.pvals, args.qvals,
+                                                                                              spill_dir, args.memory_budget, thresh=thresh))
+            # GENERATE FEATURES FROM WALKS STREAMED FROM DISK
+            for w in walk_files:
+                out_path = os.path.join(thresh_out, 'r' + str(w) + '/mltn2v_results')
+                mltn2v.timed_invoke("generating features",
+                                    lambda: mltn2v.generate_features(mltn2v.walk_file_sentences(walk_files[w]), args.d, out_path,
+                                                                     nbrhd_size=args.window_size, w2v_iter=args.w2v_iter,
+                                                                     workers=args.w2v_workers, tol=args.w2v_tol,
+                                                                     monitor=args.w2v_monitor, patience=args.w2v_patience))
+                print("\t" + out_path + ".csv")
+    finally:
+        if args.spill_dir is None:
+            shutil.rmtree(spill_root, ignore_errors=True)
+    peak = mltn2v.peak_memory()
+    if peak is not None:
+        print("Peak memory: {:.0f} MB of {:.0f} MB budget".format(peak / 2.0 ** 20, args.memory_budget / 2.0 ** 20))
+        if peak > args.memory_budget:
+            print("[WARNING] Peak memory exceeded the memory budget.")
 
 
 if __name__ == '__main__':
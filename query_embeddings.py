@@ -0,0 +1,108 @@
+'''
+Similarity queries and query server over multi-node2vec embeddings.
+
+Details can be found in the paper: "Fast Embedding of Multilayer Networks: An Algorithm and Application to Group fMRI"
+by JD Wilson, M Baybay, R Sankar, and P Stillman
+
+Preprint here: https://arxiv.org/pdf/1809.06437.pdf
+
+Contributors:
+- Melanie Baybay
+University of San Francisco, Department of Computer Science
+- Rishi Sankar
+Henry M. Gunn High School
+- James D. Wilson (maintainer)
+University of San Francisco, Department of Mathematics and Statistics
+
+Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
+'''
+import os
+import src as mltn2v
+import argparse
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Query multi-node2vec embeddings.")
+
+    parser.add_argument('embeddings', nargs='+',
+                        help='Embedding files (.csv as written by multi_node2vec.py, or .npy). The first file is the reference run.')
+
+    parser.add_argument('--nodes', nargs='*', default=[],
+                        help='Node IDs to query in the reference run.')
+
+    parser.add_argument('--k', type=int, default=10,
+                        help='Number of most similar nodes to return. Default is 10.')
+
+    parser.add_argument('--ann', action='store_true',
+                        help='Use an approximate (LSH) index instead of exact search. Only worthwhile for large embeddings.')
+
+    parser.add_argument('--serve', action='store_true',
+                        help='Serve queries over HTTP instead of exiting.')
+
+    parser.add_argument('--host', nargs='?', default='127.0.0.1',
+                        help='Host of the query server. Default is 127.0.0.1.')
+
+    parser.add_argument('--port', type=int, default=8000,
+                        help='Port of the query server. Default is 8000.')
+
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Report query throughput of each run.')
+
+    args = parser.parse_args()
+    try:
+        args.names = run_names(args.embeddings)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def run_names(paths):
+    '''
+    Names runs after the last two components of their embedding paths, e.g.
+    results/test/r0.25/mltn2v_results.csv -> r0.25/mltn2v_results, extended until the names of all
+    runs differ, e.g. t0.5/r0.25/mltn2v_results and t0.6/r0.25/mltn2v_results.
+    '''
+    parts = [os.path.splitext(os.path.abspath(path))[0].split(os.sep) for path in paths]
+    for n_parts in range(2, max(len(p) for p in parts) + 1):
+        names = ['/'.join(p[-n_parts:]) for p in parts]
+        if len(set(names)) == len(names):
+            return names
+    raise ValueError('Embeddings given more than once: ' + ', '.join(sorted(set(n for n in names if names.count(n) > 1))))
+
+
+def main(args):
+    indexes = {}
+    names = args.names
+    for name, path in zip(names, args.embeddings):
+        indexes[name] = mltn2v.timed_invoke("indexing " + name,
+                                            lambda: mltn2v.EmbeddingIndex.from_file(path, ann=args.ann))
+
+    reference = indexes[names[0]]
+    # rotation of each other run onto the reference run
+    rotations = {}
+    for node in args.nodes:
+        print("\nTop {} nodes similar to node {} in {}:".format(args.k, node, names[0]))
+        for other, score in reference.query(node, args.k):
+            print("\t{}\t{:.4f}".format(other, score))
+        for name in names[1:]:
+            print("Top {} nodes in {} similar to node {} of {}:".format(args.k, names[0], node, name))
+            other_index = indexes[name]
+            if name not in rotations:
+                rotations[name] = mltn2v.procrustes_rotation(other_index.nodes, other_index.vectors, reference.nodes, reference.vectors)
+            result = mltn2v.cross_run_query(reference, other_index.nodes, other_index.vectors, [node], args.k,
+                                            rotation=rotations[name])[0]
+            for other, score in result:
+                print("\t{}\t{:.4f}".format(other, score))
+
+    if args.benchmark:
+        for name in names:
+            print("\nBenchmarking " + name)
+            mltn2v.benchmark_index(indexes[name], k=args.k)
+
+    if args.serve:
+        mltn2v.serve(indexes, args.host, args.port)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args)
@@ -1,2 +1,12 @@
 from .multinode2vec import *
-from .mltn2v_utils import *
\ No newline at end of file
+from .mltn2v_utils import *
+from .mltn2v_checkpoint import *
+from .mltn2v_shard import *
+from .mltn2v_converge import *
+from .mltn2v_query import *
+from .mltn2v_model import *
+from .mltn2v_factorize import *
+from .mltn2v_pipeline import *
+from .mltn2v_outofcore import *
+from .mltn2v_cohort import *
+from .mltn2v_corpus import *
\ No newline at end of file
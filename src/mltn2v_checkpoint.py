@@ -0,0 +1,101 @@
+"""
+Checkpointing helpers for resuming interrupted multi-node2vec runs.
+
+Every checkpoint is written to a temporary file first and then renamed, so that a run killed
+while writing never leaves a partial checkpoint behind.
+
+Details of multi-node2vec can be found in the paper: "Fast Embedding of Multilayer Networks: An Algorithm and Application to Group fMRI"
+by JD Wilson, M Baybay, R Sankar, and P Stillman
+
+Preprint here: https://arxiv.org/pdf/1809.06437.pdf
+
+Contributors:
+- Melanie Baybay
+University of San Francisco, Department of Computer Science
+- Rishi Sankar
+Henry M. Gunn High School
+- James D. Wilson (maintainer)
+University of San Francisco, Department of Mathematics and Statistics
+
+Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
+"""
+
+import hashlib
+import os
+import pickle
+import uuid
+
+
+def save_checkpoint(obj, path):
+    """
+    Pickles an object to path.
+    :param obj: object to save
+    :param path: checkpoint file
+    """
+    tmp_path = checkpoint_tmp_path(path)
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    """
+    Loads an object saved by save_checkpoint().
+    :param path: checkpoint file
+    :return: saved object, or None if there is no checkpoint
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def write_walks(path, walks):
+    """
+    Writes walks to a text file, one walk of space separated node IDs per line.
+    :param path: walk file
+    :param walks: list of walks, represented as lists of node IDs
+    """
+    tmp_path = checkpoint_tmp_path(path)
+    with open(tmp_path, 'w') as f:
+        for walk in walks:
+            f.write(' '.join(walk) + '\n')
+    os.replace(tmp_path, path)
+
+
+def read_walks(path):
+    """
+    Reads walks written by write_walks().
+    :param path: walk file
+    :return: list of walks, represented as lists of node IDs
+    """
+    with open(path) as f:
+        return [line.split() for line in f]
+
+
+def layers_digest(layers):
+    """
+    Digest of the edges of the layers, identifying the network a checkpoint was computed from.
+    :param layers: list of adjacency lists as pandas DataFrames with columns ["source", "target", "weight"]
+    :return: hex digest
+    """
+    import pandas as pd
+    digest = hashlib.sha1()
+    for layer in layers:
+        digest.update(str(len(layer)).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(layer[["source", "target", "weight"]], index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def checkpoint_tmp_path(path):
+    """
+    Temporary path of a checkpoint, creating its directory if needed. The path is unique to the
+    call, so that processes writing the same checkpoint, e.g. on a shared file system, do not
+    write to the same temporary file. It is in the directory of the checkpoint, so that renaming
+    it to the checkpoint is atomic.
+    """
+    dirs = os.path.dirname(path)
+    if dirs:
+        # the directory may be created by a concurrent writer
+        os.makedirs(dirs, exist_ok=True)
+    return '{}.{}.{}.tmp'.format(path, os.getpid(), uuid.uuid4().hex)
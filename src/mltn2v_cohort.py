@@ -0,0 +1,177 @@
+"""
+Embedding of several cohorts (e.g. patients and controls) in one job, in aligned coordinates.
+
+All the layers of all cohorts go into one SharedNeighborhoodGen, so the node index and the
+neighborhoods common to several subjects or cohorts are stored once, and every cohort walks only
+its own layers. The cohorts are then embedded in one coordinate system, in either of two ways:
+
+- joint: a single word2vec model is trained on the walks of all cohorts. In the walks of a cohort,
+  half of the nodes, drawn at random, are replaced by a token of the node tagged with the cohort.
+  Tagged tokens are trained against the untagged tokens shared by all cohorts, whose vectors are
+  the pooled embedding, and the vectors of the tagged tokens of a cohort are its embedding.
+- warm_start: a base model is trained on the pooled walks of all cohorts, then a copy of it is
+  fine-tuned on the walks of each cohort with a lower learning rate. Its vectors are the pooled
+  embedding.
+
+In both cases the embedding of each cohort is finally rotated onto the pooled embedding
+(orthogonal Procrustes), which removes the rotation left between the spaces of the cohorts.
+
+Details of multi-node2vec can be found in the paper: "Fast Embedding of Multilayer Networks: An Algorithm and Application to Group fMRI"
+by JD Wilson, M Baybay, R Sankar, and P Stillman
+
+Preprint here: https://arxiv.org/pdf/1809.06437.pdf
+
+Contributors:
+- Melanie Baybay
+University of San Francisco, Department of Computer Science
+- Rishi Sankar
+Henry M. Gunn High School
+- James D. Wilson (maintainer)
+University of San Francisco, Department of Mathematics and Statistics
+
+Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
+"""
+from .multinode2vec import *
+from .mltn2v_query import align_embeddings
+import copy
+import os
+import numpy as np
+
+# separates the cohort from the node ID in the tagged tokens of joint training
+COHORT_SEP = '::'
+# share of the nodes of a walk replaced by their cohort token in joint training
+JOINT_TAG_RATE = 0.5
+# name of the output of the pooled embedding, next to the cohort outputs
+BASE_NAME = 'base'
+# learning rate of warm-start fine-tuning, relative to the learning rate of the base model
+WARM_START_ALPHA_SCALE = 0.25
+
+
+def cohort_names(network_dirs):
+    """
+    Output names of cohorts: the names of their directories, made unique.
+    """
+    names = []
+    for network_dir in network_dirs:
+        name = os.path.basename(os.path.normpath(network_dir))
+        unique = name
+        i = 1
+        while unique in names or unique == BASE_NAME:
+            unique = "{}_{}".format(name, i)
+            i += 1
+        names.append(unique)
+    return names
+
+
+def run_cohorts(cohort_layers, d, out, rvals, walk_length, p, q, names=None, training='joint', nbrhd_size=10,
+                n_walks=52, w2v_iter=1, workers=8, sg=1):
+    """
+    Embeds several cohorts in aligned coordinates. Results for each r are written to
+    out/<cohort>/r<r>/mltn2v_results, and the pooled embedding to out/base/r<r>/mltn2v_results,
+    in the format of generate_features().
+
+    :param cohort_layers: list of the layers of each cohort, as returned by threshold_layers()
+    :param d: feature dimensionality
+    :param out: output directory
+    :param rvals: list of layer walk parameters
+    :param walk_length: length of each random walk
+    :param p: return walk parameter
+    :param q: exploration walk parameter
+    :param names: output names of the cohorts. Defaults to cohort0, cohort1, ...
+    :param training: 'joint' or 'warm_start'
+    :param nbrhd_size: window size for Skip-Gram optimization
+    :param n_walks: number of walks per node per layer
+    :param w2v_iter: number of word2vec training epochs
+    :param workers: number of workers
+    :param sg: sets word2vec architecture. 1 for Skip-Gram, 0 for CBOW
+    :return: dict of layer walk parameter to dict of cohort name to n x d network embedding
+    """
+    if training not in ('joint', 'warm_start'):
+        raise ValueError('Unknown cohort training "{}". Use joint or warm_start.'.format(training))
+    names = ['cohort' + str(i) for i in range(len(cohort_layers))] if names is None else names
+
+    # one walk engine over the layers of every cohort
+    nbrhd_gen = SharedNeighborhoodGen([layer for layers in cohort_layers for layer in layers], p, q)
+    cohort_gens = []
+    start = 0
+    for layers in cohort_layers:
+        cohort_gens.append(nbrhd_gen.subset(range(start, start + len(layers))))
+        start += len(layers)
+
+    features = {}
+    for w in rvals:
+        cohort_nbrhds = [generate_walks(gen, walk_length, [w], n_walks=n_walks)[w] for gen in cohort_gens]
+        if training == 'joint':
+            embeddings = train_joint(cohort_nbrhds, names, d, nbrhd_size, w2v_iter, workers, sg)
+        else:
+            embeddings = train_warm_start(cohort_nbrhds, names, d, nbrhd_size, w2v_iter, workers, sg)
+        features[w] = {}
+        for name, (nodes, vectors) in embeddings.items():
+            features[w][name] = save_features(nodes, vectors, os.path.join(out, name, 'r' + str(w), 'mltn2v_results'))
+    return features
+
+
+def train_joint(cohort_nbrhds, names, d, nbrhd_size, w2v_iter, workers, sg):
+    """
+    Trains one word2vec model on the walks of all cohorts, with half of the nodes of a walk tagged
+    with its cohort.
+    :return: dict of cohort name (and 'base') to (list of node IDs, numpy array of features)
+    """
+    rng = np.random.RandomState(0)
+    nbrhds = []
+    for name, cohort in zip(names, cohort_nbrhds):
+        for nbrhd in cohort:
+            tagged = rng.rand(len(nbrhd)) < JOINT_TAG_RATE
+            nbrhds.append([name + COHORT_SEP + node if tag else node for node, tag in zip(nbrhd, tagged)])
+    w2v_model = train_word2vec(nbrhds, d, nbrhd_size=nbrhd_size, w2v_iter=w2v_iter, workers=workers, sg=sg)
+
+    base_nodes, base_vectors = model_vectors(w2v_model)
+    embeddings = {BASE_NAME: (base_nodes, base_vectors)}
+    for name in names:
+        nodes, vectors = model_vectors(w2v_model, name)
+        embeddings[name] = (nodes, align_embeddings(nodes, vectors, base_nodes, base_vectors))
+    return embeddings
+
+
+def train_warm_start(cohort_nbrhds, names, d, nbrhd_size, w2v_iter, workers, sg):
+    """
+    Trains a base model on the pooled walks of all cohorts, then fine-tunes a copy of it for each cohort.
+    :return: dict of cohort name (and 'base') to (list of node IDs, numpy array of features)
+    """
+    pooled = [nbrhd for cohort in cohort_nbrhds for nbrhd in cohort]
+    base_model = train_word2vec(pooled, d, nbrhd_size=nbrhd_size, w2v_iter=w2v_iter, workers=workers, sg=sg)
+    base_nodes, base_vectors = model_vectors(base_model)
+
+    embeddings = {BASE_NAME: (base_nodes, base_vectors)}
+    for name, cohort in zip(names, cohort_nbrhds):
+        w2v_model = copy.deepcopy(base_model)
+        w2v_model.alpha = base_model.alpha * WARM_START_ALPHA_SCALE
+        w2v_model.min_alpha = min(base_model.min_alpha, w2v_model.alpha)
+        print("Fine-tuning base model on {} neighborhoods of {}".format(len(cohort), name))
+        for epoch in range(w2v_iter):
+            train_epoch(w2v_model, cohort, len(cohort), epoch, w2v_iter)
+        nodes, vectors = model_vectors(w2v_model)
+        # only the nodes walked in the cohort
+        walked = set(node for nbrhd in cohort for node in nbrhd)
+        rows = [i for i, node in enumerate(nodes) if node in walked]
+        nodes = [nodes[i] for i in rows]
+        embeddings[name] = (nodes, align_embeddings(nodes, vectors[rows], base_nodes, base_vectors))
+    return embeddings
+
+
+def model_vectors(w2v_model, cohort=None):
+    """
+    Node IDs and features of a trained word2vec model, sorted by node ID.
+    :param w2v_model: trained gensim Word2Vec model
+    :param cohort: name of a cohort, to only keep the tokens tagged with it. None keeps the untagged tokens
+    :return: (list of node IDs, numpy array of features)
+    """
+    wv = w2v_model.wv
+    rows = {}
+    for i, token in enumerate(wv.index2word):
+        if cohort is None and COHORT_SEP not in token:
+            rows[token] = i
+        elif cohort is not None and token.startswith(cohort + COHORT_SEP):
+            rows[token[len(cohort) + len(COHORT_SEP):]] = i
+    nodes = sorted(rows)
+    return nodes, np.array(wv.syn0[[rows[node] for node in nodes]])
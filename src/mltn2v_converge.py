@@ -0,0 +1,227 @@
+"""
+Convergence monitoring of word2vec training, for stopping once further epochs no longer move the embedding.
+
+After each epoch, the model is scored by one of three monitors:
+
+- loss: the training loss of the epoch, as reported by word2vec. Its improvement is the relative
+  decrease of the loss from the previous epoch.
+- delta: the change of the node vectors over the epoch, relative to their norm before it, once the
+  vectors before it are rotated onto those after it. word2vec embeddings are only defined up to
+  rotation, so a drift of the whole space does not count as change. Its improvement is the delta
+  itself.
+- reconstruction: the AUC of the dot products of the node vectors on a fixed sample of edges of
+  the parsed layers, against random node pairs that are not an edge of any layer. The sampled
+  edges are held out: they are removed from the layers before walking (remove_edge_pairs()), so
+  that the score measures how well the embedding predicts edges it was not trained on. Its
+  improvement is the increase over the best previous epoch.
+
+Training stops once the improvement has been below a tolerance for a number of epochs in a row
+(the patience), since the scores of single epochs are noisy. The learning rate decays over the
+maximum number of epochs, so a stopped model would keep a high learning rate: it is trained for a
+last epoch over which the learning rate decays to its minimum, as at the end of a full training.
+The per-epoch curve is kept with the model.
+
+Details of multi-node2vec can be found in the paper: "Fast Embedding of Multilayer Networks: An Algorithm and Application to Group fMRI"
+by JD Wilson, M Baybay, R Sankar, and P Stillman
+
+Preprint here: https://arxiv.org/pdf/1809.06437.pdf
+
+Contributors:
+- Melanie Baybay
+University of San Francisco, Department of Computer Science
+- Rishi Sankar
+Henry M. Gunn High School
+- James D. Wilson (maintainer)
+University of San Francisco, Department of Mathematics and Statistics
+
+Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
+"""
+
+import os
+import numpy as np
+from .mltn2v_checkpoint import checkpoint_tmp_path
+from .mltn2v_query import align_embeddings
+
+CONVERGENCE_MONITORS = ['loss', 'delta', 'reconstruction']
+# maximum number of edges, and of non-edges, scored by the reconstruction monitor
+RECONSTRUCTION_PAIRS = 10000
+# maximum share of the distinct layer edges held out for the reconstruction monitor
+RECONSTRUCTION_SHARE = 0.1
+
+
+def sample_edge_pairs(layers, n_pairs=RECONSTRUCTION_PAIRS, share=RECONSTRUCTION_SHARE, seed=0):
+    """
+    Sample of node pairs for the reconstruction monitor: distinct node pairs that are an edge of
+    some layer, drawn uniformly, and as many random node pairs that are not an edge of any layer.
+    The edges are to be held out of the walks with remove_edge_pairs().
+    :param layers: list of adjacency lists as pandas DataFrames with columns ["source", "target", "weight"]
+    :param n_pairs: maximum number of edges, and of non-edges
+    :param share: maximum share of the distinct edges in the sample
+    :param seed: seed of the sample
+    :return: (list of first node IDs, list of second node IDs, array of labels, 1 for edges)
+    """
+    rng = np.random.RandomState(seed)
+    nodes = sorted(set().union(*[set(layer["source"]) | set(layer["target"]) for layer in layers]))
+    node_ids = dict((node, i) for i, node in enumerate(nodes))
+    n_nodes = len(nodes)
+    src = np.concatenate([layer["source"].map(node_ids).values for layer in layers]).astype(np.int64)
+    dst = np.concatenate([layer["target"].map(node_ids).values for layer in layers]).astype(np.int64)
+    # undirected edges as keys of sorted node pairs
+    edge_keys = np.unique(np.minimum(src, dst) * n_nodes + np.maximum(src, dst))
+    if len(src) == 0 or len(edge_keys) * 2 >= n_nodes * (n_nodes - 1):
+        raise ValueError('The reconstruction monitor needs layers with edges and non-edges.')
+
+    n_pairs = min(n_pairs, max(1, int(share * len(edge_keys))))
+    picks = rng.choice(edge_keys, size=n_pairs, replace=False)
+    pairs = [(picks // n_nodes, picks % n_nodes)]
+    n_missing = n_pairs
+    while n_missing > 0:
+        a = rng.randint(n_nodes, size=2 * n_missing)
+        b = rng.randint(n_nodes, size=2 * n_missing)
+        keys = np.minimum(a, b) * n_nodes + np.maximum(a, b)
+        keep = np.flatnonzero((a != b) & ~np.in1d(keys, edge_keys))[:n_missing]
+        pairs.append((a[keep], b[keep]))
+        n_missing -= len(keep)
+    first = np.concatenate([a for a, _ in pairs])
+    second = np.concatenate([b for _, b in pairs])
+    labels = np.zeros(len(first), dtype=np.int8)
+    labels[:n_pairs] = 1
+    return [nodes[i] for i in first], [nodes[i] for i in second], labels
+
+
+def remove_edge_pairs(layers, edge_sample):
+    """
+    Layers without the edges of a sample of node pairs, in either direction, so that they are
+    held out of the walks.
+    :param layers: list of adjacency lists as pandas DataFrames with columns ["source", "target", "weight"]
+    :param edge_sample: sample of node pairs, as returned by sample_edge_pairs()
+    :return: list of adjacency lists
+    """
+    first, second, labels = edge_sample
+    held_out = set()
+    for a, b, label in zip(first, second, labels):
+        if label == 1:
+            held_out.add((a, b))
+            held_out.add((b, a))
+    kept = []
+    for layer in layers:
+        keep = np.array([pair not in held_out for pair in zip(layer["source"], layer["target"])], dtype=bool)
+        kept.append(layer[keep].reset_index(drop=True))
+    print("Held out {} edges of the layers for the reconstruction monitor".format(len(held_out) // 2))
+    return kept
+
+
+def edge_auc(vectors, rows, edge_sample):
+    """
+    AUC of the dot products of node vectors at telling the edges of a sample from its non-edges.
+    :param vectors: numpy array of features, (N x d)
+    :param rows: dict of node ID to row of vectors
+    :param edge_sample: sample of node pairs, as returned by sample_edge_pairs()
+    """
+    first, second, labels = edge_sample
+    known = [i for i, (a, b) in enumerate(zip(first, second)) if a in rows and b in rows]
+    a = np.array([rows[first[i]] for i in known], dtype=np.int64)
+    b = np.array([rows[second[i]] for i in known], dtype=np.int64)
+    labels = labels[known]
+    scores = np.einsum('ij,ij->i', vectors[a].astype(np.float64), vectors[b].astype(np.float64))
+    n_pos = int(labels.sum())
+    n_neg = len(labels) - n_pos
+    if n_pos == 0 or n_neg == 0:
+        return float('nan')
+    # Mann-Whitney U statistic from the ranks of the scores
+    ranks = np.empty(len(scores))
+    ranks[np.argsort(scores, kind='mergesort')] = np.arange(1, len(scores) + 1)
+    return (ranks[labels == 1].sum() - n_pos * (n_pos + 1) / 2.0) / (n_pos * n_neg)
+
+
+class ConvergenceMonitor():
+    """
+    Scores a word2vec model after each epoch and tells when training has converged. The curve,
+    a list of (epoch, score, improvement, seconds), is kept on the model as mltn2v_curve, so that
+    it is saved with its checkpoints and resumed with them.
+    """
+    def __init__(self, monitor='delta', tol=1e-3, patience=2, edge_sample=None):
+        '''
+        :param monitor: 'loss', 'delta' or 'reconstruction'
+        :param tol: improvement below which an epoch counts towards convergence
+        :param patience: number of epochs in a row with an improvement below tol before training stops
+        :param edge_sample: sample of node pairs, as returned by sample_edge_pairs(). Required by
+                the reconstruction monitor
+        '''
+        if monitor not in CONVERGENCE_MONITORS:
+            raise ValueError('Unknown convergence monitor "{}". Use one of {}.'.format(monitor, ', '.join(CONVERGENCE_MONITORS)))
+        if monitor == 'reconstruction' and edge_sample is None:
+            raise ValueError('The reconstruction monitor needs a sample of edges of the layers.')
+        self.monitor = monitor
+        self.tol = tol
+        self.patience = patience
+        self.edge_sample = edge_sample
+        self.rows = None
+        self.prev_vectors = None
+
+    def start(self, w2v_model):
+        '''
+        Prepares a model with a built vocabulary, or resumed from a checkpoint, for monitoring.
+        '''
+        if not hasattr(w2v_model, 'mltn2v_curve'):
+            w2v_model.mltn2v_curve = []
+        if self.monitor == 'loss':
+            w2v_model.compute_loss = True
+            w2v_model.running_training_loss = 0.0
+        elif self.monitor == 'delta':
+            self.prev_vectors = np.array(w2v_model.wv.syn0, dtype=np.float64)
+        else:
+            self.rows = dict((node, i) for i, node in enumerate(w2v_model.wv.index2word))
+
+    def update(self, w2v_model, epoch, seconds):
+        '''
+        Scores the model after an epoch and logs it.
+        :param epoch: number of epochs trained so far
+        :param seconds: training time of the epoch
+        :return: True if the improvement has been below the tolerance for patience epochs in a row
+        '''
+        curve = w2v_model.mltn2v_curve
+        if self.monitor == 'loss':
+            score = float(w2v_model.get_latest_training_loss())
+            # the loss accumulates over calls to train() in some versions of gensim
+            w2v_model.running_training_loss = 0.0
+            prev = curve[-1][1] if curve else None
+            improvement = None if not prev else (prev - score) / abs(prev)
+        elif self.monitor == 'delta':
+            vectors = np.array(w2v_model.wv.syn0, dtype=np.float64)
+            rows = np.arange(len(vectors))
+            prev = align_embeddings(rows, self.prev_vectors, rows, vectors)
+            score = np.linalg.norm(vectors - prev) / max(np.linalg.norm(prev), 1e-12)
+            improvement = score
+            self.prev_vectors = vectors
+        else:
+            score = edge_auc(w2v_model.wv.syn0, self.rows, self.edge_sample)
+            improvement = score - max(entry[1] for entry in curve) if curve else None
+        curve.append((epoch, score, improvement, seconds))
+        print("Epoch {}: {}={:.6g}, improvement={} ({:.2f} secs)".format(
+            epoch, self.monitor, score, 'n/a' if improvement is None else '{:.6g}'.format(improvement), seconds))
+        n_flat = 0
+        for entry in reversed(curve):
+            # an epoch without a finite improvement (e.g. a NaN AUC or loss) does not count as flat
+            if entry[2] is None or not np.isfinite(entry[2]) or entry[2] >= self.tol:
+                break
+            n_flat += 1
+        return n_flat >= self.patience
+
+
+def write_convergence_curve(curve, out, monitor):
+    """
+    Writes the per-epoch convergence curve of a model to out_convergence.csv.
+    :param curve: list of (epoch, score, improvement, seconds), as kept by ConvergenceMonitor
+    :param out: absolute path for output file (no extension, file type)
+    :param monitor: name of the convergence monitor
+    :return: path of the curve file
+    """
+    path = out + "_convergence.csv"
+    tmp_path = checkpoint_tmp_path(path)
+    with open(tmp_path, 'w') as f:
+        f.write("epoch,{},improvement,seconds\n".format(monitor))
+        for epoch, score, improvement, seconds in curve:
+            f.write("{},{!r},{},{:.3f}\n".format(epoch, float(score), '' if improvement is None else repr(float(improvement)), seconds))
+    os.replace(tmp_path, path)
+    return path
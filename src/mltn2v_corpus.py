@@ -0,0 +1,240 @@
+"""
+Layer-tagged walk corpora, for embedding subgroups of layers without walking again.
+
+Along with each walk, the corpus keeps its start layer and the layer each of its steps was taken
+in. The neighborhoods of a subgroup of layers (e.g. the subjects of one sex, age band or site)
+can then be taken from the corpus of the whole network and trained on directly: the runs of
+consecutive steps of the walks in the subgroup, or whole walks selected by their start layer or
+re-weighted by their share of steps in the subgroup.
+
+Details of multi-node2vec can be found in the paper: "Fast Embedding of Multilayer Networks: An Algorithm and Application to Group fMRI"
+by JD Wilson, M Baybay, R Sankar, and P Stillman
+
+Preprint here: https://arxiv.org/pdf/1809.06437.pdf
+
+Contributors:
+- Melanie Baybay
+University of San Francisco, Department of Computer Science
+- Rishi Sankar
+Henry M. Gunn High School
+- James D. Wilson (maintainer)
+University of San Francisco, Department of Mathematics and Statistics
+
+Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
+"""
+from .multinode2vec import *
+import os
+import numpy as np
+
+# ways of selecting whole walks of a subgroup of layers
+WALK_MODES = ['start', 'all', 'reweight']
+# ways of taking the neighborhoods of a subgroup of layers, the first being the default
+SUBGROUP_MODES = ['runs'] + WALK_MODES
+# mean share of steps in the subgroup below which the subgroup neighborhoods mostly reflect other layers
+SUBGROUP_SHARE_WARNING = 0.5
+
+
+class WalkCorpus():
+    """
+    Walks with the layer of each of their steps, stored as flat arrays: walk i has the nodes
+    nodes[steps[offsets[i]:offsets[i+1]]], and its j-th node was reached in layer
+    step_layers[offsets[i] + j]. The layer of its first node is the start layer.
+    """
+    def __init__(self, nodes, layer_names, steps, step_layers, offsets):
+        self.nodes = nodes
+        self.layer_names = layer_names
+        self.steps = steps
+        self.step_layers = step_layers
+        self.offsets = offsets
+
+    @classmethod
+    def from_walks(cls, walks, walk_layers, layer_names):
+        '''
+        :param walks: list of walks, represented as lists of node IDs
+        :param walk_layers: list of the layer ids of the nodes of each walk
+        :param layer_names: names of the layers, e.g. their file names
+        '''
+        nodes = sorted(set(node for walk in walks for node in walk))
+        node_ids = dict((node, i) for i, node in enumerate(nodes))
+        offsets = np.zeros(len(walks) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(walk) for walk in walks])
+        steps = np.fromiter((node_ids[node] for walk in walks for node in walk), dtype=np.int32, count=offsets[-1])
+        # the smallest type holding every layer id
+        step_layers = np.fromiter((layer for layers in walk_layers for layer in layers),
+                                  dtype=np.min_scalar_type(max(len(layer_names) - 1, 0)), count=offsets[-1])
+        return cls(nodes, list(layer_names), steps, step_layers, offsets)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as corpus:
+            return cls([str(node) for node in corpus['nodes']], [str(name) for name in corpus['layer_names']],
+                       corpus['steps'], corpus['step_layers'], corpus['offsets'])
+
+    def save(self, path):
+        tmp_path = checkpoint_tmp_path(path)
+        # through a file object, since np.savez appends .npz to a path without it
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, nodes=np.array(self.nodes), layer_names=np.array(self.layer_names),
+                                steps=self.steps, step_layers=self.step_layers, offsets=self.offsets)
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def layer_ids(self, layer_names):
+        '''
+        Ids of layers given by file name, with or without extension. Names must match the whole
+        file name, e.g. 0040013.preprocess_v1 for 0040013.preprocess_v1.csv.
+        '''
+        ids = {}
+        for i, name in enumerate(self.layer_names):
+            ids[name] = i
+            ids.setdefault(os.path.splitext(name)[0], i)
+        missing = [name for name in layer_names if name not in ids]
+        if missing:
+            raise ValueError('Layers not in the walk corpus: ' + ', '.join(missing))
+        return sorted(set(ids[name] for name in layer_names))
+
+    def subgroup_share(self, layer_ids):
+        '''
+        Share of the nodes of each walk reached in the given layers, counting the start node.
+        '''
+        in_subgroup = np.zeros(len(self.layer_names), dtype=bool)
+        in_subgroup[layer_ids] = True
+        lengths = np.diff(self.offsets)
+        hits = np.add.reduceat(in_subgroup[self.step_layers].astype(np.int64), self.offsets[:-1]) if len(self) else lengths
+        return hits / np.maximum(lengths, 1).astype(float)
+
+    def select(self, layer_ids, mode='start', seed=0):
+        '''
+        Walks of a subgroup of layers.
+        :param layer_ids: ids of the layers of the subgroup
+        :param mode: 'start' keeps the walks starting in the subgroup, 'all' the walks that never
+                leave it, and 'reweight' keeps each walk with probability equal to its share of
+                nodes reached in the subgroup
+        :param seed: seed of the reweight sampling
+        :return: array of walk indices
+        '''
+        if mode == 'start':
+            in_subgroup = np.zeros(len(self.layer_names), dtype=bool)
+            in_subgroup[layer_ids] = True
+            return np.flatnonzero(in_subgroup[self.step_layers[self.offsets[:-1]]])
+        share = self.subgroup_share(layer_ids)
+        if mode == 'all':
+            return np.flatnonzero(share == 1)
+        if mode == 'reweight':
+            return np.flatnonzero(np.random.RandomState(seed).rand(len(self)) < share)
+        raise ValueError('Unknown subgroup mode "{}". Use one of {}.'.format(mode, ', '.join(WALK_MODES)))
+
+    def runs(self, layer_ids, min_length=1):
+        '''
+        Runs of consecutive nodes of the walks reached in the given layers, counting the start node.
+        :param layer_ids: ids of the layers of the subgroup
+        :param min_length: minimum number of nodes of a run. Shorter runs are dropped
+        :return: (starts, ends) arrays of positions in steps, run k having the nodes steps[starts[k]:ends[k]]
+        '''
+        in_subgroup = np.zeros(len(self.layer_names), dtype=bool)
+        in_subgroup[layer_ids] = True
+        inside = in_subgroup[self.step_layers]
+        # runs are also cut between walks
+        walk_start = np.zeros(len(inside) + 1, dtype=bool)
+        walk_start[self.offsets] = True
+        inside_before = np.concatenate([[False], inside[:-1]]) & ~walk_start[:-1]
+        inside_after = np.concatenate([inside[1:], [False]]) & ~walk_start[1:]
+        starts = np.flatnonzero(inside & ~inside_before)
+        ends = np.flatnonzero(inside & ~inside_after) + 1
+        keep = ends - starts >= min_length
+        return starts[keep], ends[keep]
+
+    def subgroup_neighborhoods(self, layer_ids, mode='runs', min_length=1, seed=0):
+        '''
+        Neighborhoods of a subgroup of layers, for generate_features().
+        :param layer_ids: ids of the layers of the subgroup
+        :param mode: 'runs' cuts the walks into their runs in the subgroup (see runs()), the other
+                modes keep whole walks (see select())
+        :param min_length: minimum number of nodes of a run, e.g. the word2vec window
+        :param seed: seed of the reweight sampling
+        :return: (list of neighborhoods, mean share of their nodes reached in the subgroup)
+        '''
+        if mode == 'runs':
+            starts, ends = self.runs(layer_ids, min_length)
+            nodes = self.nodes
+            nbrhds = [[nodes[i] for i in self.steps[start:end]] for start, end in zip(starts, ends)]
+            return nbrhds, 1.0 if nbrhds else 0.0
+        walk_ids = self.select(layer_ids, mode=mode, seed=seed)
+        share = self.subgroup_share(layer_ids)[walk_ids]
+        return self.neighborhoods(walk_ids), float(share.mean()) if len(walk_ids) else 0.0
+
+    def neighborhoods(self, walk_ids=None):
+        '''
+        Walks as lists of node IDs, for generate_features().
+        :param walk_ids: indices of the walks. Defaults to all walks
+        '''
+        walk_ids = range(len(self)) if walk_ids is None else walk_ids
+        nodes = self.nodes
+        return [[nodes[i] for i in self.steps[self.offsets[k]:self.offsets[k + 1]]] for k in walk_ids]
+
+
+def generate_tagged_walks(nbrhd_gen, nbrhd_size, wvals, layer_names, n_walks=52):
+    """
+    Generates the neighborhoods of generate_walks(), recording the layer of each step.
+    :param nbrhd_gen: NeighborhoodGen or SharedNeighborhoodGen, as returned by build_neighborhood_gen()
+    :param nbrhd_size: length of each random walk
+    :param wvals: list of layer walk parameters
+    :param layer_names: names of the layers, e.g. their file names
+    :param n_walks: number of walks per node per layer
+    :return: dict of layer walk parameter to WalkCorpus
+    """
+    corpora = {}
+    for w in wvals:
+        walks = []
+        walk_layers = []
+        for i in range(nbrhd_gen.layer_count()):
+            for node in nbrhd_gen.start_nodes(i):
+                for j in range(n_walks):
+                    layers = []
+                    walks.append(nbrhd_gen.multinode2vec_walk(w, nbrhd_size, node, i, walk_layers=layers))
+                    walk_layers.append(layers)
+        print("Finished nbrhd generation for r=" + str(w))
+        corpora[w] = WalkCorpus.from_walks(walks, walk_layers, layer_names)
+    return corpora
+
+
+def extract_walk_corpus(layers, nbrhd_size, wvals, p, q, layer_names, corpus_dir, shared=False):
+    """
+    Generates the neighborhoods of extract_neighborhoods_walk() and saves them, with the layer of
+    each step, to corpus_dir.
+    :param layers: list of adjacency lists as pandas DataFrames with columns ["source", "target", "weight"]
+    :param nbrhd_size: length of each random walk
+    :param wvals: list of layer walk parameters
+    :param p: return walk parameter
+    :param q: exploration walk parameter
+    :param layer_names: names of the layers, e.g. their file names
+    :param corpus_dir: directory of the walk corpora, one per layer walk parameter
+    :param shared: use a SharedNeighborhoodGen, see build_neighborhood_gen()
+    :return: dict of layer walk parameter to list of neighborhoods
+    """
+    nbrhd_gen = build_neighborhood_gen(layers, p, q, shared=shared)
+    corpora = generate_tagged_walks(nbrhd_gen, nbrhd_size, wvals, layer_names)
+    neighborhood_dict = {}
+    for w in corpora:
+        corpora[w].save(corpus_path(corpus_dir, w))
+        neighborhood_dict[w] = corpora[w].neighborhoods()
+    return neighborhood_dict
+
+
+def corpus_path(corpus_dir, w):
+    """
+    Walk corpus file of a layer walk parameter.
+    """
+    return os.path.join(corpus_dir, 'r' + str(w) + '.npz')
+
+
+def read_subgroup(values):
+    """
+    Layers of a subgroup, given as layer file names or as a single text file listing one name per line.
+    """
+    if len(values) == 1 and os.path.isfile(values[0]):
+        with open(values[0]) as f:
+            return [line.strip() for line in f if line.strip()]
+    return list(values)
@@ -0,0 +1,170 @@
+"""
+Walk-free multi-node2vec by matrix factorization.
+
+Instead of sampling random walks and fitting Skip-Gram by SGD, the co-occurrence counts that
+Skip-Gram would see in the walks are computed in closed form from the multilayer transition
+operator, and the shifted PPMI matrix of these counts is factorized by truncated SVD (as in
+NetMF, Qiu et al., "Network Embedding as Matrix Factorization", WSDM 2018). This is
+deterministic and, for the few hundred nodes of fMRI atlases, much faster than walking.
+
+The transition operator is that of multinode2vec_walk() with p = q = 1: at each step the walk
+switches, with probability r, to a uniformly chosen other layer, then moves to a neighbor of the
+current node in the current layer. It differs from the walks in two ways:
+
+- a node without neighbors in a layer moves as in the average of the layers where it has
+  neighbors, which approximates the forced layer switch of the walker, and
+- pairs are counted from every step of a walk, including the last steps of the walk, which have
+  fewer than nbrhd_size steps after them.
+
+For layers in which every node has neighbors, the co-occurrences are otherwise exact.
+
+Details of multi-node2vec can be found in the paper: "Fast Embedding of Multilayer Networks: An Algorithm and Application to Group fMRI"
+by JD Wilson, M Baybay, R Sankar, and P Stillman
+
+Preprint here: https://arxiv.org/pdf/1809.06437.pdf
+
+Contributors:
+- Melanie Baybay
+University of San Francisco, Department of Computer Science
+- Rishi Sankar
+Henry M. Gunn High School
+- James D. Wilson (maintainer)
+University of San Francisco, Department of Mathematics and Statistics
+
+Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
+"""
+from .multinode2vec import *
+import numpy as np
+
+
+def factorize_features(layers, d, out, r=0.25, nbrhd_size=10, walk_length=100, negative=5):
+    """
+    Generates d features for each unique node in a multilayer network by factorizing the
+    closed-form Skip-Gram co-occurrence matrix of its random walks. Output is written in the
+    same format as generate_features().
+
+    :param layers: list of adjacency lists as pandas DataFrames with columns ["source", "target", "weight"]
+    :param d: feature dimensionality
+    :param out: absolute path for output file (no extension, file type)
+    :param r: layer walk parameter
+    :param nbrhd_size: window size for Skip-Gram optimization
+    :param walk_length: length of the random walks being modeled
+    :param negative: number of negative samples of the modeled Skip-Gram
+    :return: n x d network embedding
+    """
+    nodes, vectors = factorize_embedding(layers, d, r=r, nbrhd_size=nbrhd_size,
+                                         walk_length=walk_length, negative=negative)
+    return save_features(nodes, vectors, out)
+
+
+def factorize_embedding(layers, d, r=0.25, nbrhd_size=10, walk_length=100, negative=5):
+    """
+    Computes the factorization embedding without writing any output.
+    :return: (list of node IDs, numpy array of features (N x d))
+    """
+    nodes, transitions, starts = layer_transitions(layers)
+    cooccurrence = walk_cooccurrence(transitions, starts, r, nbrhd_size, walk_length)
+    if d > len(nodes):
+        print("[WARNING] Dimensionality {} exceeds the number of nodes. Using d={}.".format(d, len(nodes)))
+        d = len(nodes)
+    return nodes, factorize_ppmi(cooccurrence, d, negative)
+
+
+def layer_transitions(layers):
+    """
+    Dense transition matrices of the layers over their union of nodes.
+    :param layers: list of adjacency lists as pandas DataFrames with columns ["source", "target", "weight"]
+    :return: (sorted list of node IDs, L x N x N array of row-stochastic transition matrices,
+              L x N array of walk start indicators, 1 where a node has an edge in a layer)
+    """
+    nodes = sorted(set().union(*[set(layer["source"]) | set(layer["target"]) for layer in layers]))
+    node_ids = dict((node, i) for i, node in enumerate(nodes))
+    n_layers, n_nodes = len(layers), len(nodes)
+
+    transitions = np.zeros((n_layers, n_nodes, n_nodes))
+    for l, layer in enumerate(layers):
+        src = layer["source"].map(node_ids).values
+        tgt = layer["target"].map(node_ids).values
+        # layers are undirected graphs
+        transitions[l, src, tgt] = layer["weight"].values
+        transitions[l, tgt, src] = layer["weight"].values
+    degrees = transitions.sum(axis=2)
+    starts = (degrees > 0).astype(float)
+    transitions /= np.where(degrees > 0, degrees, 1)[:, :, None]
+
+    # nodes without neighbors in a layer move as in the average of their other layers
+    n_active = starts.sum(axis=0)
+    consensus = transitions.sum(axis=0) / np.where(n_active > 0, n_active, 1)[:, None]
+    dangling = np.nonzero(starts == 0)
+    transitions[dangling] = consensus[dangling[1]]
+    return nodes, transitions, starts
+
+
+def walk_cooccurrence(transitions, starts, r, nbrhd_size, walk_length):
+    """
+    Expected Skip-Gram co-occurrence counts of node pairs in the multilayer random walks,
+    up to a constant factor.
+    :param transitions: L x N x N array of transition matrices, as returned by layer_transitions()
+    :param starts: L x N array of walk start indicators
+    :param r: layer walk parameter
+    :param nbrhd_size: window size for Skip-Gram optimization
+    :param walk_length: length of the random walks
+    :return: N x N symmetric co-occurrence matrix
+    """
+    # average distribution of the walker over (layer, node) states along a walk
+    state = starts / starts.sum()
+    occupancy = np.zeros_like(state)
+    for step in range(walk_length):
+        occupancy += state
+        state = multilayer_step(state[:, None, :], transitions, r)[:, 0, :]
+    occupancy /= walk_length
+
+    # joint[l, u, v]: probability of being at node u now and at (l, v) after k steps
+    joint = np.zeros(transitions.shape)
+    n_nodes = transitions.shape[1]
+    joint[:, np.arange(n_nodes), np.arange(n_nodes)] = occupancy
+    cooccurrence = np.zeros(transitions.shape[1:])
+    for k in range(1, nbrhd_size + 1):
+        joint = multilayer_step(joint, transitions, r)
+        # word2vec samples its window size uniformly, so pairs k steps apart are seen with
+        # probability (nbrhd_size - k + 1) / nbrhd_size
+        cooccurrence += (nbrhd_size - k + 1) / float(nbrhd_size) * joint.sum(axis=0)
+    return cooccurrence + cooccurrence.T
+
+
+def multilayer_step(mass, transitions, r):
+    """
+    One step of the multilayer walk: switch to another layer with probability r, then move
+    within the layer.
+    :param mass: L x M x N array of probability mass over (layer, node) states, for M walk origins
+    :param transitions: L x N x N array of transition matrices
+    :param r: layer walk parameter
+    :return: L x M x N array of probability mass after the step
+    """
+    n_layers = transitions.shape[0]
+    if n_layers > 1:
+        total = mass.sum(axis=0)
+        mass = (1 - r) * mass + r / (n_layers - 1) * (total[None, :, :] - mass)
+    return np.stack([np.dot(mass[l], transitions[l]) for l in range(n_layers)])
+
+
+def factorize_ppmi(cooccurrence, d, negative=5):
+    """
+    Truncated SVD of the shifted positive PMI matrix of co-occurrence counts, which Skip-Gram
+    with negative sampling implicitly factorizes.
+    :param cooccurrence: N x N co-occurrence matrix
+    :param d: feature dimensionality
+    :param negative: number of negative samples
+    :return: numpy array of features (N x d)
+    """
+    total = cooccurrence.sum()
+    marginals = cooccurrence.sum(axis=1)
+    marginals[marginals == 0] = 1
+    pmi = cooccurrence * total / (np.outer(marginals, marginals) * negative)
+    ppmi = np.log(np.maximum(pmi, 1))
+    u, s, vt = np.linalg.svd(ppmi)
+    vectors = u[:, :d] * np.sqrt(s[:d])
+    # fix the sign of each component, so that the output does not depend on the LAPACK build
+    signs = np.sign(vectors[np.abs(vectors).argmax(axis=0), np.arange(d)])
+    signs[signs == 0] = 1
+    return vectors * signs
@@ -0,0 +1,126 @@
+"""
+Library interface of the multi-node2vec algorithm.
+
+Details can be found in the paper: "Fast Embedding of Multilayer Networks: An Algorithm and Application to Group fMRI"
+by JD Wilson, M Baybay, R Sankar, and P Stillman
+
+Preprint here: https://arxiv.org/pdf/1809.06437.pdf
+
+Contributors:
+- Melanie Baybay
+University of San Francisco, Department of Computer Science
+- Rishi Sankar
+Henry M. Gunn High School
+- James D. Wilson (maintainer)
+University of San Francisco, Department of Mathematics and Statistics
+
+Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
+"""
+from .multinode2vec import *
+
+
+class MultiNode2Vec():
+    """
+    Reusable multi-node2vec pipeline working on in-memory layers.
+
+    The layer graphs and alias tables of the random walks are built once by set_layers() (or
+    the first fit()) and kept warm, so that walks, refits with other r values and transforms
+    never re-read or re-preprocess the layers. Nothing is written to disk.
+
+    Example:
+        model = MultiNode2Vec(d=100, r=0.25).fit(layers, nodes=roi_ids)
+        model.embedding_          # N x d pandas DataFrame, indexed by node ID
+        model.transform(["1", "2"])
+    """
+    def __init__(self, d=100, walk_length=100, window_size=10, n_walks=52, r=0.25, p=1, q=0.5,
+                 thresh=0.5, binary=True, w2v_iter=1, workers=8, sg=1):
+        '''
+        :param d: feature dimensionality
+        :param walk_length: length of each random walk
+        :param window_size: window size for Skip-Gram optimization
+        :param n_walks: number of walks per node per layer
+        :param r: layer walk parameter
+        :param p: return walk parameter
+        :param q: exploration walk parameter
+        :param thresh: threshold for edge weights. Weights <= thresh are dropped. None keeps all weights
+        :param binary: boolean of whether or not to convert edge weights to binary
+        :param w2v_iter: number of word2vec training epochs
+        :param workers: number of workers
+        :param sg: sets word2vec architecture. 1 for Skip-Gram, 0 for CBOW
+        '''
+        self.d = d
+        self.walk_length = walk_length
+        self.window_size = window_size
+        self.n_walks = n_walks
+        self.r = r
+        self.p = p
+        self.q = q
+        self.thresh = thresh
+        self.binary = binary
+        self.w2v_iter = w2v_iter
+        self.workers = workers
+        self.sg = sg
+
+        self.layers_ = None
+        self.nbrhd_gen_ = None
+        self.model_ = None
+        self.embedding_ = None
+
+    def set_layers(self, layers, nodes=None):
+        '''
+        Thresholds the layers and preprocesses the random walks over them.
+        :param layers: list of layers, as numpy arrays, scipy sparse matrices or pandas DataFrames
+                (adjacency matrices or adjacency lists with 'source', 'target', 'weight' columns)
+        :param nodes: node IDs of the rows and columns of numpy and scipy layers
+        :return: self
+        '''
+        weighted_layers = [to_weighted_edgelist(layer, nodes) for layer in layers]
+        self.layers_ = threshold_layers(weighted_layers, thresh=self.thresh, binary=self.binary)
+        self.nbrhd_gen_ = build_neighborhood_gen(self.layers_, self.p, self.q)
+        self.model_ = None
+        self.embedding_ = None
+        return self
+
+    def walks(self, r=None):
+        '''
+        Generates the neighborhoods of the current layers.
+        :param r: layer walk parameter. Defaults to the r of the pipeline
+        :return: list of neighborhoods, represented as lists of node IDs
+        '''
+        if self.nbrhd_gen_ is None:
+            raise ValueError("No layers set. Call set_layers() or fit() first.")
+        r = self.r if r is None else r
+        return generate_walks(self.nbrhd_gen_, self.walk_length, [r], n_walks=self.n_walks)[r]
+
+    def fit(self, layers=None, nodes=None, r=None):
+        '''
+        Learns the embedding. Without layers, the preprocessed layers of the last call are reused.
+        :param layers: list of layers, see set_layers()
+        :param nodes: node IDs of the rows and columns of numpy and scipy layers
+        :param r: layer walk parameter. Defaults to the r of the pipeline
+        :return: self
+        '''
+        if layers is not None:
+            self.set_layers(layers, nodes)
+        nbrhds = self.walks(r)
+        self.model_ = train_word2vec(nbrhds, self.d, nbrhd_size=self.window_size, w2v_iter=self.w2v_iter,
+                                     workers=self.workers, sg=self.sg)
+        self.embedding_ = model_to_pandas(self.model_)
+        return self
+
+    def transform(self, nodes=None):
+        '''
+        Features of the given nodes.
+        :param nodes: node IDs. Defaults to all nodes
+        :return: pandas DataFrame, (len(nodes) x d), indexed by node ID
+        '''
+        if self.embedding_ is None:
+            raise ValueError("Model is not fitted. Call fit() first.")
+        if nodes is None:
+            return self.embedding_
+        # node IDs may have been parsed into numbers, see model_to_pandas()
+        rows = dict((str(node), i) for i, node in enumerate(self.embedding_.index))
+        return self.embedding_.iloc[[rows[str(node)] for node in nodes]]
+
+    def fit_transform(self, layers=None, nodes=None, r=None):
+        return self.fit(layers, nodes, r).transform()
@@ -0,0 +1,149 @@
+"""
+Out-of-core multi-node2vec under a memory budget.
+
+Layers are parsed one at a time and spilled to memory-mapped files, walks only map the layers
+they visit, and walks are written to disk in chunks and streamed from there into word2vec. Peak
+memory then depends on the budget rather than on the number of layers.
+
+Details of multi-node2vec can be found in the paper: "Fast Embedding of Multilayer Networks: An Algorithm and Application to Group fMRI"
+by JD Wilson, M Baybay, R Sankar, and P Stillman
+
+Preprint here: https://arxiv.org/pdf/1809.06437.pdf
+
+Contributors:
+- Melanie Baybay
+University of San Francisco, Department of Computer Science
+- Rishi Sankar
+Henry M. Gunn High School
+- James D. Wilson (maintainer)
+University of San Francisco, Department of Mathematics and Statistics
+
+Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
+"""
+from .multinode2vec import *
+from .nbrhd_gen_walk_csr import *
+import os
+
+# share of the memory budget for mapped layers, and for walks buffered before being written
+LAYER_BUDGET_SHARE = 0.5
+WALK_BUFFER_SHARE = 0.1
+# approximate memory of one step of a buffered walk (a python int in a list)
+WALK_STEP_BYTES = 40
+
+
+def parse_memory_size(size):
+    """
+    Parses a memory size such as 512M, 8G or 1073741824.
+    :param size: number of bytes, optionally followed by K, M, G or T
+    :return: number of bytes
+    """
+    units = {'K': 2 ** 10, 'M': 2 ** 20, 'G': 2 ** 30, 'T': 2 ** 40}
+    size = str(size).strip().upper().rstrip('B')
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+def peak_memory():
+    """
+    Peak resident memory of the process in bytes, or None where it cannot be measured.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def spill_layers(network_dir, spill_dir, p, q, thresh=None, binary=True):
+    """
+    Parses, thresholds and spills each layer to disk in turn, so that a single layer is held in memory at once.
+    :param network_dir: directory of adjacency matrix files
+    :param spill_dir: directory for the layer files
+    :param p: return walk parameter
+    :param q: exploration walk parameter
+    :param thresh: threshold for edge weights. Weights <= thresh are dropped
+    :param binary: boolean of whether or not to convert edge weights to binary
+    :return: (list of layer directories, list of node IDs of the shared node index)
+    """
+    network_dir = expand_path(network_dir)
+    node_ids = {}
+    layer_dirs = []
+    for network_file in sorted(os.listdir(network_dir)):
+        file_path = os.path.join(network_dir, network_file)
+        try:
+            layer = read_weighted_layer(file_path)
+            if layer is None:
+                return None, None
+        except Exception as e:
+            print('[ERROR] Could not read file "{}": {} '.format(file_path, e))
+            continue
+        layer = threshold_layers([layer], thresh=thresh, binary=binary)[0]
+        layer_dir = os.path.join(spill_dir, 'layer' + str(len(layer_dirs)))
+        spill_layer(layer, node_ids, p, q, layer_dir)
+        layer_dirs.append(layer_dir)
+    nodes = [None] * len(node_ids)
+    for node, i in node_ids.items():
+        nodes[i] = node
+    return layer_dirs, nodes
+
+
+def extract_neighborhoods_out_of_core(network_dir, nbrhd_size, wvals, p, q, spill_dir, memory_budget,
+                                      thresh=None, binary=True, n_walks=52):
+    """
+    Generates the neighborhoods of extract_neighborhoods_walk() within a memory budget, writing
+    them to disk instead of returning them.
+    :param network_dir: directory of adjacency matrix files
+    :param nbrhd_size: length of each random walk
+    :param wvals: list of layer walk parameters
+    :param p: return walk parameter
+    :param q: exploration walk parameter
+    :param spill_dir: directory for the layer and walk files
+    :param memory_budget: memory budget in bytes
+    :param thresh: threshold for edge weights. Weights <= thresh are dropped
+    :param binary: boolean of whether or not to convert edge weights to binary
+    :param n_walks: number of walks per node per layer
+    :return: dict of layer walk parameter to walk file, one walk of space separated node IDs per line
+    """
+    layer_dirs, nodes = spill_layers(network_dir, spill_dir, p, q, thresh=thresh, binary=binary)
+    if not layer_dirs:
+        return {}
+    nbrhd_gen = MemmapNeighborhoodGen(layer_dirs, int(memory_budget * LAYER_BUDGET_SHARE))
+    chunk_size = max(1, int(memory_budget * WALK_BUFFER_SHARE / (nbrhd_size * WALK_STEP_BYTES)))
+
+    walk_files = {}
+    for w in wvals:
+        walk_file = os.path.join(spill_dir, 'walks_r' + str(w) + '.txt')
+        tmp_file = checkpoint_tmp_path(walk_file)
+        starts = []
+        with open(tmp_file, 'w') as f:
+            # each chunk of walks is simulated as one batch, which maps a layer once for all its walks
+            for i in range(len(layer_dirs)):
+                for node in nbrhd_gen.start_nodes(i):
+                    starts.extend([(int(node), i)] * n_walks)
+                    if len(starts) >= chunk_size:
+                        write_walk_chunk(f, nbrhd_gen.multinode2vec_walks(w, nbrhd_size, starts), nodes)
+                        starts = []
+            write_walk_chunk(f, nbrhd_gen.multinode2vec_walks(w, nbrhd_size, starts), nodes)
+        os.replace(tmp_file, walk_file)
+        cache = nbrhd_gen.cache
+        print("Finished nbrhd generation for r=" + str(w) + " ({} layer maps, {:.1%} layer cache hit rate)".format(
+            cache.misses, float(cache.hits) / max(cache.hits + cache.misses, 1)))
+        walk_files[w] = walk_file
+    return walk_files
+
+
+def write_walk_chunk(f, walks, nodes):
+    for walk in walks:
+        f.write(' '.join(nodes[node] for node in walk) + '\n')
+
+
+def walk_file_sentences(walk_file):
+    """
+    Streams the neighborhoods of a walk file, for training without loading them in memory.
+    :param walk_file: walk file, as written by extract_neighborhoods_out_of_core()
+    :return: iterable of neighborhoods
+    """
+    from gensim.models.word2vec import LineSentence
+    return LineSentence(walk_file)
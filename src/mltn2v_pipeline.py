@@ -0,0 +1,285 @@
+"""
+Pipelined execution of multi-node2vec.
+
+Parsing, alias preprocessing, walking and word2vec training run as concurrent stages linked by
+bounded queues, so that a layer is preprocessed as soon as it is parsed and walks are trained on
+as soon as they are generated. The bounded queues keep a fast stage from running ahead of a slow
+one. Walks can only start once every layer is preprocessed, since a walk may switch to any layer.
+When a stage fails, it stops the pipeline, and the stages blocked on a queue give up, so that the
+error is raised instead of the run hanging.
+
+word2vec needs its vocabulary before training starts, so the node frequencies are estimated from
+node degrees instead of counted over the walks. They drive frequent node downsampling and the
+negative sampling distribution, so pipelined embeddings differ from those of a normal run with the
+same parameters, beyond the randomness of the walks.
+
+Details of multi-node2vec can be found in the paper: "Fast Embedding of Multilayer Networks: An Algorithm and Application to Group fMRI"
+by JD Wilson, M Baybay, R Sankar, and P Stillman
+
+Preprint here: https://arxiv.org/pdf/1809.06437.pdf
+
+Contributors:
+- Melanie Baybay
+University of San Francisco, Department of Computer Science
+- Rishi Sankar
+Henry M. Gunn High School
+- James D. Wilson (maintainer)
+University of San Francisco, Department of Mathematics and Statistics
+
+Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
+"""
+from .multinode2vec import *
+import os
+import queue
+import threading
+import time
+
+# marks the end of the items of a stage
+END_OF_STAGE = None
+# seconds a stage blocks on a queue before checking whether the pipeline was stopped
+QUEUE_POLL = 0.1
+
+
+class StageStats():
+    """
+    Time a pipeline stage spends working, as opposed to waiting on its queues.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+
+    def add(self, seconds, items=1):
+        self.busy += seconds
+        self.items += items
+
+    def report(self, wall):
+        utilization = 100.0 * self.busy / wall if wall > 0 else 0.0
+        print("\t{:<10} {:>8} items, busy {:.2f} of {:.2f} secs ({:.0f}%)".format(
+            self.name, self.items, self.busy, wall, utilization))
+
+
+def run_pipeline(network_dir, d, out, rvals, walk_length, p, q, thresh=None, binary=True, nbrhd_size=10,
+                 n_walks=52, w2v_iter=1, workers=8, sg=1, queue_size=16, weighted_layers=None):
+    """
+    Runs multi-node2vec with all stages overlapping, writing results as generate_features() does.
+
+    :param network_dir: directory of adjacency matrix files
+    :param d: feature dimensionality
+    :param out: output directory. Results for each r are written to out/r<r>/mltn2v_results
+    :param rvals: list of layer walk parameters
+    :param walk_length: length of each random walk
+    :param p: return walk parameter
+    :param q: exploration walk parameter
+    :param thresh: threshold for edge weights. Weights <= thresh are dropped
+    :param binary: boolean of whether or not to convert edge weights to binary
+    :param nbrhd_size: window size for Skip-Gram optimization
+    :param n_walks: number of walks per node per layer
+    :param w2v_iter: number of word2vec training epochs
+    :param workers: number of word2vec workers
+    :param sg: sets word2vec architecture. 1 for Skip-Gram, 0 for CBOW
+    :param queue_size: capacity of the queues between stages
+    :param weighted_layers: layers already parsed by parse_weighted_layers(). If given, the
+            files are not read again
+    :return: (dict of layer walk parameter to n x d network embedding, list of parsed weighted layers)
+    """
+    start = time.time()
+    errors = []
+    stop = threading.Event()
+    layer_queue = queue.Queue(maxsize=queue_size)
+    nbrhd_gen = NeighborhoodGen([], p, q)
+    parse_stats = StageStats("parse")
+    build_stats = StageStats("preprocess")
+    parsed = []
+
+    parser = threading.Thread(target=run_stage, args=(
+        parse_stage, errors, stop, [layer_queue], network_dir, weighted_layers, thresh, binary, layer_queue, parsed,
+        parse_stats, stop))
+    builder = threading.Thread(target=run_stage, args=(
+        build_stage, errors, stop, [], layer_queue, nbrhd_gen, build_stats, stop))
+    for thread in (parser, builder):
+        thread.daemon = True
+        thread.start()
+    parser.join()
+    builder.join()
+    raise_stage_errors(errors)
+    if not nbrhd_gen.G:
+        print("[ERROR] No layers were parsed.")
+        return {}, parsed
+
+    features = {}
+    for w in rvals:
+        walk_queue = queue.Queue(maxsize=queue_size)
+        walk_stats = StageStats("walk")
+        train_stats = StageStats("train")
+        walker = threading.Thread(target=run_stage, args=(
+            walk_stage, errors, stop, [walk_queue], nbrhd_gen, w, walk_length, n_walks, walk_queue, walk_stats, stop))
+        walker.daemon = True
+        walker.start()
+        try:
+            w2v_model = train_stage(nbrhd_gen, walk_queue, d, nbrhd_size, n_walks, w2v_iter, workers, sg,
+                                    train_stats, errors, stop)
+        except BaseException:
+            # a failed training must not leave the walker blocked on the walk queue
+            stop.set()
+            raise
+        finally:
+            walker.join()
+        raise_stage_errors(errors)
+        features[w] = save_model_features(w2v_model, os.path.join(out, 'r' + str(w) + '/mltn2v_results'))
+
+        # the stage with the most work bounds the throughput of the pipeline
+        print("Pipeline utilization for r=" + str(w) + ":")
+        stages = [parse_stats, build_stats, walk_stats, train_stats]
+        wall = time.time() - start
+        for stage in stages:
+            stage.report(wall)
+        print("\tBottleneck stage: " + max(stages, key=lambda stage: stage.busy).name)
+    return features, parsed
+
+
+def run_stage(stage, errors, stop, out_queues, *args):
+    """
+    Runs a stage in its thread. On failure, the error is recorded for the main thread and the
+    pipeline is stopped, so that the stages blocked on its queues give up. The end of stage is
+    signaled downstream unless the pipeline is stopped.
+    """
+    try:
+        stage(*args)
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        for out_queue in out_queues:
+            put_item(out_queue, END_OF_STAGE, stop)
+
+
+def put_item(out_queue, item, stop):
+    """
+    Puts an item on a queue, giving up once the pipeline is stopped.
+    :return: True if the item was put
+    """
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=QUEUE_POLL)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def get_item(in_queue, stop):
+    """
+    Gets an item from a queue, or END_OF_STAGE once the pipeline is stopped.
+    """
+    while not stop.is_set():
+        try:
+            return in_queue.get(timeout=QUEUE_POLL)
+        except queue.Empty:
+            pass
+    return END_OF_STAGE
+
+
+def raise_stage_errors(errors):
+    if errors:
+        raise errors[0]
+
+
+def parse_stage(network_dir, weighted_layers, thresh, binary, layer_queue, parsed, stats, stop):
+    '''
+    Reads (or reuses) each weighted layer, thresholds it and passes it downstream.
+    '''
+    if weighted_layers is None:
+        network_dir = expand_path(network_dir)
+        sources = [os.path.join(network_dir, network_file) for network_file in sorted(os.listdir(network_dir))]
+    else:
+        sources = weighted_layers
+    for source in sources:
+        start = time.time()
+        if weighted_layers is None:
+            try:
+                weighted = read_weighted_layer(source)
+            except Exception as e:
+                print('[ERROR] Could not read file "{}": {} '.format(source, e))
+                continue
+            if weighted is None:
+                raise ValueError('Invalid adjacency matrix "{}".'.format(source))
+        else:
+            weighted = source
+        parsed.append(weighted)
+        layer = threshold_layers([weighted], thresh=thresh, binary=binary)[0]
+        stats.add(time.time() - start)
+        if not put_item(layer_queue, layer, stop):
+            return
+
+
+def build_stage(layer_queue, nbrhd_gen, stats, stop):
+    '''
+    Builds the graph of each layer and preprocesses its alias tables as soon as it is parsed.
+    '''
+    import networkx as nx
+    while True:
+        layer = get_item(layer_queue, stop)
+        if layer is END_OF_STAGE:
+            break
+        start = time.time()
+        nbrhd_gen.add_layer(nx.convert_matrix.from_pandas_edgelist(layer, edge_attr='weight'))
+        stats.add(time.time() - start)
+
+
+def walk_stage(nbrhd_gen, w, walk_length, n_walks, walk_queue, stats, stop):
+    '''
+    Generates the walks of each start node and passes them downstream in chunks.
+    '''
+    for i, layer in enumerate(nbrhd_gen.G):
+        for node in layer.nodes():
+            start = time.time()
+            chunk = [nbrhd_gen.multinode2vec_walk(w, walk_length, node, i) for j in range(n_walks)]
+            stats.add(time.time() - start, len(chunk))
+            if not put_item(walk_queue, chunk, stop):
+                return
+
+
+def train_stage(nbrhd_gen, walk_queue, d, nbrhd_size, n_walks, w2v_iter, workers, sg, stats, errors, stop):
+    '''
+    Trains word2vec on the walks as they are generated. The first epoch streams from the walk
+    queue; later epochs reuse the walks kept from the first one.
+    '''
+    from gensim.models import word2vec as w2v
+    n_nbrhds = n_walks * sum(layer.number_of_nodes() for layer in nbrhd_gen.G)
+    w2v_model = w2v.Word2Vec(size=d, window=nbrhd_size, min_count=0, workers=workers, iter=w2v_iter, sg=sg)
+    # the vocabulary is built before any walk, from node degrees. Walk counts differ from degrees:
+    # every node starts n_walks walks per layer, and steps are p/q biased and switch layers. The
+    # frequencies drive downsampling and negative sampling, so embeddings differ from a normal run
+    degrees = {}
+    for layer in nbrhd_gen.G:
+        for node, degree in layer.degree():
+            degrees[node] = degrees.get(node, 0) + max(degree, 1)
+    w2v_model.build_vocab([[node] * degree for node, degree in degrees.items()])
+
+    kept = [] if w2v_iter > 1 else None
+    waiting = [0.0]
+
+    def stream():
+        while True:
+            start = time.time()
+            chunk = get_item(walk_queue, stop)
+            waiting[0] += time.time() - start
+            if chunk is END_OF_STAGE:
+                return
+            if kept is not None:
+                kept.extend(chunk)
+            for nbrhd in chunk:
+                yield nbrhd
+
+    print("Total Neighborhoods: {}".format(n_nbrhds))
+    start = time.time()
+    train_epoch(w2v_model, stream(), n_nbrhds, 0, w2v_iter)
+    stats.add(time.time() - start - waiting[0], n_nbrhds)
+    if errors:
+        return w2v_model
+    for epoch in range(1, w2v_iter):
+        start = time.time()
+        train_epoch(w2v_model, kept, n_nbrhds, epoch, w2v_iter)
+        stats.add(time.time() - start, n_nbrhds)
+    return w2v_model
@@ -0,0 +1,428 @@
+"""
+Similarity queries over multi-node2vec embeddings.
+
+Loads the embeddings written by generate_features(), indexes them for top-k cosine
+similarity queries (exact blocked search, or random hyperplane LSH for large N), aligns
+embeddings of different runs and serves queries over HTTP.
+
+Details of multi-node2vec can be found in the paper: "Fast Embedding of Multilayer Networks: An Algorithm and Application to Group fMRI"
+by JD Wilson, M Baybay, R Sankar, and P Stillman
+
+Preprint here: https://arxiv.org/pdf/1809.06437.pdf
+
+Contributors:
+- Melanie Baybay
+University of San Francisco, Department of Computer Science
+- Rishi Sankar
+Henry M. Gunn High School
+- James D. Wilson (maintainer)
+University of San Francisco, Department of Mathematics and Statistics
+
+Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
+"""
+
+import os
+import json
+import threading
+import time
+import numpy as np
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
+
+
+# -------------------------------------------------------------------------------
+# LOADING
+# -------------------------------------------------------------------------------
+def load_embedding(path, mmap=True):
+    """
+    Loads an embedding as written by generate_features(). A .csv embedding is converted
+    once to a .npy file (next to the .csv) that is memory-mapped on later loads.
+    :param path: path to a .csv or .npy embedding
+    :param mmap: whether to memory-map the .npy file
+    :return: (list of node IDs, n x d numpy array)
+    """
+    path = os.path.expandvars(os.path.expanduser(path))
+    base, ext = os.path.splitext(path)
+    if ext == ".csv":
+        npy_path = base + ".npy"
+        if not os.path.exists(npy_path) or os.path.getmtime(npy_path) < os.path.getmtime(path):
+            csv_to_npy(path, npy_path)
+    elif ext == ".npy":
+        npy_path = path
+    else:
+        raise ValueError('Unsupported embedding file "{}". Expecting .csv or .npy.'.format(path))
+    vectors = np.load(npy_path, mmap_mode='r' if mmap else None)
+    with open(os.path.splitext(npy_path)[0] + ".nodes") as f:
+        nodes = [line.rstrip("\n") for line in f]
+    if len(nodes) != vectors.shape[0]:
+        raise ValueError('Node list does not match embedding "{}".'.format(npy_path))
+    return nodes, vectors
+
+
+def csv_to_npy(csv_path, npy_path=None):
+    """
+    Converts an embedding csv (first column node ID, no header) to a .npy matrix and a
+    .nodes file listing one node ID per row of the matrix.
+    :param csv_path: path to embedding csv
+    :param npy_path: path to output .npy file. Defaults to csv_path with .npy extension
+    :return: path to .npy file
+    """
+    import pandas as pd
+    if npy_path is None:
+        npy_path = os.path.splitext(csv_path)[0] + ".npy"
+    ftrs = pd.read_csv(csv_path, header=None, index_col=0)
+    np.save(npy_path, ftrs.values.astype(np.float32))
+    with open(os.path.splitext(npy_path)[0] + ".nodes", 'w') as f:
+        for node in ftrs.index:
+            f.write(str(node) + "\n")
+    return npy_path
+
+
+# -------------------------------------------------------------------------------
+# INDEX
+# -------------------------------------------------------------------------------
+class EmbeddingIndex():
+    """
+    Top-k cosine similarity index over an embedding.
+
+    Queries are answered exactly by blocked matrix multiplication. With ann=True, a random
+    hyperplane LSH index proposes candidates that are then re-ranked exactly, which is
+    only worthwhile for large N.
+
+    The vectors are kept as given, e.g. memory-mapped, and normalized a block at a time, so
+    that only their norms are held in memory.
+    """
+    def __init__(self, nodes, vectors, block_size=4096, ann=False, n_tables=8, n_bits=None, seed=0):
+        self.nodes = list(nodes)
+        self.node_ids = dict((node, i) for i, node in enumerate(self.nodes))
+        self.vectors = vectors
+        self.block_size = block_size
+        self.norms = np.concatenate([row_norms(vectors[start:start + block_size])
+                                     for start in range(0, vectors.shape[0], block_size)] or [np.ones(0, dtype=np.float32)])
+        self.ann = ann
+        if ann:
+            self.build_lsh(n_tables, n_bits, seed)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        nodes, vectors = load_embedding(path)
+        return cls(nodes, vectors, **kwargs)
+
+    def build_lsh(self, n_tables, n_bits=None, seed=0):
+        '''
+        Hashes every row into n_tables tables of n_bits random hyperplanes.
+        '''
+        n, d = self.vectors.shape
+        if n_bits is None:
+            # aim for ~16 rows per bucket
+            n_bits = max(1, min(24, int(np.log2(max(n, 2) / 16.0)) + 1))
+        rng = np.random.RandomState(seed)
+        self.planes = rng.randn(n_tables, d, n_bits).astype(np.float32)
+        self.bit_weights = 2 ** np.arange(n_bits, dtype=np.int64)
+        self.tables = []
+        for t in range(n_tables):
+            codes = np.concatenate([self.hash_rows(self.vectors[start:start + self.block_size], t)
+                                    for start in range(0, n, self.block_size)] or [np.zeros(0, dtype=np.int64)])
+            order = np.argsort(codes, kind="mergesort")
+            sorted_codes = codes[order]
+            starts = np.r_[0, np.flatnonzero(np.diff(sorted_codes)) + 1]
+            ends = np.r_[starts[1:], len(order)]
+            buckets = dict((sorted_codes[s], order[s:e]) for s, e in zip(starts, ends))
+            self.tables.append(buckets)
+
+    def hash_rows(self, vectors, table):
+        # the sign of a projection does not depend on the norm of the vector
+        return (np.dot(np.asarray(vectors, dtype=np.float32), self.planes[table]) > 0).dot(self.bit_weights)
+
+    def normalized(self, rows):
+        '''
+        Normalized vectors of some rows, given as a slice or an array of row indices.
+        '''
+        return np.asarray(self.vectors[rows], dtype=np.float32) / self.norms[rows][:, None]
+
+    def as_vectors(self, queries):
+        '''
+        Converts a node ID, a list of node IDs or an array of vectors to normalized query rows.
+        '''
+        if isinstance(queries, np.ndarray):
+            return normalize_rows(np.atleast_2d(queries)), None
+        if isinstance(queries, str):
+            queries = [queries]
+        rows = np.array([self.node_ids[str(node)] for node in queries], dtype=np.int64)
+        return self.normalized(rows), rows
+
+    def query(self, node, k=10):
+        '''
+        Top-k most similar nodes to a single node ID or vector.
+        :return: list of (node ID, cosine similarity)
+        '''
+        return self.batch_query(node, k)[0]
+
+    def batch_query(self, queries, k=10, exclude_self=True):
+        '''
+        Top-k most similar nodes for each query.
+        :param queries: node ID, list of node IDs or (m x d) array of vectors
+        :param k: number of neighbors per query
+        :param exclude_self: drop the query node from its own results
+        :return: list with one list of (node ID, cosine similarity) per query
+        '''
+        vectors, rows = self.as_vectors(queries)
+        exclude = rows if exclude_self else None
+        if self.ann:
+            ids, scores = self.lsh_topk(vectors, k, exclude)
+        else:
+            ids, scores = self.exact_topk(vectors, k, exclude)
+        return [[(self.nodes[i], float(s)) for i, s in zip(id_row, score_row) if i >= 0]
+                for id_row, score_row in zip(ids, scores)]
+
+    def exact_topk(self, vectors, k, exclude=None):
+        '''
+        Exact top-k by blocked matrix multiplication over the indexed rows.
+        '''
+        n = self.vectors.shape[0]
+        m = vectors.shape[0]
+        k = min(k, n - (exclude is not None))
+        best_ids = np.full((m, 0), -1, dtype=np.int64)
+        best_scores = np.full((m, 0), -np.inf, dtype=np.float32)
+        for start in range(0, n, self.block_size):
+            block = self.normalized(slice(start, start + self.block_size))
+            scores = np.dot(vectors, block.T)
+            if exclude is not None:
+                hits = (exclude >= start) & (exclude < start + block.shape[0])
+                scores[np.flatnonzero(hits), exclude[hits] - start] = -np.inf
+            ids = np.broadcast_to(np.arange(start, start + block.shape[0]), scores.shape)
+            best_ids, best_scores = merge_topk(np.hstack([best_ids, ids]),
+                                               np.hstack([best_scores, scores]), k)
+        return best_ids, best_scores
+
+    def lsh_topk(self, vectors, k, exclude=None):
+        '''
+        Approximate top-k: exact re-ranking of the rows sharing an LSH bucket with the query.
+        Falls back to exact search when the buckets hold fewer than k candidates.
+        '''
+        codes = [self.hash_rows(vectors, t) for t in range(len(self.tables))]
+        ids = np.full((vectors.shape[0], k), -1, dtype=np.int64)
+        scores = np.full((vectors.shape[0], k), -np.inf, dtype=np.float32)
+        for q in range(vectors.shape[0]):
+            cands = [self.tables[t].get(codes[t][q]) for t in range(len(self.tables))]
+            cands = np.unique(np.concatenate([c for c in cands if c is not None] or [np.zeros(0, dtype=np.int64)]))
+            if exclude is not None:
+                cands = cands[cands != exclude[q]]
+            if len(cands) < k:
+                q_exclude = None if exclude is None else exclude[q:q + 1]
+                q_ids, q_scores = self.exact_topk(vectors[q:q + 1], k, q_exclude)
+            else:
+                q_scores = np.dot(self.normalized(cands), vectors[q])[None, :]
+                q_ids, q_scores = merge_topk(cands[None, :], q_scores, k)
+            ids[q, :q_ids.shape[1]] = q_ids[0]
+            scores[q, :q_scores.shape[1]] = q_scores[0]
+        return ids, scores
+
+
+def merge_topk(ids, scores, k):
+    '''
+    Keeps the k highest scores of each row, sorted by decreasing score.
+    '''
+    if scores.shape[1] > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        rows = np.arange(len(scores))[:, None]
+        ids, scores = ids[rows, part], scores[rows, part]
+    order = np.argsort(-scores, axis=1, kind="mergesort")
+    rows = np.arange(len(scores))[:, None]
+    return ids[rows, order], scores[rows, order]
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / row_norms(vectors)[:, None]
+
+
+def row_norms(vectors):
+    '''
+    Norms of the rows of a matrix, with 1 for zero rows so that they can be divided by.
+    '''
+    norms = np.linalg.norm(np.asarray(vectors, dtype=np.float32), axis=1)
+    norms[norms == 0] = 1
+    return norms
+
+
+# -------------------------------------------------------------------------------
+# CROSS-RUN ALIGNMENT
+# -------------------------------------------------------------------------------
+def align_embeddings(source_nodes, source, target_nodes, target):
+    """
+    Rotates an embedding onto another one by orthogonal Procrustes over their shared nodes.
+    Embeddings of different runs are only defined up to rotation, so runs must be aligned
+    before their vectors can be compared.
+    :param source_nodes: node IDs of the embedding to rotate
+    :param source: embedding to rotate (n x d)
+    :param target_nodes: node IDs of the reference embedding
+    :param target: reference embedding (m x d)
+    :return: rotated source embedding (n x d)
+    """
+    rotation = procrustes_rotation(source_nodes, source, target_nodes, target)
+    return np.dot(np.asarray(source, dtype=np.float64), rotation)
+
+
+def procrustes_rotation(source_nodes, source, target_nodes, target):
+    """
+    Orthogonal matrix rotating an embedding onto another one, as applied by align_embeddings().
+    :return: d x d rotation, applied to the rows of the source embedding
+    """
+    target_ids = dict((node, i) for i, node in enumerate(target_nodes))
+    shared = [(i, target_ids[node]) for i, node in enumerate(source_nodes) if node in target_ids]
+    if not shared:
+        raise ValueError("Embeddings have no nodes in common.")
+    src_rows, tgt_rows = [np.array(rows) for rows in zip(*shared)]
+    # only the shared rows are read from memory-mapped embeddings
+    source = np.asarray(source[src_rows], dtype=np.float64)
+    u, _, vt = np.linalg.svd(np.dot(source.T, np.asarray(target[tgt_rows], dtype=np.float64)))
+    return np.dot(u, vt)
+
+
+def cross_run_query(index, nodes, vectors, queries, k=10, rotation=None):
+    """
+    Top-k neighbors in an indexed run of nodes taken from another run.
+    :param index: EmbeddingIndex of the reference run
+    :param nodes: node IDs of the other run
+    :param vectors: embedding of the other run
+    :param queries: node IDs of the other run to query
+    :param k: number of neighbors per query
+    :param rotation: rotation of the other run onto the reference run, as returned by
+            procrustes_rotation(). Computed if None
+    :return: list with one list of (node ID, cosine similarity) per query
+    """
+    if rotation is None:
+        rotation = procrustes_rotation(nodes, vectors, index.nodes, index.vectors)
+    node_ids = dict((node, i) for i, node in enumerate(nodes))
+    rows = [node_ids[str(node)] for node in queries]
+    return index.batch_query(np.dot(np.asarray(vectors[rows], dtype=np.float64), rotation), k)
+
+
+# -------------------------------------------------------------------------------
+# BENCHMARK
+# -------------------------------------------------------------------------------
+def benchmark_index(index, n_queries=1000, k=10, batch_size=64, seed=0):
+    """
+    Measures query throughput of an index for single and batched node queries.
+    :return: dict of queries per second, keyed by "single" and "batch"
+    """
+    rng = np.random.RandomState(seed)
+    queries = [index.nodes[i] for i in rng.randint(0, len(index.nodes), n_queries)]
+    start = time.time()
+    for node in queries:
+        index.query(node, k)
+    single = n_queries / max(time.time() - start, 1e-9)
+    start = time.time()
+    for i in range(0, n_queries, batch_size):
+        index.batch_query(queries[i:i + batch_size], k)
+    batch = n_queries / max(time.time() - start, 1e-9)
+    print("Single queries: {:.1f} queries/sec".format(single))
+    print("Batched queries (batch size {}): {:.1f} queries/sec".format(batch_size, batch))
+    return {"single": single, "batch": batch}
+
+
+# -------------------------------------------------------------------------------
+# SERVER
+# -------------------------------------------------------------------------------
+class QueryServer(ThreadingMixIn, HTTPServer):
+    """
+    Local HTTP server answering JSON similarity queries over one or more named runs.
+
+    GET  /runs                                  names of the served runs
+    GET  /topk?run=NAME&node=ID&k=10            top-k neighbors of a node
+    POST /batch {"run": NAME, "nodes": [...], "k": 10}
+    POST /cross {"run": NAME, "other": NAME, "nodes": [...], "k": 10}
+
+    The rotation between two runs is computed on the first /cross query of the pair and cached.
+    """
+    daemon_threads = True
+
+    def __init__(self, indexes, host="127.0.0.1", port=8000):
+        HTTPServer.__init__(self, (host, port), QueryHandler)
+        self.indexes = indexes
+        self.rotations = {}
+        self.rotations_lock = threading.Lock()
+
+    def rotation(self, index, other):
+        """
+        Rotation of the run of index other onto the run of index, computed once per pair of runs.
+        """
+        key = (id(index), id(other))
+        with self.rotations_lock:
+            if key not in self.rotations:
+                self.rotations[key] = procrustes_rotation(other.nodes, other.vectors, index.nodes, index.vectors)
+            return self.rotations[key]
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = dict((key, values[0]) for key, values in parse_qs(url.query).items())
+        if url.path == "/runs":
+            self.respond(200, sorted(self.server.indexes))
+        elif url.path == "/topk":
+            self.answer(lambda: self.index(params).query(params["node"], int(params.get("k", 10))))
+        else:
+            self.respond(404, {"error": "unknown path " + url.path})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8"))
+        except ValueError as e:
+            self.respond(400, {"error": str(e)})
+            return
+        if url.path == "/batch":
+            self.answer(lambda: self.index(body).batch_query(body["nodes"], int(body.get("k", 10))))
+        elif url.path == "/cross":
+            def cross():
+                index = self.index(body)
+                other = self.server.indexes[body["other"]]
+                return cross_run_query(index, other.nodes, other.vectors, body["nodes"], int(body.get("k", 10)),
+                                       rotation=self.server.rotation(index, other))
+            self.answer(cross)
+        else:
+            self.respond(404, {"error": "unknown path " + url.path})
+
+    def index(self, params):
+        indexes = self.server.indexes
+        if "run" not in params and len(indexes) == 1:
+            return list(indexes.values())[0]
+        return indexes[params["run"]]
+
+    def answer(self, method):
+        try:
+            self.respond(200, method())
+        except KeyError as e:
+            self.respond(404, {"error": "unknown run or node {}".format(e)})
+        except (ValueError, TypeError) as e:
+            # malformed parameters, e.g. "nodes" given as a number
+            self.respond(400, {"error": str(e)})
+
+    def respond(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(indexes, host="127.0.0.1", port=8000):
+    """
+    Serves similarity queries until interrupted.
+    :param indexes: dict of run name to EmbeddingIndex
+    """
+    server = QueryServer(indexes, host, port)
+    print("Serving {} run(s) on http://{}:{}".format(len(indexes), host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
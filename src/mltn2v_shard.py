@@ -0,0 +1,144 @@
+"""
+Sharded walk generation for running multi-node2vec walks on several machines.
+
+The (layer, start node) pairs of a multilayer network are numbered in the order the unsharded
+walks visit them, and shard i of N walks the pairs k with k % N == i. The walks of each pair are
+drawn from a seed of their own, so a pair walks the same whichever shard, process or machine
+runs it, and the merged corpus does not depend on N or on how the shards were scheduled.
+
+Shards only coordinate through a shared filesystem: each one is written to a temporary file and
+renamed once complete, so the merge step never reads a partial shard.
+
+Details of multi-node2vec can be found in the paper: "Fast Embedding of Multilayer Networks: An Algorithm and Application to Group fMRI"
+by JD Wilson, M Baybay, R Sankar, and P Stillman
+
+Preprint here: https://arxiv.org/pdf/1809.06437.pdf
+
+Contributors:
+- Melanie Baybay
+University of San Francisco, Department of Computer Science
+- Rishi Sankar
+Henry M. Gunn High School
+- James D. Wilson (maintainer)
+University of San Francisco, Department of Mathematics and Statistics
+
+Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
+"""
+
+import json
+import os
+import time
+import zlib
+import numpy as np
+from .mltn2v_checkpoint import checkpoint_tmp_path
+
+
+def parse_shard(value):
+    """
+    Parses a shard specification "i/N", the i-th of N shards with 0 <= i < N.
+    :return: (i, N)
+    """
+    try:
+        index, n_shards = [int(x) for x in str(value).split('/')]
+    except ValueError:
+        raise ValueError('Invalid shard "{}". Expected i/N, e.g. 0/4.'.format(value))
+    if n_shards < 1 or not 0 <= index < n_shards:
+        raise ValueError('Invalid shard "{}". Expected 0 <= i < N.'.format(value))
+    return index, n_shards
+
+
+def shard_tasks(layer_nodes, shard):
+    """
+    (layer, start node) pairs walked by a shard.
+    :param layer_nodes: list of the start nodes of each layer, in walk order
+    :param shard: (i, N)
+    :return: list of (pair index, layer id, node)
+    """
+    index, n_shards = shard
+    tasks = []
+    k = 0
+    for layer_id, nodes in enumerate(layer_nodes):
+        for node in nodes:
+            if k % n_shards == index:
+                tasks.append((k, layer_id, node))
+            k += 1
+    return tasks
+
+
+def task_seed(seed, w, layer_id, node):
+    """
+    Seed of the walks of a (layer, start node) pair.
+    """
+    return zlib.crc32(repr((seed, w, layer_id, str(node))).encode('utf-8'))
+
+
+def shard_path(shard_dir, w, shard):
+    """
+    Walk shard file of a shard, for a layer walk parameter.
+    """
+    return os.path.join(shard_dir, 'r' + str(w), 'shard{}of{}.npz'.format(shard[0], shard[1]))
+
+
+def write_walk_shard(path, walks, nodes, key):
+    """
+    Writes the walks of a shard compactly, as indices into a node index.
+    :param path: shard file
+    :param walks: list of walks of equal length, represented as lists of node IDs
+    :param nodes: list of node IDs, the node index
+    :param key: dict describing the run, which every shard of the run must share
+    """
+    node_ids = dict((node, i) for i, node in enumerate(nodes))
+    walk_length = len(walks[0]) if walks else 0
+    indices = np.array([[node_ids[node] for node in walk] for walk in walks], dtype=np.int32).reshape(len(walks), walk_length)
+    tmp_path = checkpoint_tmp_path(path)
+    # through a file object, since np.savez appends .npz to a path without it
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, walks=indices, nodes=np.array([str(node) for node in nodes]),
+                            key=np.array(json.dumps(key, sort_keys=True)))
+    os.replace(tmp_path, path)
+
+
+def read_walk_shard(path):
+    """
+    Reads a shard written by write_walk_shard().
+    :return: (n_walks x walk_length array of node indices, list of node IDs, key)
+    """
+    with np.load(path) as shard:
+        return shard['walks'], [str(node) for node in shard['nodes']], json.loads(str(shard['key']))
+
+
+def merge_walk_shards(shard_dir, w, n_shards, wait=0, poll=5):
+    """
+    Merges the N walk shards of a layer walk parameter into the corpus of the unsharded walks.
+    :param shard_dir: directory the shards were written to
+    :param w: layer walk parameter
+    :param n_shards: number of shards, N
+    :param wait: seconds to wait for missing shards before failing
+    :param poll: seconds between checks for missing shards
+    :return: list of neighborhoods, represented as lists of node IDs
+    """
+    paths = [shard_path(shard_dir, w, (i, n_shards)) for i in range(n_shards)]
+    deadline = time.time() + wait
+    missing = [path for path in paths if not os.path.exists(path)]
+    while missing and time.time() < deadline:
+        time.sleep(poll)
+        missing = [path for path in missing if not os.path.exists(path)]
+    if missing:
+        raise IOError('Missing walk shards: ' + ', '.join(missing))
+
+    shards = [read_walk_shard(path) for path in paths]
+    nodes, key = shards[0][1], shards[0][2]
+    for path, shard in zip(paths, shards):
+        if shard[1] != nodes or shard[2] != key:
+            raise ValueError('Walk shard "{}" was generated from another network or with other parameters.'.format(path))
+    n_walks = key['n_walks']
+
+    # pair k is the (k // N)-th pair of shard k % N, and each pair has n_walks walks
+    blocks = [walks.reshape(-1, n_walks, walks.shape[1]) if len(walks) else walks.reshape(0, n_walks, 0) for walks, _, _ in shards]
+    n_pairs = sum(len(block) for block in blocks)
+    nbrhds = []
+    for k in range(n_pairs):
+        for walk in blocks[k % n_shards][k // n_shards]:
+            nbrhds.append([nodes[i] for i in walk])
+    print("Merged {} walk shards for r={}: {} neighborhoods".format(n_shards, w, len(nbrhds)))
+    return nbrhds
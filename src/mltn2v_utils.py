@@ -18,8 +18,7 @@ Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
 """
 
 import os
-import pandas as pd
-from pandas.api.types import is_numeric_dtype
+import numpy as np
 import time
 
 
@@ -36,38 +35,140 @@ def parse_matrix_layers(network_dir, delim=',', binary=False, thresh=None):
     :return: List of adjacency lists. Each adjacency list is one layer and is represented
             as pandas DataFrames with 'source', 'target', 'weight' columns.
     """
+    weighted_layers = parse_weighted_layers(network_dir, delim=delim)
+    if weighted_layers is None:
+        return
+    return threshold_layers(weighted_layers, thresh=thresh, binary=binary)
+
+
+def parse_weighted_layers(network_dir, delim=',', names=None):
+    """
+    Converts directory of adjacency matrix files into weighted adjacency lists, sorted by
+    decreasing edge weight. Any threshold can then be applied with threshold_layers()
+    without re-reading the files.
+    :param network_dir: Directory of adjacency matrix files
+    :param delim: separator for adjacency matrix
+    :param names: optional list, to which the file name of each parsed layer is appended
+    :return: List of adjacency lists. Each adjacency list is one layer and is represented
+            as pandas DataFrames with 'source', 'target', 'weight' columns, holding every
+            non-zero entry of the matrix. Rows are sorted by decreasing weight and the index
+            holds the row-major position of the entry in the original matrix.
+    """
     # expand directory path
     network_dir = expand_path(network_dir)
 
     # iterate files and convert to pandas dataframes
     layers = []
-    for network_file in os.listdir(network_dir):
+    for network_file in sorted(os.listdir(network_dir)):
         file_path = os.path.join(network_dir, network_file)
         try:
-            # read as pandas DataFrame, index=source, col=target
-            layer = pd.read_csv(file_path, index_col=0)
-            if layer.shape[0] != layer.shape[1]:
-                print('[ERROR] Invalid adjacency matrix. Expecting matrix with index as source and column as target.')
+            layer = read_weighted_layer(file_path, delim=delim)
+            if layer is None:
                 return
-            if thresh is not None:
-                layer[layer <= thresh] = 0
-            if binary:
-                layer[layer != 0] = 1
-            # ensure that index (node name) is string, since word2vec will need it as str
-            if is_numeric_dtype(layer.index):
-                layer.index = layer.index.map(str)
-            # replace all 0s with NaN
-            layer.replace(to_replace=0, value=pd.np.nan, inplace=True)
-            # convert matrix --> adjacency list with cols ["source", "target", "weight"]
-            layer = layer.stack(dropna=True).reset_index()
-            # rename columns
-            layer.columns = ["source", "target", "weight"]
             layers.append(layer)
+            if names is not None:
+                names.append(network_file)
         except Exception as e:
             print('[ERROR] Could not read file "{}": {} '.format(file_path, e))
     return layers
 
 
+def read_weighted_layer(file_path, delim=','):
+    """
+    Reads one adjacency matrix file as a weighted adjacency list, see parse_weighted_layers().
+    :param file_path: adjacency matrix file
+    :param delim: separator for adjacency matrix
+    :return: pandas DataFrame with 'source', 'target', 'weight' columns, or None if the matrix is not square
+    """
+    import pandas as pd
+    # read as pandas DataFrame, index=source, col=target
+    layer = pd.read_csv(file_path, sep=delim, index_col=0)
+    if layer.shape[0] != layer.shape[1]:
+        print('[ERROR] Invalid adjacency matrix. Expecting matrix with index as source and column as target.')
+        return
+    return matrix_to_weighted_edgelist(layer)
+
+
+def matrix_to_weighted_edgelist(layer):
+    """
+    Converts an adjacency matrix into an adjacency list sorted by decreasing edge weight.
+    :param layer: pandas DataFrame adjacency matrix, index=source, col=target
+    :return: pandas DataFrame with 'source', 'target', 'weight' columns of all non-zero entries
+    """
+    import pandas as pd
+    from pandas.api.types import is_numeric_dtype
+    # ensure that index (node name) is string, since word2vec will need it as str
+    sources = layer.index.map(str) if is_numeric_dtype(layer.index) else layer.index
+    weights = layer.values
+    # row-major positions of all non-zero entries, as produced by DataFrame.stack()
+    rows, cols = np.nonzero((weights != 0) & ~np.isnan(weights))
+    edges = pd.DataFrame({"source": np.asarray(sources)[rows],
+                          "target": np.asarray(layer.columns)[cols],
+                          "weight": weights[rows, cols]},
+                         columns=["source", "target", "weight"])
+    # stable sort keeps row-major order among equal weights
+    return edges.sort_values("weight", ascending=False, kind="mergesort")
+
+
+def to_weighted_edgelist(layer, nodes=None):
+    """
+    Converts an in-memory layer into an adjacency list sorted by decreasing edge weight.
+    :param layer: adjacency matrix as a pandas DataFrame (index=source, col=target), numpy array
+            or scipy sparse matrix, or an adjacency list as a pandas DataFrame with
+            'source', 'target', 'weight' columns
+    :param nodes: node IDs of the rows and columns of a numpy or scipy matrix. Defaults to 0..n-1
+    :return: pandas DataFrame with 'source', 'target', 'weight' columns, as parse_weighted_layers()
+    """
+    import pandas as pd
+    if isinstance(layer, pd.DataFrame):
+        if list(layer.columns) == ["source", "target", "weight"]:
+            edges = layer[layer["weight"] != 0].reset_index(drop=True)
+            edges["source"] = edges["source"].map(str)
+            edges["target"] = edges["target"].map(str)
+            return edges.sort_values("weight", ascending=False, kind="mergesort")
+        return matrix_to_weighted_edgelist(layer)
+    if nodes is None:
+        nodes = range(layer.shape[0])
+    nodes = [str(node) for node in nodes]
+    if hasattr(layer, "tocoo"):
+        # scipy sparse matrix: coo of a csr matrix is in row-major order
+        layer = layer.tocsr()
+        layer.sort_indices()
+        layer = layer.tocoo()
+        keep = layer.data != 0
+        rows, cols, weights = layer.row[keep], layer.col[keep], layer.data[keep]
+        nodes = np.asarray(nodes, dtype=object)
+        edges = pd.DataFrame({"source": nodes[rows], "target": nodes[cols], "weight": weights},
+                             columns=["source", "target", "weight"])
+        return edges.sort_values("weight", ascending=False, kind="mergesort")
+    return matrix_to_weighted_edgelist(pd.DataFrame(np.asarray(layer, dtype=float), index=nodes, columns=nodes))
+
+
+def threshold_layers(weighted_layers, thresh=None, binary=False):
+    """
+    Thresholds layers parsed by parse_weighted_layers(). Since each layer is sorted by
+    decreasing weight, the edges kept for a threshold are a prefix of the layer.
+    :param weighted_layers: list of adjacency lists as returned by parse_weighted_layers()
+    :param thresh: threshold for edge weights. Weights <= thresh are dropped
+    :param binary: boolean of whether or not to convert edge weights to binary
+    :return: List of adjacency lists, as returned by parse_matrix_layers()
+    """
+    layers = []
+    for weighted in weighted_layers:
+        if thresh is None:
+            layer = weighted
+        else:
+            # weights are decreasing, so the number of weights > thresh is found by bisection
+            n_edges = np.searchsorted(-weighted["weight"].values, -thresh, side="left")
+            layer = weighted.iloc[:n_edges]
+        # restore the row-major order of the adjacency matrix
+        layer = layer.sort_index()
+        if binary:
+            layer = layer.assign(weight=1.0)
+        layers.append(layer.reset_index(drop=True))
+    return layers
+
+
 def expand_path(path):
     """
     Expands a file path to handle user and environmental variables.
@@ -16,17 +16,23 @@ University of San Francisco, Department of Mathematics and Statistics
 
 Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
 """
-from gensim.models import word2vec as w2v
 from .mltn2v_utils import *
+from .mltn2v_checkpoint import *
+from .mltn2v_shard import *
+from .mltn2v_converge import *
 from .nbrhd_gen_walk_nx import *
+from .nbrhd_gen_walk_bitset import *
+import numpy as np
+import os
 import time
-import networkx as nx
 
 
 # -------------------------------------------------------------------------------
 # multinode2vec
 # -------------------------------------------------------------------------------
-def generate_features(nbrhds, d, out, nbrhd_size=-1, w2v_iter=1, workers=8, sg=1):
+def generate_features(nbrhds, d, out, nbrhd_size=-1, w2v_iter=1, workers=8, sg=1,
+                      checkpoint_dir=None, checkpoint_every=1, resume=False, tol=None, monitor='delta',
+                      patience=2, edge_sample=None, walk_key=None):
     """
     Generates d features for each unique node in a multilayer network based on
     its neighborhood.
@@ -36,14 +42,40 @@ def generate_features(nbrhds, d, out, nbrhd_size=-1, w2v_iter=1, workers=8, sg=1
     :param out: absolute path for output file (no extension, file type)
     :param nbrhd_size: window size for Skip-Gram optimization
     :param n_samples: number of generated neighborhoods per node
-    :param w2v_iter: number of word2vec training epochs
+    :param w2v_iter: number of word2vec training epochs, the maximum number with a tolerance
     :param workers: number of workers
     :param sg: sets word2vec architecture. 1 for Skip-Gram, 0 for CBOW
+    :param checkpoint_dir: directory of the training checkpoint. None disables checkpointing
+    :param checkpoint_every: number of epochs between checkpoints
+    :param resume: resume training from the checkpoint in checkpoint_dir, if any
+    :param tol: stop training once the improvement of an epoch is below tol, and write the
+            per-epoch curve to out_convergence.csv. None trains for all w2v_iter epochs
+    :param monitor: convergence monitor, 'loss', 'delta' or 'reconstruction' (see ConvergenceMonitor)
+    :param patience: number of epochs in a row with an improvement below tol before training stops
+    :param edge_sample: sample of node pairs of the reconstruction monitor, as returned by sample_edge_pairs()
+    :param walk_key: parameters the neighborhoods were generated with, saved with the checkpoint so
+            that it is only resumed for the same neighborhoods
+    :return: n x d network embedding
+    """
+    checkpoint_path = None if checkpoint_dir is None else os.path.join(checkpoint_dir, "word2vec.model")
+    conv_monitor = None if tol is None else ConvergenceMonitor(monitor, tol, patience=patience, edge_sample=edge_sample)
+    w2v_model = train_word2vec(nbrhds, d, nbrhd_size=nbrhd_size, w2v_iter=w2v_iter, workers=workers, sg=sg,
+                               checkpoint_path=checkpoint_path, checkpoint_every=checkpoint_every, resume=resume,
+                               monitor=conv_monitor, walk_key=walk_key)
+    ftrs = save_model_features(w2v_model, out)
+    if conv_monitor is not None:
+        print("Convergence curve: " + write_convergence_curve(w2v_model.mltn2v_curve, out, monitor))
+    return ftrs
+
+
+def save_model_features(w2v_model, out):
+    """
+    Writes the features of a trained word2vec model to an embedding file (.emb) and a feature matrix (.csv).
+
+    :param w2v_model: trained gensim Word2Vec model
+    :param out: absolute path for output file (no extension, file type)
     :return: n x d network embedding
     """
-    print("Total Neighborhoods: {}".format(len(nbrhds)))
-    w2v_model = w2v.Word2Vec(nbrhds, size=d, window=nbrhd_size, min_count=0,
-                             workers=workers, iter=w2v_iter, sg=sg)
     embfile = out + ".emb"
     splitpath = embfile.split('/')
     if len(splitpath) > 1:
@@ -58,10 +90,147 @@ def generate_features(nbrhds, d, out, nbrhd_size=-1, w2v_iter=1, workers=8, sg=1
     return ftrs
 
 
+def train_word2vec(nbrhds, d, nbrhd_size=-1, w2v_iter=1, workers=8, sg=1,
+                   checkpoint_path=None, checkpoint_every=1, resume=False, monitor=None, walk_key=None):
+    """
+    Trains a word2vec model on neighborhoods, without writing any output. With a checkpoint
+    path or a convergence monitor, training runs epoch by epoch. The model is saved every
+    checkpoint_every epochs, and training stops early once the monitor reports convergence.
+
+    :param nbrhds: list of neighborhoods, represented as lists of node IDs
+    :param d: feature dimensionality
+    :param nbrhd_size: window size for Skip-Gram optimization
+    :param w2v_iter: number of word2vec training epochs, the maximum number with a monitor
+    :param workers: number of workers
+    :param sg: sets word2vec architecture. 1 for Skip-Gram, 0 for CBOW
+    :param checkpoint_path: model checkpoint file. None disables checkpointing
+    :param checkpoint_every: number of epochs between checkpoints
+    :param resume: resume training from the checkpoint, if any
+    :param monitor: ConvergenceMonitor. None trains for all w2v_iter epochs
+    :param walk_key: parameters the neighborhoods were generated with. The checkpoint is only
+            resumed for the same neighborhoods and word2vec parameters
+    :return: trained gensim Word2Vec model
+    """
+    from gensim.models import word2vec as w2v
+    if hasattr(nbrhds, '__len__'):
+        print("Total Neighborhoods: {}".format(len(nbrhds)))
+    if checkpoint_path is None and monitor is None:
+        return w2v.Word2Vec(nbrhds, size=d, window=nbrhd_size, min_count=0,
+                            workers=workers, iter=w2v_iter, sg=sg)
+
+    key = {'d': d, 'window': nbrhd_size, 'sg': sg, 'w2v_iter': w2v_iter, 'walks': walk_key}
+    w2v_model = None
+    if resume and checkpoint_path is not None and os.path.exists(checkpoint_path):
+        w2v_model = w2v.Word2Vec.load(checkpoint_path)
+        if getattr(w2v_model, 'mltn2v_key', None) == key:
+            print("Resuming word2vec training after epoch {} of {}".format(w2v_model.mltn2v_epochs, w2v_iter))
+        else:
+            print("[WARNING] Checkpoint {} does not match the word2vec or walk parameters. Training again.".format(checkpoint_path))
+            w2v_model = None
+    if w2v_model is None:
+        w2v_model = w2v.Word2Vec(size=d, window=nbrhd_size, min_count=0,
+                                 workers=workers, iter=w2v_iter, sg=sg)
+        w2v_model.build_vocab(nbrhds)
+        w2v_model.mltn2v_epochs = 0
+        w2v_model.mltn2v_key = key
+    if getattr(w2v_model, 'mltn2v_converged', False):
+        print("Word2vec training converged after epoch {}".format(w2v_model.mltn2v_epochs))
+        return w2v_model
+    if monitor is not None:
+        monitor.start(w2v_model)
+    for epoch in range(w2v_model.mltn2v_epochs, w2v_iter):
+        epoch_start = time.time()
+        train_epoch(w2v_model, nbrhds, w2v_model.corpus_count, epoch, w2v_iter)
+        w2v_model.mltn2v_epochs = epoch + 1
+        converged = monitor is not None and monitor.update(w2v_model, epoch + 1, time.time() - epoch_start)
+        if converged:
+            if epoch + 1 < w2v_iter:
+                # decay the learning rate to its minimum over one last epoch
+                epoch_start = time.time()
+                train_epoch(w2v_model, nbrhds, w2v_model.corpus_count, epoch + 1, w2v_iter, anneal=True)
+                w2v_model.mltn2v_epochs = epoch + 2
+                monitor.update(w2v_model, epoch + 2, time.time() - epoch_start)
+            w2v_model.mltn2v_converged = True
+        if checkpoint_path is not None and (w2v_model.mltn2v_epochs % checkpoint_every == 0 or
+                                            w2v_model.mltn2v_epochs == w2v_iter or converged):
+            tmp_path = checkpoint_tmp_path(checkpoint_path)
+            # keep every array inside the checkpoint file, so that the rename is atomic
+            w2v_model.save(tmp_path, separately=[])
+            os.replace(tmp_path, checkpoint_path)
+            print("Saved word2vec checkpoint after epoch {} of {}".format(w2v_model.mltn2v_epochs, w2v_iter))
+        if converged:
+            print("Word2vec training converged after epoch {} of {}".format(w2v_model.mltn2v_epochs, w2v_iter))
+            break
+    return w2v_model
+
+
+def train_epoch(w2v_model, nbrhds, n_nbrhds, epoch, w2v_iter, anneal=False):
+    """
+    Trains a word2vec model for one epoch, decaying the learning rate linearly over all
+    w2v_iter epochs, as a single multi-epoch training does.
+
+    :param w2v_model: gensim Word2Vec model with a built vocabulary
+    :param nbrhds: iterable of neighborhoods, represented as lists of node IDs
+    :param n_nbrhds: number of neighborhoods
+    :param epoch: index of the epoch, starting at 0
+    :param w2v_iter: total number of word2vec training epochs
+    :param anneal: decay the learning rate to its minimum over this epoch, to end training early
+    """
+    alpha, min_alpha = w2v_model.alpha, w2v_model.min_alpha
+    w2v_model.train(nbrhds, total_examples=n_nbrhds, epochs=1,
+                    start_alpha=alpha - (alpha - min_alpha) * epoch / w2v_iter,
+                    end_alpha=min_alpha if anneal else alpha - (alpha - min_alpha) * (epoch + 1) / w2v_iter,
+                    compute_loss=w2v_model.compute_loss)
+    # train() keeps the learning rates of the epoch, restore those of the whole schedule
+    w2v_model.alpha, w2v_model.min_alpha = alpha, min_alpha
+
+
 # -------------------------------------------------------------------------------
 # NEIGHBORHOODS
 # -------------------------------------------------------------------------------
-def extract_neighborhoods_walk(layers, nbrhd_size, wvals, p, q, is_directed=False, weighted=False):
+def extract_neighborhoods_walk(layers, nbrhd_size, wvals, p, q, is_directed=False, weighted=False,
+                               checkpoint_dir=None, resume=False, shard=None, shard_dir=None, seed=0, shared=False):
+    nbrhd_gen = build_neighborhood_gen(layers, p, q, is_directed=is_directed, weighted=weighted,
+                                       checkpoint_dir=checkpoint_dir, resume=resume, shared=shared)
+    if shard is not None:
+        return generate_walk_shard(nbrhd_gen, nbrhd_size, wvals, shard, shard_dir, seed=seed)
+    network = None if checkpoint_dir is None else layers_digest(layers)
+    return generate_walks(nbrhd_gen, nbrhd_size, wvals, checkpoint_dir=checkpoint_dir, resume=resume, network=network)
+
+
+def build_neighborhood_gen(layers, p, q, is_directed=False, weighted=False, checkpoint_dir=None, resume=False,
+                           shared=False):
+    """
+    Builds the layer graphs and preprocesses the transition probabilities of the random walks.
+    :param layers: list of adjacency lists as pandas DataFrames with columns ["source", "target", "weight"]
+    :param p: return walk parameter
+    :param q: exploration walk parameter
+    :param checkpoint_dir: directory where the preprocessed generator is saved. None disables checkpointing
+    :param resume: reuse the preprocessed generator saved in checkpoint_dir, if any
+    :param shared: store the layers over a shared node index, with the neighborhoods and alias tables
+            common to several layers stored once (SharedNeighborhoodGen). Undirected layers only
+    :return: NeighborhoodGen or SharedNeighborhoodGen, reusable for any number of walks and r values
+    """
+    checkpoint_path = None
+    if checkpoint_dir is not None:
+        checkpoint_path = os.path.join(checkpoint_dir, "neighborhood_gen.pkl")
+        # the checkpoint is only valid for the same layers and walk parameters
+        key = (p, q, is_directed, weighted, shared, layers_digest(layers))
+        if resume:
+            checkpoint = load_checkpoint(checkpoint_path)
+            if checkpoint is not None and checkpoint[0] == key:
+                print("Loaded preprocessed neighborhood generator from " + checkpoint_path)
+                return checkpoint[1]
+            elif checkpoint is not None:
+                print("[WARNING] Checkpoint {} does not match the layers or walk parameters. Preprocessing again.".format(checkpoint_path))
+
+    if shared:
+        nbrhd_gen = SharedNeighborhoodGen(layers, p, q)
+        if checkpoint_path is not None:
+            save_checkpoint((key, nbrhd_gen), checkpoint_path)
+        return nbrhd_gen
+
+    import networkx as nx
     nxg = []
     for layer in layers:
         nxg.append(nx.convert_matrix.from_pandas_edgelist(layer,edge_attr='weight'))
@@ -69,20 +238,96 @@ def extract_neighborhoods_walk(layers, nbrhd_size, wvals, p, q, is_directed=Fals
     start = time.time()
     nbrhd_gen = NeighborhoodGen(nxg, p, q, is_directed=is_directed, weighted=weighted)
     print("Finished initialization of neighborhood generator in " + str(time.time() - start) + " seconds.")
+    if checkpoint_path is not None:
+        save_checkpoint((key, nbrhd_gen), checkpoint_path)
+    return nbrhd_gen
 
+
+def generate_walks(nbrhd_gen, nbrhd_size, wvals, n_walks=52, checkpoint_dir=None, resume=False, network=None):
+    """
+    Generates n_walks neighborhoods from each node of each layer, for each layer walk parameter.
+    :param nbrhd_gen: NeighborhoodGen, as returned by build_neighborhood_gen()
+    :param nbrhd_size: length of each random walk
+    :param wvals: list of layer walk parameters
+    :param n_walks: number of walks per node per layer
+    :param checkpoint_dir: directory where the walks of each layer are saved. None disables checkpointing
+    :param resume: reuse the walks saved in checkpoint_dir, if any
+    :param network: digest of the layers, as returned by layers_digest(), saved with the walks so
+            that they are only reused for the same network
+    :return: dict of layer walk parameter to list of neighborhoods
+    """
     neighborhood_dict = {}
     for w in wvals:
+        if checkpoint_dir is not None:
+            walk_dir = os.path.join(checkpoint_dir, "walks", "r" + str(w))
+            key_path = os.path.join(walk_dir, "key.pkl")
+            # the saved walks are only valid for the same walk parameters and layers
+            key = {'r': w, 'walk_length': nbrhd_size, 'n_walks': n_walks, 'p': nbrhd_gen.p, 'q': nbrhd_gen.q,
+                   'layer_sizes': [len(nbrhd_gen.start_nodes(i)) for i in range(nbrhd_gen.layer_count())],
+                   'network': network}
+            saved_key = load_checkpoint(key_path)
+            if saved_key != key:
+                if resume and saved_key is not None:
+                    print("[WARNING] Walks in {} do not match the network or walk parameters. Generating them again.".format(walk_dir))
+                for name in os.listdir(walk_dir) if os.path.isdir(walk_dir) else []:
+                    if name.startswith("layer"):
+                        os.remove(os.path.join(walk_dir, name))
+                save_checkpoint(key, key_path)
         neighborhoods = []
-        for i in range(len(nxg)):
-            layer = nxg[i]
-            for node in layer.nodes():
-                for j in range(52):
-                    neighborhoods.append(nbrhd_gen.multinode2vec_walk(w, nbrhd_size, node, i))
+        for i in range(nbrhd_gen.layer_count()):
+            shard = None
+            if checkpoint_dir is not None:
+                shard = os.path.join(walk_dir, "layer" + str(i) + ".txt")
+                if resume and os.path.exists(shard):
+                    neighborhoods.extend(read_walks(shard))
+                    continue
+            layer_nbrhds = []
+            for node in nbrhd_gen.start_nodes(i):
+                for j in range(n_walks):
+                    layer_nbrhds.append(nbrhd_gen.multinode2vec_walk(w, nbrhd_size, node, i))
+            if shard is not None:
+                write_walks(shard, layer_nbrhds)
+            neighborhoods.extend(layer_nbrhds)
         print("Finished nbrhd generation for r=" + str(w))
         neighborhood_dict[w] = neighborhoods
 
     return neighborhood_dict
 
+def generate_walk_shard(nbrhd_gen, nbrhd_size, wvals, shard, shard_dir, n_walks=52, seed=0):
+    """
+    Generates the neighborhoods of one shard of the (layer, start node) pairs and writes them to
+    shard_dir, for merge_walk_shards() to merge once every shard is written.
+    :param nbrhd_gen: NeighborhoodGen, as returned by build_neighborhood_gen()
+    :param nbrhd_size: length of each random walk
+    :param wvals: list of layer walk parameters
+    :param shard: (i, N), the i-th of N shards
+    :param shard_dir: directory of the walk shards, shared by all shards
+    :param n_walks: number of walks per node per layer
+    :param seed: seed of the run, shared by all shards
+    :return: dict of layer walk parameter to shard file
+    """
+    layer_nodes = [nbrhd_gen.start_nodes(i) for i in range(nbrhd_gen.layer_count())]
+    nodes = sorted(set(node for layer in layer_nodes for node in layer), key=str)
+    tasks = shard_tasks(layer_nodes, shard)
+    shard_files = {}
+    for w in wvals:
+        key = {'seed': seed, 'r': w, 'walk_length': nbrhd_size, 'n_walks': n_walks, 'p': nbrhd_gen.p,
+               'q': nbrhd_gen.q, 'n_shards': shard[1], 'layer_sizes': [len(layer) for layer in layer_nodes],
+               'shared': isinstance(nbrhd_gen, SharedNeighborhoodGen)}
+        neighborhoods = []
+        for k, i, node in tasks:
+            # walks of a pair only depend on the pair, not on the shard or the walks before them
+            np.random.seed(task_seed(seed, w, i, node))
+            for j in range(n_walks):
+                neighborhoods.append(nbrhd_gen.multinode2vec_walk(w, nbrhd_size, node, i))
+        path = shard_path(shard_dir, w, shard)
+        write_walk_shard(path, neighborhoods, nodes, key)
+        print("Finished nbrhd generation for r={}, shard {}/{}: {} of {} start nodes".format(
+            w, shard[0], shard[1], len(tasks), sum(len(layer) for layer in layer_nodes)))
+        shard_files[w] = path
+    return shard_files
+
+
 def extract_neighborhoods(layers, nbrhd_size, n_samples, weighted=False):
     """
     Extracts neighborhoods of length, nbrhd_size, for each node in each layer.
@@ -130,6 +375,49 @@ def extract_node_neighborhoods(node, neighbors, nbrhd_size, n_samples):
 # -------------------------------------------------------------------------------
 # HELPERS
 # -------------------------------------------------------------------------------
+def save_features(nodes, vectors, out):
+    """
+    Writes features in the format of generate_features(): a word2vec embedding file (.emb)
+    and a feature matrix (.csv).
+
+    :param nodes: list of node IDs
+    :param vectors: numpy array of features, (N x d)
+    :param out: absolute path for output file (no extension, file type)
+    :return: n x d network embedding, as read back by emb_to_pandas()
+    """
+    embfile = out + ".emb"
+    dirs = os.path.dirname(embfile)
+    if dirs and not os.path.exists(dirs):
+        os.makedirs(dirs)
+    with open(embfile, 'w') as f:
+        f.write("{} {}\n".format(len(nodes), vectors.shape[1]))
+        for node, vector in zip(nodes, vectors):
+            f.write(str(node) + " " + " ".join(repr(float(x)) for x in vector) + "\n")
+    ftrs = emb_to_pandas(embfile)
+    feature_matrix_to_csv(ftrs, out)
+    return ftrs
+
+
+def model_to_pandas(w2v_model):
+    """
+    Converts a trained word2vec model to the feature matrix emb_to_pandas() reads from its embedding file.
+
+    :param w2v_model: trained gensim Word2Vec model
+    :return: pandas DataFrame, (N x d), indexed by node ID. As in emb_to_pandas(), node IDs that
+            are all numbers are parsed into a numeric index, sorted numerically
+    """
+    import pandas as pd
+    wv = w2v_model.wv
+    # read_csv() parses the node ID column into numbers when it can
+    try:
+        index = pd.Index(pd.to_numeric(wv.index2word))
+    except ValueError:
+        index = pd.Index(wv.index2word)
+    ftrs = pd.DataFrame(np.asarray(wv.syn0, dtype=np.float64), index=index, columns=range(1, wv.syn0.shape[1] + 1))
+    ftrs.sort_index(inplace=True)
+    return ftrs
+
+
 def emb_to_pandas(emb_file):
     """
     Converts embedding file, as extracted from trained word2vec model, to a numpy n-dimensional array.
@@ -137,6 +425,7 @@ def emb_to_pandas(emb_file):
     :param emb_file: absolute path to word2vec embedding file
     :return: numpy ndarray, (N x d)
     """
+    import pandas as pd
     ftrs = pd.read_csv(emb_file, delim_whitespace=True, skiprows=1, header=None, index_col=0)
     ftrs.sort_index(inplace=True)
     return ftrs
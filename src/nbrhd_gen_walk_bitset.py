@@ -0,0 +1,174 @@
+'''
+Random walks on multilayer networks whose layers share one node set, as in group fMRI.
+
+The node index is stored once. Each layer is an array mapping every node to one of the distinct
+neighborhoods found across all layers, and each distinct neighborhood is stored once, as a bitset
+over the node index with its alias table. Memory then grows with the variability of the layers
+rather than with their number.
+
+There are no alias tables of second order transitions, which would take one table per edge of
+each layer. The next node of a walk is instead drawn from the first order alias table of the
+current node and accepted with probability proportional to its return / exploration bias, found
+from the bitset of the previous node's neighborhood (rejection sampling, as in KnightKing, Yang et
+al., SOSP 2019). Walks follow the same distribution as those of NeighborhoodGen.
+
+Details can be found in the paper: "Fast Embedding of Multilayer Networks: An Algorithm and Application to Group fMRI"
+by JD Wilson, M Baybay, R Sankar, and P Stillman
+
+Preprint here: https://arxiv.org/pdf/1809.06437.pdf
+
+Contributors:
+- Melanie Baybay
+University of San Francisco, Department of Computer Science
+- Rishi Sankar
+Henry M. Gunn High School
+- James D. Wilson (maintainer)
+University of San Francisco, Department of Mathematics and Statistics
+
+Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
+'''
+
+
+import copy
+import time
+import numpy as np
+from .nbrhd_gen_walk_nx import alias_setup, alias_draw, next_layer
+from .nbrhd_gen_walk_csr import layer_to_csr
+
+
+class SharedNeighborhoodGen():
+	def __init__(self, layers, p, q):
+		'''
+		:param layers: list of adjacency lists as pandas DataFrames with columns ["source", "target", "weight"]
+		:param p: return walk parameter
+		:param q: exploration walk parameter
+		'''
+		import pandas as pd
+		self.p = p
+		self.q = q
+		self.max_bias = max(1.0 / p, 1.0, 1.0 / q)
+		# sorted, so that the neighbors of a node are in the order NeighborhoodGen draws them
+		self.nodes = sorted(set().union(*[set(layer["source"]) | set(layer["target"]) for layer in layers]))
+		self.node_ids = dict((node, i) for i, node in enumerate(self.nodes))
+
+		self.layer_starts = []
+		self.layer_rows = []
+		self.nbrhd_keys = {}
+		self.nbrhd_bits = []
+		self.nbrhd_indices = []
+		self.alias_nodes = []
+
+		start_time = time.time()
+		n_edges = 0
+		for layer in layers:
+			src = layer["source"].map(self.node_ids).values
+			dst = layer["target"].map(self.node_ids).values
+			# walks start from the nodes of a layer in the order networkx adds them
+			self.layer_starts.append(pd.unique(np.column_stack([src, dst]).ravel()).astype(np.int32))
+			n_edges += self.add_layer_edges(src, dst, layer["weight"].values)
+		# only needed to find the distinct neighborhoods
+		del self.nbrhd_keys
+		print("Stored {} layers over {} nodes and {} edges as {} distinct neighborhoods of {} layer neighborhoods "
+			  "in {:.2f} seconds.".format(len(layers), len(self.nodes), n_edges, len(self.nbrhd_bits),
+										  sum(len(starts) for starts in self.layer_starts), time.time() - start_time))
+
+	def add_layer_edges(self, src, dst, weights):
+		'''
+		Maps the nodes of a layer to their neighborhoods, adding the neighborhoods not seen in previous layers.
+		:return: number of edges (in both directions) of the layer
+		'''
+		n_nodes = len(self.nodes)
+		_, indptr, indices, weights = layer_to_csr(src, dst, weights, n_nodes)
+		layer_rows = np.full(n_nodes, -1, dtype=np.int32)
+		for node in np.flatnonzero(np.diff(indptr)):
+			start, end = indptr[node], indptr[node + 1]
+			layer_rows[node] = self.neighborhood_id(indices[start:end], weights[start:end])
+		self.layer_rows.append(layer_rows)
+		return len(indices)
+
+	def neighborhood_id(self, nbrs, weights):
+		'''
+		Id of a neighborhood, storing it with its alias table if it is new.
+		'''
+		bits = np.zeros(len(self.nodes), dtype=bool)
+		bits[nbrs] = True
+		bits = np.packbits(bits)
+		key = bits.tobytes() + weights.tobytes()
+		nbrhd_id = self.nbrhd_keys.get(key)
+		if nbrhd_id is None:
+			nbrhd_id = len(self.nbrhd_bits)
+			self.nbrhd_keys[key] = nbrhd_id
+			self.nbrhd_bits.append(bits)
+			self.nbrhd_indices.append(nbrs.copy())
+			J, q = alias_setup(weights / weights.sum())
+			self.alias_nodes.append((J.astype(np.int32), q.astype(np.float32)))
+		return nbrhd_id
+
+	def is_neighbor(self, nbrhd, node):
+		'''
+		Whether a node is in a neighborhood, from its bitset.
+		'''
+		return (self.nbrhd_bits[nbrhd][node >> 3] >> (7 - (node & 7))) & 1 == 1
+
+	def subset(self, layer_ids):
+		'''
+		Generator walking only some of the layers, sharing the node index and neighborhoods of this one.
+		:param layer_ids: ids of the layers to keep
+		'''
+		view = copy.copy(self)
+		view.layer_rows = [self.layer_rows[i] for i in layer_ids]
+		view.layer_starts = [self.layer_starts[i] for i in layer_ids]
+		return view
+
+	def layer_count(self):
+		return len(self.layer_rows)
+
+	def start_nodes(self, layer_id):
+		'''
+		Nodes with at least one edge in a layer.
+		'''
+		return [self.nodes[i] for i in self.layer_starts[layer_id]]
+
+	def multinode2vec_walk(self, w, walk_length, start_node, start_layer_id, walk_layers=None):
+		'''
+		Simulate a random walk starting from start node. (Generate one neighborhood)
+		If walk_layers is a list, the start layer and the layer of each step are appended to it.
+		'''
+		walk = [self.node_ids[start_node]] #nbrhd
+		cur_layer_id = start_layer_id
+		if walk_layers is not None:
+			walk_layers.append(start_layer_id)
+		force_switch = False
+		while len(walk) < walk_length:
+			cur = walk[-1]
+			if not force_switch:
+				prev_layer_id = cur_layer_id
+			cur_layer_id = next_layer(w, cur_layer_id, len(self.layer_rows), force_switch)
+			force_switch = False
+			layer_rows = self.layer_rows[cur_layer_id]
+			nbrhd = layer_rows[cur]
+			if nbrhd < 0:
+				force_switch = True
+				continue
+			J, q = self.alias_nodes[nbrhd]
+			nbrs = self.nbrhd_indices[nbrhd]
+			if walk_layers is not None:
+				walk_layers.append(cur_layer_id)
+			if len(walk) == 1 or prev_layer_id != cur_layer_id:
+				walk.append(int(nbrs[alias_draw(J, q)]))
+				continue
+			prev = walk[-2]
+			prev_nbrhd = layer_rows[prev]
+			while True:
+				next = int(nbrs[alias_draw(J, q)])
+				if next == prev:
+					bias = 1.0 / self.p
+				elif prev_nbrhd >= 0 and self.is_neighbor(prev_nbrhd, next):
+					bias = 1.0
+				else:
+					bias = 1.0 / self.q
+				if np.random.rand() * self.max_bias < bias:
+					break
+			walk.append(next)
+
+		return [self.nodes[node] for node in walk]
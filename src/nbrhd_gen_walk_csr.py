@@ -0,0 +1,259 @@
+'''
+Memory-mapped random walks on multilayer networks, for multilayer networks that do not fit in memory.
+
+Each layer is stored on disk as a CSR adjacency over a shared node index, together with the alias
+tables of its first and second order transitions. The walker only maps the layers it is visiting,
+within a byte budget, and otherwise walks exactly as NeighborhoodGen does. Batches of walks are
+scheduled by layer, so that a layer is mapped once for all the walks in it.
+
+Details can be found in the paper: "Fast Embedding of Multilayer Networks: An Algorithm and Application to Group fMRI"
+by JD Wilson, M Baybay, R Sankar, and P Stillman
+
+Preprint here: https://arxiv.org/pdf/1809.06437.pdf
+
+Contributors:
+- Melanie Baybay
+University of San Francisco, Department of Computer Science
+- Rishi Sankar
+Henry M. Gunn High School
+- James D. Wilson (maintainer)
+University of San Francisco, Department of Mathematics and Statistics
+
+Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
+'''
+
+
+import os
+import numpy as np
+from collections import OrderedDict
+from .nbrhd_gen_walk_nx import alias_setup, alias_draw, next_layer
+
+# arrays stored for each layer. Node i has neighbors indices[indptr[i]:indptr[i+1]], sorted, and
+# the alias table of its first order transitions is aligned with them. The alias table of the
+# second order transitions after edge e = (u, v) spans edge_ptr[e]:edge_ptr[e+1] and is aligned
+# with the neighbors of v.
+LAYER_ARRAYS = ['indptr', 'indices', 'weights', 'node_J', 'node_q', 'edge_ptr', 'edge_J', 'edge_q']
+
+
+class MemmapNeighborhoodGen():
+	def __init__(self, layer_dirs, cache_bytes):
+		'''
+		:param layer_dirs: directories of the layers written by spill_layer()
+		:param cache_bytes: maximum number of bytes of layers mapped at once
+		'''
+		self.layer_dirs = layer_dirs
+		self.cache = LayerCache(layer_dirs, cache_bytes)
+
+	def start_nodes(self, layer_id):
+		'''
+		Nodes with at least one edge in a layer.
+		'''
+		indptr = self.cache.get(layer_id)['indptr']
+		return np.flatnonzero(np.diff(indptr) > 0)
+
+	def multinode2vec_walk(self, w, walk_length, start_node, start_layer_id):
+		'''
+		Simulate a random walk starting from start node. (Generate one neighborhood)
+		Nodes are represented by their index in the shared node index.
+		'''
+		return self.multinode2vec_walks(w, walk_length, [(start_node, start_layer_id)])[0]
+
+	def multinode2vec_walks(self, w, walk_length, starts):
+		'''
+		Simulate a batch of random walks, one from each (start node, start layer ID) pair.
+		Rather than following one walk at a time, the walks are scheduled by layer: a layer is mapped
+		and every walk in it is advanced until it switches out, before the next layer is mapped. Each
+		walk follows the same law as a walk of its own.
+		:return: list of walks, in the order of starts
+		'''
+		n_layers = len(self.layer_dirs)
+		walks = [[start_node] for start_node, _ in starts]
+		if walk_length <= 1:
+			return walks
+		# walks waiting in each layer for their next step, as (walk index, layer of the last step)
+		pending = [[] for _ in range(n_layers)]
+		for i, (_, start_layer_id) in enumerate(starts):
+			pending[next_layer(w, start_layer_id, n_layers, False)].append((i, start_layer_id))
+		while any(pending):
+			layer_id = self.scheduled_layer(pending)
+			layer = self.cache.get(layer_id)
+			queue, pending[layer_id] = pending[layer_id], []
+			while queue:
+				i, prev_layer_id = queue.pop()
+				walk = walks[i]
+				force_switch = not walk_step(layer, walk, len(walk) == 1 or prev_layer_id != layer_id)
+				if not force_switch:
+					if len(walk) >= walk_length:
+						continue
+					prev_layer_id = layer_id
+				next_layer_id = next_layer(w, layer_id, n_layers, force_switch)
+				# walks that stay in the layer are advanced in this pass
+				(queue if next_layer_id == layer_id else pending[next_layer_id]).append((i, prev_layer_id))
+
+		return walks
+
+	def scheduled_layer(self, pending):
+		'''
+		Layer to advance next: the mapped layer with the most waiting walks, else the layer with the most.
+		'''
+		waiting = [layer_id for layer_id in range(len(pending)) if pending[layer_id]]
+		mapped = [layer_id for layer_id in waiting if layer_id in self.cache.layers]
+		return max(mapped or waiting, key=lambda layer_id: len(pending[layer_id]))
+
+
+class LayerCache():
+	'''
+	Least recently used set of memory-mapped layers, holding at most max_bytes of layer files.
+	Unmapping a layer releases its pages, so the budget bounds the memory used by the layers.
+	'''
+	def __init__(self, layer_dirs, max_bytes):
+		self.layer_dirs = layer_dirs
+		self.max_bytes = max_bytes
+		self.layers = OrderedDict()
+		self.sizes = {}
+		self.total_bytes = 0
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, layer_id):
+		layer = self.layers.get(layer_id)
+		if layer is not None:
+			self.hits += 1
+			self.layers.move_to_end(layer_id)
+			return layer
+		self.misses += 1
+		layer_dir = self.layer_dirs[layer_id]
+		size = sum(os.path.getsize(os.path.join(layer_dir, name + '.npy')) for name in LAYER_ARRAYS)
+		# always keep the requested layer, even when it alone exceeds the budget
+		while self.layers and self.total_bytes + size > self.max_bytes:
+			evicted, _ = self.layers.popitem(last=False)
+			self.total_bytes -= self.sizes.pop(evicted)
+		layer = dict((name, np.load(os.path.join(layer_dir, name + '.npy'), mmap_mode='r')) for name in LAYER_ARRAYS)
+		self.layers[layer_id] = layer
+		self.sizes[layer_id] = size
+		self.total_bytes += size
+		return layer
+
+
+def walk_step(layer, walk, first_order):
+	'''
+	Appends one step in a layer to a walk, drawn from the first order transitions of its last node,
+	or from the second order transitions after its last edge.
+	:return: False if the walk cannot move in the layer and must switch layers
+	'''
+	cur = walk[-1]
+	indptr = layer['indptr']
+	# nodes added to the index after this layer was written have no neighbors in it
+	if cur + 1 >= len(indptr) or indptr[cur] == indptr[cur + 1]:
+		return False
+	start, end = indptr[cur], indptr[cur + 1]
+	if first_order:
+		kk = alias_draw(layer['node_J'][start:end], layer['node_q'][start:end])
+	else:
+		edge = find_edge(layer, walk[-2], cur)
+		if edge < 0:
+			return False
+		edge_start, edge_end = layer['edge_ptr'][edge], layer['edge_ptr'][edge + 1]
+		kk = alias_draw(layer['edge_J'][edge_start:edge_end], layer['edge_q'][edge_start:edge_end])
+	walk.append(int(layer['indices'][start + kk]))
+	return True
+
+
+def find_edge(layer, src, dst):
+	'''
+	Position of edge (src, dst) in the CSR arrays of a layer, or -1 if there is no such edge.
+	'''
+	indptr = layer['indptr']
+	if src + 1 >= len(indptr):
+		return -1
+	start, end = indptr[src], indptr[src + 1]
+	edge = start + np.searchsorted(layer['indices'][start:end], dst)
+	if edge < end and layer['indices'][edge] == dst:
+		return edge
+	return -1
+
+
+def spill_layer(layer, node_ids, p, q, layer_dir):
+	'''
+	Writes the CSR adjacency and alias tables of an undirected layer to .npy files.
+	:param layer: adjacency list as a pandas DataFrame with columns ["source", "target", "weight"]
+	:param node_ids: dict of node ID to index in the shared node index. New nodes are added to it
+	:param p: return walk parameter
+	:param q: exploration walk parameter
+	:param layer_dir: output directory
+	:return: number of edges (in both directions) of the layer
+	'''
+	if not os.path.exists(layer_dir):
+		os.makedirs(layer_dir)
+	for node in list(layer["source"]) + list(layer["target"]):
+		if node not in node_ids:
+			node_ids[node] = len(node_ids)
+	n_nodes = len(node_ids)
+	src = layer["source"].map(node_ids).values.astype(np.int64)
+	dst = layer["target"].map(node_ids).values.astype(np.int64)
+	rows, indptr, indices, weights = layer_to_csr(src, dst, layer["weight"].values, n_nodes)
+
+	node_J = np.zeros(len(indices), dtype=np.int32)
+	node_q = np.zeros(len(indices), dtype=np.float32)
+	for node in range(n_nodes):
+		start, end = indptr[node], indptr[node + 1]
+		if end > start:
+			J, qq = alias_setup(weights[start:end] / weights[start:end].sum())
+			node_J[start:end] = J
+			node_q[start:end] = qq
+
+	# the second order table of edge (u, v) spans the neighbors of v
+	degrees = np.diff(indptr)
+	edge_ptr = np.concatenate([[0], np.cumsum(degrees[indices])]).astype(np.int64)
+	edge_J = np.lib.format.open_memmap(os.path.join(layer_dir, 'edge_J.npy'), mode='w+',
+									   dtype=np.int32, shape=(int(edge_ptr[-1]),))
+	edge_q = np.lib.format.open_memmap(os.path.join(layer_dir, 'edge_q.npy'), mode='w+',
+									   dtype=np.float32, shape=(int(edge_ptr[-1]),))
+	for edge in range(len(indices)):
+		prev, cur = rows[edge], indices[edge]
+		prev_nbrs = indices[indptr[prev]:indptr[prev + 1]]
+		cur_nbrs = indices[indptr[cur]:indptr[cur + 1]]
+		cur_weights = weights[indptr[cur]:indptr[cur + 1]]
+		pos = np.minimum(np.searchsorted(prev_nbrs, cur_nbrs), len(prev_nbrs) - 1)
+		unnormalized_probs = np.where(cur_nbrs == prev, cur_weights / p,
+									  np.where(prev_nbrs[pos] == cur_nbrs, cur_weights, cur_weights / q))
+		J, qq = alias_setup(unnormalized_probs / unnormalized_probs.sum())
+		edge_J[edge_ptr[edge]:edge_ptr[edge + 1]] = J
+		edge_q[edge_ptr[edge]:edge_ptr[edge + 1]] = qq
+	edge_J.flush()
+	edge_q.flush()
+	del edge_J, edge_q
+
+	arrays = {'indptr': indptr, 'indices': indices, 'weights': weights.astype(np.float32),
+			  'node_J': node_J, 'node_q': node_q, 'edge_ptr': edge_ptr}
+	for name, array in arrays.items():
+		np.save(os.path.join(layer_dir, name + '.npy'), array)
+	return len(indices)
+
+
+def layer_to_csr(src, dst, weights, n_nodes):
+	'''
+	CSR adjacency of an undirected layer, with the neighbors of each node sorted.
+	:param src: node indices of the sources of the edges
+	:param dst: node indices of the targets of the edges
+	:param weights: weights of the edges
+	:param n_nodes: size of the node index
+	:return: (source of each CSR entry, indptr, indices, weights)
+	'''
+	src = np.asarray(src, dtype=np.int64)
+	dst = np.asarray(dst, dtype=np.int64)
+	weights = np.asarray(weights, dtype=np.float64)
+	# an undirected edge keeps the weight of its last occurrence, as in networkx
+	low, high = np.minimum(src, dst), np.maximum(src, dst)
+	keys = (low * n_nodes + high)[::-1]
+	_, last = np.unique(keys, return_index=True)
+	last = len(keys) - 1 - last
+	low, high, weights = low[last], high[last], weights[last]
+	loops = low == high
+	rows = np.concatenate([low, high[~loops]])
+	cols = np.concatenate([high, low[~loops]])
+	weights = np.concatenate([weights, weights[~loops]])
+	order = np.lexsort((cols, rows))
+	rows, cols, weights = rows[order], cols[order], weights[order]
+	indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n_nodes))]).astype(np.int64)
+	return rows, indptr, cols.astype(np.int32), weights
@@ -19,7 +19,6 @@ Questions or Bugs? Contact James D. Wilson at jdwilson4@usfca.edu
 
 
 import numpy as np
-import networkx as nx
 import random
 #import multiprocessing
 import threading
@@ -38,9 +37,41 @@ class NeighborhoodGen():
 
 		self.preprocess_transition_probs()
 
-	def multinode2vec_walk(self, w, walk_length, start_node, start_layer_id):
+	def __getstate__(self):
+		'''
+		Pickle without the preprocessing lock, e.g. for checkpoints.
+		'''
+		state = self.__dict__.copy()
+		state.pop('lock', None)
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.lock = threading.Lock()
+
+	def add_layer(self, layer):
+		'''
+		Appends a layer and preprocesses its transition probabilities.
+		:return: id of the new layer
+		'''
+		layer_id = len(self.G)
+		self.G.append(layer)
+		self.preprocess_thread(layer, layer_id)
+		return layer_id
+
+	def layer_count(self):
+		return len(self.G)
+
+	def start_nodes(self, layer_id):
+		'''
+		Nodes with at least one edge in a layer.
+		'''
+		return list(self.G[layer_id].nodes())
+
+	def multinode2vec_walk(self, w, walk_length, start_node, start_layer_id, walk_layers=None):
 		'''
 		Simulate a random walk starting from start node. (Generate one neighborhood)
+		If walk_layers is a list, the start layer and the layer of each step are appended to it.
 		'''
 
 		G = self.G
@@ -49,20 +80,15 @@ class NeighborhoodGen():
 
 		walk = [start_node] #nbrhd
 		cur_layer_id = start_layer_id
+		if walk_layers is not None:
+			walk_layers.append(start_layer_id)
 		force_switch = False
 		while len(walk) < walk_length:
 			cur = walk[-1]
 			if not force_switch:
 				prev_layer_id = cur_layer_id
-			random.seed(1234)
-			rval = random.random()
-			if rval < w or force_switch: #then switch layer CHECK THIS!!
-				total_layers = len(G)
-				rlay = random.randint(0, total_layers - 2)
-				if rlay >= cur_layer_id:
-					rlay += 1
-				cur_layer_id = rlay
-				force_switch = False
+			cur_layer_id = next_layer(w, cur_layer_id, len(G), force_switch)
+			force_switch = False
 			cur_layer = G[cur_layer_id]
 			try:
 				cur_nbrs = sorted(cur_layer.neighbors(cur))
@@ -74,6 +100,8 @@ class NeighborhoodGen():
 						next = cur_nbrs[alias_draw(alias_edges[cur_layer_id][(prev, cur)][0],
 							alias_edges[cur_layer_id][(prev, cur)][1])]
 						walk.append(next)
+					if walk_layers is not None:
+						walk_layers.append(cur_layer_id)
 				else:
 					force_switch = True
 					continue
@@ -191,6 +219,19 @@ class NeighborhoodGen():
 
 		return
 
+def next_layer(w, cur_layer_id, total_layers, force_switch=False):
+	'''
+	Layer of the next step of a walk: a uniformly chosen other layer with probability w, or
+	when the current node has no neighbors in its layer, else the current layer.
+	Draws from np.random, as alias_draw() does, so that seeding np.random seeds the whole walk.
+	'''
+	if force_switch or (total_layers > 1 and np.random.rand() < w):
+		rlay = np.random.randint(0, total_layers - 1)
+		if rlay >= cur_layer_id:
+			rlay += 1
+		return rlay
+	return cur_layer_id
+
 def alias_setup(probs):
 	'''
 	Compute utility lists for non-uniform sampling from discrete distributions.
@@ -199,7 +240,7 @@ def alias_setup(probs):
 	'''
 	K = len(probs)
 	q = np.zeros(K)
-	J = np.zeros(K, dtype=np.int)
+	J = np.zeros(K, dtype=int)
 
 	smaller = []
 	larger = []
@@ -0,0 +1,62 @@
+import os
+import pandas as pd
+import src as mltn2v
+
+
+def test_tmp_paths_are_unique_and_next_to_the_checkpoint(tmp_path):
+    path = os.path.join(str(tmp_path), "ckpt", "walks.pkl")
+    first, second = mltn2v.checkpoint_tmp_path(path), mltn2v.checkpoint_tmp_path(path)
+    assert first != second
+    assert os.path.dirname(first) == os.path.dirname(second) == os.path.dirname(path)
+    assert os.path.isdir(os.path.dirname(path))
+
+
+def test_save_leaves_only_the_checkpoint(tmp_path):
+    path = os.path.join(str(tmp_path), "walks.pkl")
+    mltn2v.save_checkpoint({'r': 0.25}, path)
+    mltn2v.save_checkpoint({'r': 0.5}, path)
+    assert os.listdir(str(tmp_path)) == ["walks.pkl"]
+    assert mltn2v.load_checkpoint(path) == {'r': 0.5}
+
+
+def ring_layers(offset=1, n_nodes=8):
+    '''
+    Two layers of n_nodes edges each, linking every node to the node offset steps further.
+    '''
+    edges = [(str(i + 1), str((i + offset) % n_nodes + 1), 1.0) for i in range(n_nodes)]
+    return [pd.DataFrame(edges, columns=["source", "target", "weight"]) for _ in range(2)]
+
+
+def test_neighborhood_gen_checkpoint_is_keyed_on_edges(tmp_path, capsys):
+    ckpt = str(tmp_path)
+    mltn2v.build_neighborhood_gen(ring_layers(1), 1, 0.5, checkpoint_dir=ckpt)
+    mltn2v.build_neighborhood_gen(ring_layers(1), 1, 0.5, checkpoint_dir=ckpt, resume=True)
+    assert "Loaded preprocessed" in capsys.readouterr().out
+    # as many edges, other edges
+    nbrhd_gen = mltn2v.build_neighborhood_gen(ring_layers(3), 1, 0.5, checkpoint_dir=ckpt, resume=True)
+    assert "[WARNING]" in capsys.readouterr().out
+    assert sorted(nbrhd_gen.G[0].neighbors("1")) == ["4", "6"]
+
+
+def walks_with_checkpoint(ckpt, layers, walk_length=5, resume=True):
+    nbrhd_gen = mltn2v.build_neighborhood_gen(layers, 1, 0.5)
+    return mltn2v.generate_walks(nbrhd_gen, walk_length, [0.25], n_walks=2, checkpoint_dir=ckpt, resume=resume,
+                                 network=mltn2v.layers_digest(layers))[0.25]
+
+
+def test_walks_are_resumed_only_for_the_same_key(tmp_path, capsys):
+    ckpt = str(tmp_path)
+    walks = walks_with_checkpoint(ckpt, ring_layers(1), resume=False)
+    assert len(walks) == 2 * 8 * 2
+    layer0 = os.path.join(ckpt, "walks", "r0.25", "layer0.txt")
+    # a resumed run reads the saved walks back
+    mltn2v.write_walks(layer0, [["1", "2", "3", "4", "5"]])
+    assert walks_with_checkpoint(ckpt, ring_layers(1))[0] == ["1", "2", "3", "4", "5"]
+    capsys.readouterr()
+
+    for layers, walk_length in [(ring_layers(1), 6), (ring_layers(3), 5)]:
+        mltn2v.write_walks(layer0, [["1", "2", "3", "4", "5"]])
+        walks = walks_with_checkpoint(ckpt, layers, walk_length)
+        assert "[WARNING] Walks" in capsys.readouterr().out
+        assert len(walks) == 2 * 8 * 2 and len(walks[0]) == walk_length
+        assert walks_with_checkpoint(ckpt, layers, walk_length) == walks
@@ -0,0 +1,158 @@
+'''
+Cohorts share one walk engine but each walks only its own layers, and are embedded with the
+pooled embedding under unique names.
+'''
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import src as mltn2v
+import src.multinode2vec as multinode2vec
+
+D = 8
+WALK_LENGTH = 6
+N_WALKS = 5
+
+
+def gensim_version():
+    try:
+        import gensim
+    except ImportError:
+        return None
+    return gensim.__version__
+
+
+# word2vec training is written against the gensim 2.3 API pinned in requirements.txt (size=,
+# iter=, wv.syn0, wv.index2word), which later versions of gensim removed
+requires_gensim_2 = pytest.mark.skipif(
+    not (gensim_version() or '').startswith('2.'),
+    reason="needs gensim 2.x of requirements.txt, found {}".format(gensim_version()))
+
+
+def cohort_layers(prefix, n_layers=2, n_nodes=6, seed=0):
+    '''
+    Layers of a cohort over the nodes prefix1..prefix<n_nodes>: a ring, plus random chords.
+    '''
+    rng = np.random.RandomState(seed)
+    layers = []
+    for _ in range(n_layers):
+        edges = set((i, (i + 1) % n_nodes) for i in range(n_nodes))
+        edges |= set((i, j) for i, j in zip(rng.randint(0, n_nodes, 4), rng.randint(0, n_nodes, 4)) if i < j)
+        layers.append(pd.DataFrame([(prefix + str(i + 1), prefix + str(j + 1), 1.0) for i, j in sorted(edges)],
+                                   columns=["source", "target", "weight"]))
+    return layers
+
+
+@pytest.fixture(scope="module")
+def cohorts():
+    return [cohort_layers("a", seed=0), cohort_layers("b", seed=1)]
+
+
+def nodes_of(layers):
+    return set(node for layer in layers for node in list(layer["source"]) + list(layer["target"]))
+
+
+def test_cohort_names_are_unique():
+    assert mltn2v.cohort_names(["data/x", "other/x/", "more/x", "data/y"]) == ["x", "x_1", "x_2", "y"]
+
+
+def test_cohort_names_avoid_the_base_name():
+    assert mltn2v.cohort_names(["data/" + mltn2v.BASE_NAME, "x"]) == [mltn2v.BASE_NAME + "_1", "x"]
+
+
+def test_subset_walks_only_its_layers(cohorts):
+    nbrhd_gen = mltn2v.SharedNeighborhoodGen(cohorts[0] + cohorts[1], 1, 0.5)
+    np.random.seed(0)
+    for start, layers in ((0, cohorts[0]), (2, cohorts[1])):
+        subset = nbrhd_gen.subset(range(start, start + 2))
+        assert subset.layer_count() == 2
+        assert subset.nodes is nbrhd_gen.nodes
+        own_nodes = nodes_of(layers)
+        for i in range(2):
+            assert subset.start_nodes(i) == nbrhd_gen.start_nodes(start + i)
+            for node in subset.start_nodes(i):
+                walk_layers = []
+                # r = 1 switches layers at every step
+                walk = subset.multinode2vec_walk(1.0, WALK_LENGTH, node, i, walk_layers=walk_layers)
+                assert set(walk) <= own_nodes
+                assert set(walk_layers) <= {0, 1}
+    assert nbrhd_gen.layer_count() == 4
+
+
+def walks(layers, r=0.25):
+    np.random.seed(0)
+    nbrhd_gen = mltn2v.build_neighborhood_gen(layers, 1, 0.5)
+    return mltn2v.generate_walks(nbrhd_gen, WALK_LENGTH, [r], n_walks=N_WALKS)[r]
+
+
+@requires_gensim_2
+def test_train_word2vec_embeds_every_node(cohorts):
+    w2v_model = mltn2v.train_word2vec(walks(cohorts[0]), D, nbrhd_size=3, w2v_iter=2, workers=1)
+    assert sorted(w2v_model.wv.index2word) == sorted(nodes_of(cohorts[0]))
+    assert w2v_model.wv.syn0.shape == (len(nodes_of(cohorts[0])), D)
+
+
+@requires_gensim_2
+def test_train_epoch_keeps_the_learning_rates(cohorts):
+    nbrhds = walks(cohorts[0])
+    w2v_model = mltn2v.train_word2vec(nbrhds, D, nbrhd_size=3, w2v_iter=1, workers=1)
+    alpha, min_alpha = w2v_model.alpha, w2v_model.min_alpha
+    for epoch in range(3):
+        before = np.array(w2v_model.wv.syn0)
+        mltn2v.train_epoch(w2v_model, nbrhds, len(nbrhds), epoch, 3)
+        assert not np.array_equal(before, w2v_model.wv.syn0)
+        assert (w2v_model.alpha, w2v_model.min_alpha) == (alpha, min_alpha)
+
+
+@requires_gensim_2
+def test_train_word2vec_resumes_from_checkpoint(cohorts, tmp_path, monkeypatch, capsys):
+    nbrhds = walks(cohorts[0])
+    checkpoint_path = os.path.join(str(tmp_path), "word2vec.model")
+    train_epoch = multinode2vec.train_epoch
+
+    def interrupted(w2v_model, nbrhds, n_nbrhds, epoch, w2v_iter, anneal=False):
+        if epoch == 2:
+            raise KeyboardInterrupt()
+        train_epoch(w2v_model, nbrhds, n_nbrhds, epoch, w2v_iter, anneal=anneal)
+    monkeypatch.setattr(multinode2vec, "train_epoch", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        mltn2v.train_word2vec(nbrhds, D, nbrhd_size=3, w2v_iter=4, workers=1,
+                              checkpoint_path=checkpoint_path, walk_key={'r': 0.25})
+    monkeypatch.undo()
+
+    w2v_model = mltn2v.train_word2vec(nbrhds, D, nbrhd_size=3, w2v_iter=4, workers=1,
+                                      checkpoint_path=checkpoint_path, resume=True, walk_key={'r': 0.25})
+    assert "Resuming word2vec training after epoch 2 of 4" in capsys.readouterr().out
+    assert w2v_model.mltn2v_epochs == 4
+
+    # the checkpoint of other walks is trained again
+    w2v_model = mltn2v.train_word2vec(nbrhds, D, nbrhd_size=3, w2v_iter=4, workers=1,
+                                      checkpoint_path=checkpoint_path, resume=True, walk_key={'r': 0.5})
+    assert "does not match" in capsys.readouterr().out
+    assert w2v_model.mltn2v_key['walks'] == {'r': 0.5}
+    assert w2v_model.mltn2v_epochs == 4
+
+
+@requires_gensim_2
+def test_train_word2vec_stops_early(cohorts):
+    # every epoch is below the tolerance, so training stops after one epoch and the annealing epoch
+    monitor = mltn2v.ConvergenceMonitor('delta', tol=1e9, patience=1)
+    w2v_model = mltn2v.train_word2vec(walks(cohorts[0]), D, nbrhd_size=3, w2v_iter=10, workers=1, monitor=monitor)
+    assert w2v_model.mltn2v_converged
+    assert w2v_model.mltn2v_epochs == 2
+    assert [entry[0] for entry in w2v_model.mltn2v_curve] == [1, 2]
+
+
+@requires_gensim_2
+@pytest.mark.parametrize("training", ["joint", "warm_start"])
+def test_cohorts_are_embedded_with_the_base(cohorts, tmp_path, training):
+    features = mltn2v.run_cohorts(cohorts, D, str(tmp_path), [0.25], WALK_LENGTH, 1, 0.5, names=["a", "b"],
+                                  training=training, nbrhd_size=3, n_walks=N_WALKS, workers=1)
+    embeddings = features[0.25]
+    assert sorted(embeddings) == sorted(["a", "b", mltn2v.BASE_NAME])
+    for name in embeddings:
+        assert os.path.exists(os.path.join(str(tmp_path), name, "r0.25", "mltn2v_results.csv"))
+    assert set(map(str, embeddings[mltn2v.BASE_NAME].index)) == nodes_of(cohorts[0]) | nodes_of(cohorts[1])
+    for name, layers in zip(["a", "b"], cohorts):
+        assert set(map(str, embeddings[name].index)) <= nodes_of(layers)
+        assert embeddings[name].shape[1] == D
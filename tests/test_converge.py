@@ -0,0 +1,77 @@
+'''
+The reconstruction monitor scores edges held out of the walks.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+import src as mltn2v
+
+
+def random_layers(n_layers=3, n_nodes=30, density=0.2, seed=0):
+    rng = np.random.RandomState(seed)
+    nodes = np.array([str(i) for i in range(1, n_nodes + 1)], dtype=object)
+    layers = []
+    for _ in range(n_layers):
+        rows, cols = np.nonzero(np.triu(rng.rand(n_nodes, n_nodes) < density, 1))
+        layers.append(pd.DataFrame({"source": nodes[rows], "target": nodes[cols], "weight": 1.0},
+                                   columns=["source", "target", "weight"]))
+    return layers
+
+
+def pairs(layers):
+    return set(frozenset(pair) for layer in layers for pair in zip(layer["source"], layer["target"]))
+
+
+def test_sample_is_distinct_edges_and_non_edges():
+    layers = random_layers()
+    edges = pairs(layers)
+    first, second, labels = mltn2v.sample_edge_pairs(layers, n_pairs=10000)
+    sampled = [frozenset(pair) for pair in zip(first, second)]
+    positives = [pair for pair, label in zip(sampled, labels) if label == 1]
+    negatives = [pair for pair, label in zip(sampled, labels) if label == 0]
+    assert len(positives) == len(negatives) == int(mltn2v.RECONSTRUCTION_SHARE * len(edges))
+    assert len(set(positives)) == len(positives)
+    assert all(pair in edges for pair in positives)
+    assert not any(pair in edges or len(pair) == 1 for pair in negatives)
+
+
+def test_sampled_edges_are_held_out():
+    layers = random_layers()
+    edge_sample = mltn2v.sample_edge_pairs(layers, n_pairs=50)
+    # one layer listing its edges in the other direction
+    layers[1] = layers[1].rename(columns={"source": "target", "target": "source"})[["source", "target", "weight"]]
+    held_out = set(frozenset(pair) for pair, label in zip(zip(*edge_sample[:2]), edge_sample[2]) if label == 1)
+    kept = mltn2v.remove_edge_pairs(layers, edge_sample)
+    assert pairs(kept) == pairs(layers) - held_out
+    assert sum(len(layer) for layer in kept) < sum(len(layer) for layer in layers)
+
+
+def test_reconstruction_needs_non_edges():
+    complete = pd.DataFrame([("1", "2", 1.0), ("1", "3", 1.0), ("2", "3", 1.0)], columns=["source", "target", "weight"])
+    with pytest.raises(ValueError):
+        mltn2v.sample_edge_pairs([complete])
+
+
+class LossModel():
+    '''
+    Stands in for a word2vec model reporting a given training loss after each epoch.
+    '''
+    def __init__(self, losses):
+        self.losses = iter(losses)
+
+    def get_latest_training_loss(self):
+        return next(self.losses)
+
+
+def converged(losses, tol=1e-3, patience=1):
+    monitor = mltn2v.ConvergenceMonitor('loss', tol, patience=patience)
+    w2v_model = LossModel(losses)
+    monitor.start(w2v_model)
+    return [monitor.update(w2v_model, epoch + 1, 0.0) for epoch in range(len(losses))]
+
+
+def test_non_finite_improvement_is_not_flat():
+    assert converged([10.0, 10.0]) == [False, True]
+    assert converged([10.0, float('nan')]) == [False, False]
+    assert converged([10.0, float('inf')]) == [False, False]
+    assert converged([10.0, 10.0, float('nan'), 5.0, 5.0], patience=2) == [False] * 5
@@ -0,0 +1,69 @@
+'''
+Subgroup selection from a walk corpus, on walks that switch layers.
+'''
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+import src as mltn2v
+
+LAYER_NAMES = ["0040013.preprocess_v1.csv", "0040014.preprocess_v1.csv", "0040017.preprocess_v1.csv"]
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    pairs = list(itertools.combinations([str(i) for i in range(1, 7)], 2))
+    layers = [pd.DataFrame([(a, b, 1.0) for a, b in pairs], columns=["source", "target", "weight"])
+              for _ in LAYER_NAMES]
+    nbrhd_gen = mltn2v.build_neighborhood_gen(layers, 1, 0.5)
+    np.random.seed(0)
+    corpus = mltn2v.generate_tagged_walks(nbrhd_gen, 5, [0.25], LAYER_NAMES, n_walks=20)[0.25]
+    path = str(tmp_path_factory.mktemp("corpus").joinpath("walks.npz"))
+    corpus.save(path)
+    return mltn2v.WalkCorpus.load(path)
+
+
+def test_layer_ids_match_whole_file_names(corpus):
+    assert corpus.layer_ids(["0040014.preprocess_v1.csv", "0040013.preprocess_v1"]) == [0, 1]
+    with pytest.raises(ValueError):
+        corpus.layer_ids(["0040013"])
+
+
+def test_modes_differ(corpus):
+    ids = corpus.layer_ids(["0040013.preprocess_v1"])
+    start, every, reweight = [set(corpus.select(ids, mode)) for mode in mltn2v.WALK_MODES]
+    assert len(start) == len(corpus) // len(LAYER_NAMES)
+    # walks of length 5 stay in their layer with probability 0.75 ** 4
+    assert every < start
+    assert 0.2 < len(every) / float(len(start)) < 0.45
+    assert reweight != start
+    share = corpus.subgroup_share(ids)
+    assert np.all(share[sorted(every)] == 1)
+
+
+def test_runs_are_the_maximal_subgroup_steps(corpus):
+    ids = corpus.layer_ids(["0040013.preprocess_v1", "0040017.preprocess_v1"])
+    inside = np.isin(corpus.step_layers, ids)
+    walk_starts = set(corpus.offsets)
+    starts, ends = corpus.runs(ids)
+    assert (ends - starts).sum() == inside.sum()
+    for start, end in zip(starts, ends):
+        assert inside[start:end].all()
+        assert start in walk_starts or not inside[start - 1]
+        assert end in walk_starts or not inside[end]
+        # a run does not span two walks
+        assert np.searchsorted(corpus.offsets, start, side='right') == np.searchsorted(corpus.offsets, end - 1, side='right')
+
+    long_starts, long_ends = corpus.runs(ids, min_length=3)
+    assert set(zip(long_starts, long_ends)) == set((start, end) for start, end in zip(starts, ends) if end - start >= 3)
+
+
+def test_subgroup_share(corpus):
+    ids = corpus.layer_ids(["0040013.preprocess_v1"])
+    nbrhds, share = corpus.subgroup_neighborhoods(ids, min_length=2)
+    assert share == 1.0
+    assert nbrhds and all(len(nbrhd) >= 2 for nbrhd in nbrhds)
+    nbrhds, share = corpus.subgroup_neighborhoods(ids, mode='start')
+    assert len(nbrhds) == len(corpus.select(ids, 'start'))
+    assert share == pytest.approx(corpus.subgroup_share(ids)[corpus.select(ids, 'start')].mean())
+    assert share < 1.0
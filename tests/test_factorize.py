@@ -0,0 +1,50 @@
+'''
+The factorization engine models the walks of multinode2vec_walk() with p = q = 1: for layers in
+which every node has neighbors, its transition operator is the law of the walker's steps.
+'''
+import collections
+import numpy as np
+import pandas as pd
+import src as mltn2v
+
+R = 0.3
+N_STEPS = 3
+N_SAMPLES = 20000
+TOLERANCE = 0.03
+
+
+def dense_layers(n_layers=3, n_nodes=6, seed=1):
+    '''
+    Random layers with a ring, so that every node has neighbors in every layer.
+    '''
+    rng = np.random.RandomState(seed)
+    layers = []
+    for _ in range(n_layers):
+        edges = set((i, (i + 1) % n_nodes) for i in range(n_nodes))
+        edges |= set((i, j) for i in range(n_nodes) for j in range(i + 1, n_nodes) if rng.rand() < 0.4)
+        edges = set((min(i, j), max(i, j)) for i, j in edges)
+        layers.append(pd.DataFrame([(str(i + 1), str(j + 1), 1.0) for i, j in sorted(edges)],
+                                   columns=["source", "target", "weight"]))
+    return layers
+
+
+def test_operator_is_walk_law():
+    layers = dense_layers()
+    nodes, transitions, starts = mltn2v.layer_transitions(layers)
+    assert starts.all()
+    mass = np.zeros((len(layers), 1, len(nodes)))
+    mass[0, 0, 0] = 1
+    for _ in range(N_STEPS):
+        mass = mltn2v.multilayer_step(mass, transitions, R)
+    exact = dict(((l, nodes[v]), mass[l, 0, v]) for l in range(len(layers)) for v in range(len(nodes)))
+
+    nbrhd_gen = mltn2v.build_neighborhood_gen(layers, 1, 1)
+    np.random.seed(0)
+    counts = collections.Counter()
+    for _ in range(N_SAMPLES):
+        walk_layers = []
+        walk = nbrhd_gen.multinode2vec_walk(R, N_STEPS + 1, nodes[0], 0, walk_layers=walk_layers)
+        counts[(walk_layers[-1], walk[-1])] += 1
+    empirical = dict((state, count / float(N_SAMPLES)) for state, count in counts.items())
+    states = set(exact) | set(empirical)
+    assert 0.5 * sum(abs(exact.get(s, 0.0) - empirical.get(s, 0.0)) for s in states) < TOLERANCE
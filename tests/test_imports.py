@@ -0,0 +1,37 @@
+'''
+Import cost of the package: importing src must not import pandas, gensim or networkx, which are
+only imported by the functions that need them.
+'''
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['pandas', 'gensim', 'networkx']
+
+
+def import_src():
+    '''
+    Imports src in a fresh interpreter under -X importtime.
+    :return: (list of the heavy modules imported, cumulative import time of src in microseconds)
+    '''
+    code = "import sys, src; print(','.join(m for m in {!r} if m in sys.modules))".format(HEAVY_MODULES)
+    # -E ignores PYTHONPATH, so that site customizations cannot import the heavy modules
+    result = subprocess.run([sys.executable, '-E', '-X', 'importtime', '-c', code], cwd=ROOT,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    imported = [m for m in result.stdout.strip().split(',') if m]
+    import_time = None
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == 'src':
+            import_time = int(fields[1])
+    return imported, import_time
+
+
+def test_import_is_lazy(record_property):
+    imported, import_time = import_src()
+    assert import_time is not None
+    record_property('src_import_time_us', import_time)
+    print("import src: {:.1f} ms".format(import_time / 1000.0))
+    assert imported == []
@@ -0,0 +1,65 @@
+'''
+A walk switches to a uniformly chosen other layer with probability r at each step, whatever the
+walker, and seeding np.random seeds the whole walk.
+'''
+import collections
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+import src as mltn2v
+
+N_LAYERS = 3
+WALK_LENGTH = 20
+N_WALKS = 500
+
+
+def complete_layers(n_nodes=6):
+    '''
+    Complete layers, in which every node has neighbors, so that no switch is forced.
+    '''
+    pairs = list(itertools.combinations([str(i) for i in range(1, n_nodes + 1)], 2))
+    return [pd.DataFrame([(a, b, 1.0) for a, b in pairs], columns=["source", "target", "weight"])
+            for _ in range(N_LAYERS)]
+
+
+def switches(nbrhd_gen, r):
+    '''
+    Counts of (layer, next layer) over the steps of walks from every node of the first layer.
+    '''
+    np.random.seed(0)
+    counts = collections.Counter()
+    for node in nbrhd_gen.start_nodes(0):
+        for j in range(N_WALKS // len(nbrhd_gen.start_nodes(0))):
+            walk_layers = []
+            nbrhd_gen.multinode2vec_walk(r, WALK_LENGTH, node, 0, walk_layers=walk_layers)
+            counts.update(zip(walk_layers[:-1], walk_layers[1:]))
+    return counts
+
+
+@pytest.fixture(scope="module", params=[False, True], ids=["nx", "shared"])
+def nbrhd_gen(request):
+    return mltn2v.build_neighborhood_gen(complete_layers(), 1, 0.5, shared=request.param)
+
+
+@pytest.mark.parametrize("r", [0.0, 0.25, 0.9])
+def test_switch_rate(nbrhd_gen, r):
+    counts = switches(nbrhd_gen, r)
+    n_steps = sum(counts.values())
+    n_switches = sum(count for (a, b), count in counts.items() if a != b)
+    assert abs(n_switches / float(n_steps) - r) < 0.02
+
+
+def test_switch_to_uniform_other_layer(nbrhd_gen):
+    counts = switches(nbrhd_gen, 0.5)
+    for a in range(N_LAYERS):
+        others = [counts[(a, b)] for b in range(N_LAYERS) if b != a]
+        assert abs(others[0] - others[1]) < 0.1 * sum(others)
+
+
+def test_walks_follow_np_random_seed(nbrhd_gen):
+    np.random.seed(7)
+    first = [nbrhd_gen.multinode2vec_walk(0.5, WALK_LENGTH, "1", 0) for _ in range(10)]
+    np.random.seed(7)
+    assert [nbrhd_gen.multinode2vec_walk(0.5, WALK_LENGTH, "1", 0) for _ in range(10)] == first
+    assert len(set(tuple(walk) for walk in first)) > 1
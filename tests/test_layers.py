@@ -0,0 +1,56 @@
+'''
+Thresholded layers derived from a single parse of the weights must equal the layers parsed for
+each threshold, as the matrix files were parsed before parse_weighted_layers().
+'''
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import src as mltn2v
+
+THRESHOLDS = [None, 0.0, 0.3, 0.55]
+
+
+def parse_matrix_layer(file_path, thresh=None, binary=False):
+    '''
+    Reference parse of one adjacency matrix file for one threshold.
+    '''
+    layer = pd.read_csv(file_path, index_col=0)
+    if thresh is not None:
+        layer[layer <= thresh] = 0
+    if binary:
+        layer[layer != 0] = 1
+    layer.index = layer.index.map(str)
+    layer = layer.replace(to_replace=0, value=np.nan)
+    layer = layer.stack(dropna=True).reset_index()
+    layer.columns = ["source", "target", "weight"]
+    return layer
+
+
+@pytest.fixture
+def network_dir(tmp_path):
+    rng = np.random.RandomState(0)
+    nodes = [str(i) for i in range(1, 13)]
+    for k in range(3):
+        weights = np.round(rng.uniform(-0.5, 1, size=(12, 12)), 2)
+        weights = np.triu(weights, 1)
+        weights = weights + weights.T
+        # ties across the thresholds
+        weights[weights == 0.3] = 0.31
+        weights[0, 1] = weights[1, 0] = 0.3
+        pd.DataFrame(weights, index=nodes, columns=nodes).to_csv(os.path.join(str(tmp_path), "layer{}.csv".format(k)))
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_threshold_layers_match_parse(network_dir, binary):
+    weighted_layers = mltn2v.parse_weighted_layers(network_dir)
+    files = sorted(os.listdir(network_dir))
+    for thresh in THRESHOLDS:
+        layers = mltn2v.threshold_layers(weighted_layers, thresh=thresh, binary=binary)
+        assert len(layers) == len(files)
+        for layer, network_file in zip(layers, files):
+            expected = parse_matrix_layer(os.path.join(network_dir, network_file), thresh=thresh, binary=binary)
+            assert list(layer["source"]) == list(expected["source"])
+            assert list(layer["target"]) == list(expected["target"])
+            assert np.allclose(layer["weight"].values, expected["weight"].values)
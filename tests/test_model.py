@@ -0,0 +1,91 @@
+'''
+In-memory layers of the library interface, and feature lookups of a fitted model.
+'''
+import os
+import types
+import numpy as np
+import pandas as pd
+import pytest
+import src as mltn2v
+
+NODES = ["10", "2", "33", "4"]
+
+
+def adjacency(seed=0):
+    rng = np.random.RandomState(seed)
+    weights = np.round(rng.uniform(-0.5, 1, size=(len(NODES), len(NODES))), 1)
+    weights = np.triu(weights, 1)
+    return weights + weights.T
+
+
+def assert_same_edges(edges, expected):
+    assert list(edges["source"]) == list(expected["source"])
+    assert list(edges["target"]) == list(expected["target"])
+    assert np.allclose(edges["weight"].values, expected["weight"].values)
+
+
+def test_numpy_layer_matches_matrix_parse():
+    expected = mltn2v.matrix_to_weighted_edgelist(pd.DataFrame(adjacency(), index=NODES, columns=NODES))
+    assert_same_edges(mltn2v.to_weighted_edgelist(adjacency(), NODES), expected)
+    assert_same_edges(mltn2v.to_weighted_edgelist(pd.DataFrame(adjacency(), index=NODES, columns=NODES)), expected)
+
+
+def test_numpy_layer_defaults_to_row_numbers():
+    edges = mltn2v.to_weighted_edgelist(adjacency())
+    assert set(edges["source"]) <= set(["0", "1", "2", "3"])
+
+
+def test_sparse_layer_matches_matrix_parse():
+    sparse = pytest.importorskip("scipy.sparse")
+    expected = mltn2v.matrix_to_weighted_edgelist(pd.DataFrame(adjacency(), index=NODES, columns=NODES))
+    for layer in [sparse.csr_matrix(adjacency()), sparse.coo_matrix(adjacency()).T]:
+        assert_same_edges(mltn2v.to_weighted_edgelist(layer, NODES), expected)
+
+
+def test_edge_list_layer():
+    expected = mltn2v.matrix_to_weighted_edgelist(pd.DataFrame(adjacency(), index=NODES, columns=NODES))
+    shuffled = expected.sample(frac=1, random_state=0)
+    shuffled = shuffled.assign(source=shuffled["source"].map(int), target=shuffled["target"].map(int))
+    edges = mltn2v.to_weighted_edgelist(pd.concat([shuffled, pd.DataFrame({"source": [2], "target": [4], "weight": [0.0]})]))
+    assert list(edges["weight"]) == sorted(expected["weight"], reverse=True)
+    assert set(zip(edges["source"], edges["target"])) == set(zip(expected["source"], expected["target"]))
+
+
+def word2vec_result(words, seed=0):
+    '''
+    The attributes of a trained gensim 2.3 Word2Vec model that model_to_pandas() reads.
+    '''
+    vectors = np.random.RandomState(seed).randn(len(words), 3).astype(np.float32)
+    return types.SimpleNamespace(wv=types.SimpleNamespace(index2word=list(words), syn0=vectors))
+
+
+@pytest.mark.parametrize("words", [NODES, ["b", "a", "10"]])
+def test_model_features_match_embedding_file(words, tmp_path):
+    w2v_model = word2vec_result(words)
+    emb_file = os.path.join(str(tmp_path), "features.emb")
+    with open(emb_file, "w") as f:
+        f.write("{} 3\n".format(len(words)))
+        for word, row in zip(words, w2v_model.wv.syn0):
+            f.write(word + " " + " ".join(repr(float(x)) for x in row) + "\n")
+    ftrs = mltn2v.model_to_pandas(w2v_model)
+    expected = mltn2v.emb_to_pandas(emb_file)
+    assert list(ftrs.index) == list(expected.index)
+    assert ftrs.index.dtype == expected.index.dtype
+    assert np.allclose(ftrs.values, expected.values)
+
+
+def test_transform_looks_up_str_and_int_ids():
+    model = mltn2v.MultiNode2Vec(d=3)
+    model.embedding_ = mltn2v.model_to_pandas(word2vec_result(NODES))
+    rows = model.transform(["33", 2, "10"])
+    assert list(rows.index) == [33, 2, 10]
+    assert np.allclose(rows.values, model.embedding_.loc[[33, 2, 10]].values)
+    with pytest.raises(KeyError):
+        model.transform(["5"])
+    model.embedding_ = mltn2v.model_to_pandas(word2vec_result(["b", "a"]))
+    assert list(model.transform(["b"]).index) == ["b"]
+
+
+def test_transform_needs_fit():
+    with pytest.raises(ValueError):
+        mltn2v.MultiNode2Vec().transform()
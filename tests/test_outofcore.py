@@ -0,0 +1,173 @@
+'''
+The out-of-core walker reads the transitions spilled to disk, walks batches scheduled by layer with
+the law of single walks, and maps layers within its byte budget.
+'''
+import collections
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import src as mltn2v
+
+P, Q = 2.0, 0.5
+N_NODES = 8
+
+
+def random_layer(rng):
+    '''
+    Ring over all the nodes plus random chords, so that every node has neighbors.
+    '''
+    edges = dict(((i, (i + 1) % N_NODES), rng.uniform(0.5, 2)) for i in range(N_NODES))
+    for i, j in zip(rng.randint(0, N_NODES, 10), rng.randint(0, N_NODES, 10)):
+        if i != j and (j, i) not in edges:
+            edges[(i, j)] = rng.uniform(0.5, 2)
+    return pd.DataFrame([(str(i), str(j), weight) for (i, j), weight in edges.items()],
+                        columns=["source", "target", "weight"])
+
+
+def adjacency(layer, node_ids):
+    adj = collections.defaultdict(dict)
+    for src, dst, weight in layer[["source", "target", "weight"]].values:
+        adj[node_ids[src]][node_ids[dst]] = weight
+        adj[node_ids[dst]][node_ids[src]] = weight
+    return adj
+
+
+def first_order(adj, cur):
+    probs = dict((nbr, weight) for nbr, weight in adj[cur].items())
+    total = sum(probs.values())
+    return dict((nbr, weight / total) for nbr, weight in probs.items())
+
+
+def second_order(adj, prev, cur):
+    probs = {}
+    for nbr, weight in adj[cur].items():
+        probs[nbr] = weight / P if nbr == prev else weight if nbr in adj[prev] else weight / Q
+    total = sum(probs.values())
+    return dict((nbr, weight / total) for nbr, weight in probs.items())
+
+
+def alias_probs(J, q):
+    '''
+    Distribution sampled by alias_draw() from an alias table.
+    '''
+    probs = np.array(q, dtype=np.float64)
+    for kk in range(len(J)):
+        probs[J[kk]] += 1 - q[kk]
+    return probs / len(J)
+
+
+@pytest.fixture(scope="module")
+def spilled(tmp_path_factory):
+    rng = np.random.RandomState(0)
+    layers = [random_layer(rng) for _ in range(3)]
+    node_ids = {}
+    layer_dirs = []
+    for i, layer in enumerate(layers):
+        layer_dirs.append(str(tmp_path_factory.mktemp("layer{}".format(i))))
+        mltn2v.spill_layer(layer, node_ids, P, Q, layer_dirs[-1])
+    return layers, node_ids, layer_dirs
+
+
+def load(layer_dir):
+    return dict((name, np.load(os.path.join(layer_dir, name + '.npy'))) for name in mltn2v.LAYER_ARRAYS)
+
+
+def layer_bytes(layer_dir):
+    return sum(os.path.getsize(os.path.join(layer_dir, name + '.npy')) for name in mltn2v.LAYER_ARRAYS)
+
+
+def test_spill_layer_indexes_new_nodes(tmp_path):
+    node_ids = {"b": 0}
+    layer = pd.DataFrame([("a", "b", 1.0), ("c", "a", 3.0)], columns=["source", "target", "weight"])
+    assert mltn2v.spill_layer(layer, node_ids, P, Q, str(tmp_path)) == 4
+    assert node_ids == {"b": 0, "a": 1, "c": 2}
+    arrays = load(str(tmp_path))
+    assert list(arrays['indptr']) == [0, 1, 3, 4]
+    assert list(arrays['indices']) == [1, 0, 2, 1]
+    assert list(arrays['weights']) == [1.0, 1.0, 3.0, 3.0]
+
+
+def test_spill_layer_writes_the_transitions(spilled):
+    layers, node_ids, layer_dirs = spilled
+    for layer, layer_dir in zip(layers, layer_dirs):
+        adj = adjacency(layer, node_ids)
+        arrays = load(layer_dir)
+        indptr, indices = arrays['indptr'], arrays['indices']
+        for cur in range(N_NODES):
+            start, end = indptr[cur], indptr[cur + 1]
+            nbrs = list(indices[start:end])
+            assert nbrs == sorted(adj[cur])
+            expected = first_order(adj, cur)
+            probs = alias_probs(arrays['node_J'][start:end], arrays['node_q'][start:end])
+            assert np.allclose(probs, [expected[nbr] for nbr in nbrs], atol=1e-6)
+            for prev in adj[cur]:
+                edge = mltn2v.find_edge(arrays, prev, cur)
+                assert indices[edge] == cur
+                edge_start, edge_end = arrays['edge_ptr'][edge], arrays['edge_ptr'][edge + 1]
+                expected = second_order(adj, prev, cur)
+                probs = alias_probs(arrays['edge_J'][edge_start:edge_end], arrays['edge_q'][edge_start:edge_end])
+                assert np.allclose(probs, [expected[nbr] for nbr in nbrs], atol=1e-6)
+
+
+def test_batch_walks_follow_the_step_law(spilled):
+    '''
+    Exact law of the first two steps of walks from node 0 of layer 0 with r = 0.5, against the
+    walks of one batch, which are interleaved across layers.
+    '''
+    layers, node_ids, layer_dirs = spilled
+    adjs = [adjacency(layer, node_ids) for layer in layers[:2]]
+    r = 0.5
+    exact = collections.Counter()
+    for layer1 in (0, 1):
+        p_layer1 = 1 - r if layer1 == 0 else r
+        for node1, p_node1 in first_order(adjs[layer1], 0).items():
+            for layer2 in (0, 1):
+                p_layer2 = 1 - r if layer2 == layer1 else r
+                step = second_order(adjs[layer2], 0, node1) if layer2 == layer1 else first_order(adjs[layer2], node1)
+                for node2, p_node2 in step.items():
+                    exact[(node1, node2)] += p_layer1 * p_node1 * p_layer2 * p_node2
+
+    np.random.seed(0)
+    n_walks = 40000
+    nbrhd_gen = mltn2v.MemmapNeighborhoodGen(layer_dirs[:2], 10 ** 9)
+    walks = nbrhd_gen.multinode2vec_walks(r, 3, [(0, 0)] * n_walks)
+    observed = collections.Counter((walk[1], walk[2]) for walk in walks)
+    tv = 0.5 * sum(abs(exact[pair] - observed[pair] / float(n_walks)) for pair in set(exact) | set(observed))
+    assert tv < 0.02
+
+
+def test_batch_maps_each_layer_once_per_pass(spilled):
+    layers, node_ids, layer_dirs = spilled
+    starts = [(node, i) for i in range(len(layer_dirs)) for node in range(N_NODES)] * 20
+    one_layer = max(layer_bytes(layer_dir) for layer_dir in layer_dirs)
+
+    np.random.seed(0)
+    nbrhd_gen = mltn2v.MemmapNeighborhoodGen(layer_dirs, one_layer)
+    single = [nbrhd_gen.multinode2vec_walk(0.25, 10, node, i) for node, i in starts]
+    single_misses = nbrhd_gen.cache.misses
+
+    np.random.seed(0)
+    nbrhd_gen = mltn2v.MemmapNeighborhoodGen(layer_dirs, one_layer)
+    batch = nbrhd_gen.multinode2vec_walks(0.25, 10, starts)
+    assert [walk[0] for walk in batch] == [node for node, _ in starts]
+    assert all(len(walk) == 10 for walk in single + batch)
+    assert nbrhd_gen.cache.misses * 10 < single_misses
+
+
+def test_layer_cache_evicts_least_recently_used(spilled):
+    layers, node_ids, layer_dirs = spilled
+    sizes = [layer_bytes(layer_dir) for layer_dir in layer_dirs]
+    cache = mltn2v.LayerCache(layer_dirs, sizes[0] + sizes[1] + sizes[2] - 1)
+    for layer_id in (0, 1, 0, 2):
+        cache.get(layer_id)
+    assert list(cache.layers) == [0, 2]
+    assert cache.total_bytes == sizes[0] + sizes[2] <= cache.max_bytes
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    # a layer over the budget is still mapped, alone
+    cache = mltn2v.LayerCache(layer_dirs, 1)
+    cache.get(0)
+    cache.get(1)
+    assert list(cache.layers) == [1]
+    assert cache.total_bytes == sizes[1]
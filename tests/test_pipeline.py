@@ -0,0 +1,60 @@
+'''
+A failing pipeline stage must raise its error instead of leaving the other stages blocked.
+'''
+import os
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+import src as mltn2v
+
+
+@pytest.fixture
+def network_dir(tmp_path):
+    rng = np.random.RandomState(0)
+    nodes = [str(i) for i in range(1, 9)]
+    for k in range(6):
+        weights = np.triu(rng.uniform(0, 1, size=(8, 8)), 1)
+        pd.DataFrame(weights + weights.T, index=nodes, columns=nodes).to_csv(os.path.join(str(tmp_path), "layer{}.csv".format(k)))
+    return str(tmp_path)
+
+
+def run_in_thread(target):
+    '''
+    Runs target in a daemon thread, returning the thread and the list of its errors.
+    '''
+    errors = []
+
+    def run():
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return thread, errors
+
+
+def test_preprocessing_failure_is_raised(network_dir, tmp_path, monkeypatch):
+    def fail(self, layer):
+        raise RuntimeError("preprocessing failed")
+    monkeypatch.setattr(mltn2v.NeighborhoodGen, "add_layer", fail)
+    thread, errors = run_in_thread(lambda: mltn2v.run_pipeline(network_dir, 4, str(tmp_path.joinpath("out")), [0.25], 5,
+                                                               1, 0.5, thresh=0.5, queue_size=1))
+    thread.join(30)
+    assert not thread.is_alive()
+    assert len(errors) == 1 and str(errors[0]) == "preprocessing failed"
+
+
+def test_blocked_producer_gives_up_once_stopped():
+    import queue
+    full = queue.Queue(maxsize=1)
+    full.put("item")
+    stop = threading.Event()
+    results = []
+    thread, errors = run_in_thread(lambda: results.append(mltn2v.put_item(full, "next", stop)))
+    stop.set()
+    thread.join(5)
+    assert not thread.is_alive() and results == [False]
+    assert mltn2v.get_item(queue.Queue(), stop) is mltn2v.END_OF_STAGE
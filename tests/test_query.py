@@ -0,0 +1,118 @@
+'''
+Similarity index, cross-run alignment, run names and query server.
+'''
+import json
+import os
+import threading
+import numpy as np
+import pytest
+import src as mltn2v
+from http.client import HTTPConnection
+from query_embeddings import run_names
+
+
+def clustered_embedding(n_nodes=2000, d=16, n_clusters=40, seed=0):
+    rng = np.random.RandomState(seed)
+    centers = rng.randn(n_clusters, d)
+    vectors = centers[rng.randint(n_clusters, size=n_nodes)] + 0.3 * rng.randn(n_nodes, d)
+    # norms must not matter to cosine similarity
+    vectors *= rng.uniform(0.5, 2, size=(n_nodes, 1))
+    return [str(i) for i in range(n_nodes)], vectors.astype(np.float32)
+
+
+def brute_force_topk(vectors, rows, k):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = np.dot(unit[rows], unit.T)
+    scores[np.arange(len(rows)), rows] = -np.inf
+    return np.argsort(-scores, axis=1, kind="mergesort")[:, :k], np.sort(scores, axis=1)[:, ::-1][:, :k]
+
+
+def test_exact_topk_matches_brute_force():
+    nodes, vectors = clustered_embedding()
+    index = mltn2v.EmbeddingIndex(nodes, vectors, block_size=300)
+    rows = np.arange(0, len(nodes), 37)
+    results = index.batch_query([nodes[i] for i in rows], k=10)
+    expected_ids, expected_scores = brute_force_topk(vectors, rows, 10)
+    for result, ids, scores in zip(results, expected_ids, expected_scores):
+        assert np.allclose([score for _, score in result], scores, atol=1e-5)
+        # equal scores may come in any order
+        assert set(node for node, _ in result[:5]) <= set(nodes[i] for i in ids[:6])
+
+
+def test_lsh_recall():
+    nodes, vectors = clustered_embedding()
+    exact = mltn2v.EmbeddingIndex(nodes, vectors)
+    approx = mltn2v.EmbeddingIndex(nodes, vectors, ann=True)
+    queries = nodes[::20]
+    found = [set(node for node, _ in result) for result in approx.batch_query(queries, k=10)]
+    truth = [set(node for node, _ in result) for result in exact.batch_query(queries, k=10)]
+    recall = np.mean([len(a & b) / 10.0 for a, b in zip(found, truth)])
+    assert recall > 0.9
+
+
+def test_index_keeps_the_embedding_memory_mapped(tmp_path):
+    nodes, vectors = clustered_embedding(n_nodes=100)
+    path = os.path.join(str(tmp_path), "emb.csv")
+    with open(path, "w") as f:
+        for node, row in zip(nodes, vectors):
+            f.write(node + "," + ",".join(repr(float(x)) for x in row) + "\n")
+    index = mltn2v.EmbeddingIndex.from_file(path)
+    assert isinstance(index.vectors, np.memmap)
+    in_memory = mltn2v.EmbeddingIndex(nodes, vectors)
+    assert np.allclose([s for _, s in index.query("3", 5)], [s for _, s in in_memory.query("3", 5)], atol=1e-5)
+
+
+def test_procrustes_recovers_rotation():
+    nodes, vectors = clustered_embedding(n_nodes=200)
+    rotation, _ = np.linalg.qr(np.random.RandomState(1).randn(16, 16))
+    rotated = np.dot(vectors, rotation)
+    # the rotated run lists its nodes in another order
+    order = np.random.RandomState(2).permutation(len(nodes))
+    recovered = mltn2v.procrustes_rotation([nodes[i] for i in order], rotated[order], nodes, vectors)
+    assert np.allclose(recovered, rotation.T, atol=1e-4)
+    aligned = mltn2v.align_embeddings([nodes[i] for i in order], rotated[order], nodes, vectors)
+    assert np.allclose(aligned, vectors[order], atol=1e-3)
+    with pytest.raises(ValueError):
+        mltn2v.procrustes_rotation(["a"], vectors[:1], nodes, vectors)
+
+
+def test_run_names():
+    assert run_names(["results/test/r0.25/mltn2v_results.csv", "results/test/r0.5/mltn2v_results.csv"]) == \
+        ["r0.25/mltn2v_results", "r0.5/mltn2v_results"]
+    assert run_names(["out/t0.5/r0.25/mltn2v_results.csv", "out/t0.6/r0.25/mltn2v_results.csv"]) == \
+        ["t0.5/r0.25/mltn2v_results", "t0.6/r0.25/mltn2v_results"]
+    with pytest.raises(ValueError):
+        run_names(["out/r0.25/mltn2v_results.csv", "out/r0.25/mltn2v_results.npy"])
+
+
+@pytest.fixture
+def server():
+    nodes, vectors = clustered_embedding(n_nodes=100)
+    rotation, _ = np.linalg.qr(np.random.RandomState(1).randn(16, 16))
+    indexes = {"a": mltn2v.EmbeddingIndex(nodes, vectors), "b": mltn2v.EmbeddingIndex(nodes, np.dot(vectors, rotation))}
+    server = mltn2v.QueryServer(indexes, port=0)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def post(server, path, body):
+    connection = HTTPConnection(*server.server_address[:2], timeout=10)
+    connection.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read().decode("utf-8"))
+
+
+def test_server_answers_and_rejects_bad_queries(server):
+    status, result = post(server, "/batch", {"run": "a", "nodes": ["1", "2"], "k": 3})
+    assert status == 200 and len(result) == 2 and len(result[0]) == 3
+    status, result = post(server, "/cross", {"run": "a", "other": "b", "nodes": ["1"], "k": 1})
+    assert status == 200
+    # node 1 of the rotated run is node 1 of the reference run
+    assert result[0][0][0] == "1" and result[0][0][1] > 0.999
+    assert post(server, "/batch", {"run": "a", "nodes": ["unknown"]})[0] == 404
+    assert post(server, "/batch", {"run": "a", "nodes": 5})[0] == 400
+    assert post(server, "/batch", {"run": "a", "nodes": ["1"], "k": "ten"})[0] == 400
@@ -0,0 +1,70 @@
+'''
+The walks merged from N shards must not depend on N, nor on the order the shards ran in.
+'''
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import src as mltn2v
+
+WALK_LENGTH = 8
+N_WALKS = 3
+R = 0.25
+
+
+def random_layers(n_layers=3, n_nodes=15, density=0.3, seed=0):
+    '''
+    Undirected binary layers over the nodes 1..n_nodes, as adjacency lists.
+    '''
+    rng = np.random.RandomState(seed)
+    nodes = np.array([str(i) for i in range(1, n_nodes + 1)], dtype=object)
+    layers = []
+    for _ in range(n_layers):
+        adjacency = np.triu(rng.rand(n_nodes, n_nodes) < density, 1)
+        adjacency = adjacency | adjacency.T
+        rows, cols = np.nonzero(adjacency)
+        layers.append(pd.DataFrame({"source": nodes[rows], "target": nodes[cols], "weight": 1.0},
+                                   columns=["source", "target", "weight"]))
+    return layers
+
+
+def merged_walks(nbrhd_gen, shard_dir, n_shards, order=None):
+    for i in (range(n_shards) if order is None else order):
+        mltn2v.generate_walk_shard(nbrhd_gen, WALK_LENGTH, [R], (i, n_shards), shard_dir, n_walks=N_WALKS)
+    return mltn2v.merge_walk_shards(shard_dir, R, n_shards)
+
+
+@pytest.fixture(scope="module")
+def nbrhd_gen():
+    return mltn2v.build_neighborhood_gen(random_layers(), 1, 0.5)
+
+
+def test_merge_does_not_depend_on_shards(nbrhd_gen, tmp_path):
+    single = merged_walks(nbrhd_gen, os.path.join(str(tmp_path), "n1"), 1)
+    n_pairs = sum(len(set(layer["source"]) | set(layer["target"])) for layer in random_layers())
+    assert len(single) == n_pairs * N_WALKS
+    assert merged_walks(nbrhd_gen, os.path.join(str(tmp_path), "n3"), 3) == single
+    assert merged_walks(nbrhd_gen, os.path.join(str(tmp_path), "n4"), 4, order=[3, 1, 0, 2]) == single
+
+
+def test_merge_rejects_mismatched_shards(nbrhd_gen, tmp_path):
+    shard_dir = str(tmp_path)
+    mltn2v.generate_walk_shard(nbrhd_gen, WALK_LENGTH, [R], (0, 2), shard_dir, n_walks=N_WALKS)
+    mltn2v.generate_walk_shard(nbrhd_gen, WALK_LENGTH + 1, [R], (1, 2), shard_dir, n_walks=N_WALKS)
+    with pytest.raises(ValueError):
+        mltn2v.merge_walk_shards(shard_dir, R, 2)
+
+
+def test_merge_rejects_shards_of_other_walkers(nbrhd_gen, tmp_path):
+    shard_dir = str(tmp_path)
+    shared_gen = mltn2v.build_neighborhood_gen(random_layers(), 1, 0.5, shared=True)
+    mltn2v.generate_walk_shard(nbrhd_gen, WALK_LENGTH, [R], (0, 2), shard_dir, n_walks=N_WALKS)
+    mltn2v.generate_walk_shard(shared_gen, WALK_LENGTH, [R], (1, 2), shard_dir, n_walks=N_WALKS)
+    with pytest.raises(ValueError):
+        mltn2v.merge_walk_shards(shard_dir, R, 2)
+
+
+def test_merge_fails_on_missing_shard(nbrhd_gen, tmp_path):
+    mltn2v.generate_walk_shard(nbrhd_gen, WALK_LENGTH, [R], (0, 2), str(tmp_path), n_walks=N_WALKS)
+    with pytest.raises(IOError):
+        mltn2v.merge_walk_shards(str(tmp_path), R, 2)
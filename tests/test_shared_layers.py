@@ -0,0 +1,68 @@
+'''
+SharedNeighborhoodGen draws the next node by rejection sampling instead of from second order alias
+tables: its walks must follow the same distribution as those of NeighborhoodGen.
+'''
+import collections
+import numpy as np
+import pandas as pd
+import pytest
+import src as mltn2v
+
+P = 0.5
+Q = 2.0
+N_SAMPLES = 20000
+# total variation distance allowed between the empirical and exact distributions
+TOLERANCE = 0.03
+
+EDGES = [("1", "2", 1.0), ("1", "3", 2.0), ("2", "3", 1.0), ("2", "4", 3.0), ("3", "5", 1.0),
+         ("4", "5", 2.0), ("4", "6", 1.0), ("5", "6", 1.0)]
+
+
+def layer():
+    return pd.DataFrame(EDGES, columns=["source", "target", "weight"])
+
+
+def exact_distribution(start):
+    '''
+    Exact distribution of the first two steps of a node2vec walk from start.
+    '''
+    nbrs = collections.defaultdict(dict)
+    for a, b, weight in EDGES:
+        nbrs[a][b] = weight
+        nbrs[b][a] = weight
+    dist = {}
+    total = sum(nbrs[start].values())
+    for x1, w1 in nbrs[start].items():
+        biased = dict((x2, w2 / P if x2 == start else w2 if x2 in nbrs[start] else w2 / Q)
+                      for x2, w2 in nbrs[x1].items())
+        norm = sum(biased.values())
+        for x2, w2 in biased.items():
+            dist[(x1, x2)] = w1 / total * w2 / norm
+    return dist
+
+
+def empirical_distribution(nbrhd_gen, start):
+    np.random.seed(0)
+    counts = collections.Counter(tuple(nbrhd_gen.multinode2vec_walk(0, 3, start, 0)[1:]) for _ in range(N_SAMPLES))
+    return dict((steps, count / float(N_SAMPLES)) for steps, count in counts.items())
+
+
+def total_variation(a, b):
+    return 0.5 * sum(abs(a.get(key, 0.0) - b.get(key, 0.0)) for key in set(a) | set(b))
+
+
+@pytest.mark.parametrize("shared", [False, True])
+@pytest.mark.parametrize("start", ["1", "4"])
+def test_walks_follow_node2vec_distribution(shared, start):
+    nbrhd_gen = mltn2v.build_neighborhood_gen([layer()], P, Q, weighted=True, shared=shared)
+    assert total_variation(empirical_distribution(nbrhd_gen, start), exact_distribution(start)) < TOLERANCE
+
+
+def test_layers_share_neighborhoods():
+    other = layer()
+    other.loc[0, "weight"] = 5.0
+    nbrhd_gen = mltn2v.build_neighborhood_gen([layer(), layer(), other], P, Q, weighted=True, shared=True)
+    assert nbrhd_gen.layer_count() == 3
+    # the reweighted edge changes the neighborhoods of its two nodes only
+    assert len(nbrhd_gen.nbrhd_bits) == 6 + 2
+    assert list(nbrhd_gen.layer_rows[0]) == list(nbrhd_gen.layer_rows[1])